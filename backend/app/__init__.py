@@ -1 +1,9 @@
-# Empty init files
+import time
+
+from dotenv import load_dotenv
+
+# Start of the startup-time measurement reported at /metrics.
+IMPORT_STARTED = time.perf_counter()
+
+# Loaded once, before any module reads its settings from the environment.
+load_dotenv()
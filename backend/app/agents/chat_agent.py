@@ -1,8 +1,12 @@
-from pydantic_ai import Agent
-from typing import List, TypedDict
-from dotenv import load_dotenv
-
-load_dotenv()
+import json
+import re
+from functools import lru_cache
+from typing import AsyncIterator, List, TypedDict
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.agents.model_router import CHAT_MODEL, model_router
+from app.models.database import File
+from app.services.llm_cache import content_hash, response_cache
+from app.services.retrieval import retrieve_context
 
 class ChatState(TypedDict):
     messages: List[str]
@@ -10,28 +14,98 @@ class ChatState(TypedDict):
     user_query: str
     response: str
 
-chat_agent = Agent(
-    model='gemini-2.5-flash',
-    system_prompt="""You are a helpful UPSC exam tutor. 
+CHAT_SYSTEM_PROMPT = """You are a helpful UPSC exam tutor. 
     Help students understand their study material better.
     When a student makes a mistake or shows confusion, identify it and create a revision note.
     Keep your responses clear and concise for exam preparation."""
-)
+CHAT_PROMPT_TEMPLATE = """File Content:
+{context}
+{history}
+The student is studying this material. Provide helpful explanations and answer their questions.
+If the student makes a mistake or shows confusion, acknowledge it gently and help them understand.
+
+Student Question: {question}"""
+SUMMARY_PROMPT_TEMPLATE = """Update the running summary of a tutoring conversation about a UPSC study file.
+
+Current summary:
+{summary}
+
+New turns:
+{turns}
+
+Write the updated summary in at most {max_words} words. Keep the topics covered, what the student
+understood or struggled with, and anything they asked to come back to. Reply with the summary only."""
+# Cached answers are keyed on the prompt text so edits here invalidate them.
+CHAT_TEMPLATE_ID = content_hash(CHAT_SYSTEM_PROMPT + CHAT_PROMPT_TEMPLATE)[:16]
+
+
+@lru_cache(maxsize=None)
+def get_chat_agent():
+    # pydantic_ai is slow to import; build the agent on the first model call.
+    from pydantic_ai import Agent
+
+    return Agent(
+        model=CHAT_MODEL,
+        system_prompt=CHAT_SYSTEM_PROMPT
+    )
+
 
 class ChatAgent:
-    def __init__(self):
-        self.agent = chat_agent
+    @property
+    def agent(self):
+        return get_chat_agent()
     
-    async def chat(self, user_message: str, file_content: str, file_id: str, db) -> str:
-        context = f"""File Content:
-{file_content}
+    def _build_prompt(self, user_message: str, context: str, history: str) -> str:
+        history = f"\nConversation so far:\n{history}\n" if history else ""
+        return CHAT_PROMPT_TEMPLATE.format(context=context, history=history, question=user_message)
 
-The student is studying this material. Provide helpful explanations and answer their questions.
-If the student makes a mistake or shows confusion, acknowledge it gently and help them understand."""
-        
-        result = await self.agent.run(context + f"\n\nStudent Question: {user_message}")
+    async def _cache_answer(self, key: str, answer: str, file: File, file_hash: str) -> None:
+        await response_cache.set(
+            key, answer, model=CHAT_MODEL, template=CHAT_TEMPLATE_ID, file_id=file.id, file_hash=file_hash
+        )
+
+    async def chat(self, user_message: str, file: File, db: AsyncSession, memory=None) -> str:
+        """Answer ``user_message``; ``memory`` is the file's ConversationMemory, if any."""
+        history = memory.render() if memory is not None else ""
+        file_hash = content_hash(file.content)
+        key = response_cache.make_key(CHAT_MODEL, CHAT_TEMPLATE_ID, file_hash, user_message, history)
+        cached = await response_cache.get(key)
+        if cached is not None:
+            return cached
+
+        context = await db.run_sync(retrieve_context, file, user_message)
+        prompt = self._build_prompt(user_message, context, history)
+        result = await model_router.run(self.agent, prompt, name="chat", operation="chat")
+        await self._cache_answer(key, result.output, file, file_hash)
         return result.output
+
+    async def chat_stream(self, user_message: str, file: File, db: AsyncSession, memory=None) -> AsyncIterator[str]:
+        history = memory.render() if memory is not None else ""
+        file_hash = content_hash(file.content)
+        key = response_cache.make_key(CHAT_MODEL, CHAT_TEMPLATE_ID, file_hash, user_message, history)
+        cached = await response_cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+
+        context = await db.run_sync(retrieve_context, file, user_message)
+        parts: List[str] = []
+        prompt = self._build_prompt(user_message, context, history)
+        async for delta in model_router.stream_text(
+            self.agent, prompt, name="chat", operation="chat_stream"
+        ):
+            parts.append(delta)
+            yield delta
+        await self._cache_answer(key, "".join(parts), file, file_hash)
     
+    async def summarize_conversation(self, summary: str, transcript: str, max_words: int) -> str:
+        """Fold the turns in ``transcript`` into the running ``summary``."""
+        prompt = SUMMARY_PROMPT_TEMPLATE.format(summary=summary or "(none yet)", turns=transcript, max_words=max_words)
+        result = await model_router.run(
+            self.agent, prompt, name="chat", operation="summarize_conversation"
+        )
+        return result.output
+
     async def extract_confusion_points(self, user_message: str, ai_response: str) -> List[str]:
         prompt = f"""Analyze this conversation and identify any confusion or mistakes the student showed:
 
@@ -41,5 +115,15 @@ AI Response: {ai_response}
 Return a JSON list of confusion points. If none, return empty list [].
 Example: ["Student confused about parliamentary system vs presidential system"]"""
         
-        result = await self.agent.run(prompt)
-        return result.output
+        result = await model_router.run(
+            self.agent, prompt, name="chat", operation="extract_confusion_points"
+        )
+        # The model answers in prose around the list, so pull out the JSON array.
+        match = re.search(r"\[.*\]", result.output, re.DOTALL)
+        try:
+            points = json.loads(match.group(0)) if match else []
+        except ValueError:
+            points = []
+        if not isinstance(points, list):
+            return []
+        return [point.strip() for point in points if isinstance(point, str) and point.strip()]
@@ -0,0 +1,287 @@
+import asyncio
+import logging
+import os
+import random
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional
+
+from app.services.metrics import Histogram, observe_llm
+
+logger = logging.getLogger(__name__)
+
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_RATE_PER_MINUTE = float(os.getenv("LLM_RATE_PER_MINUTE", "0"))  # 0 disables rate limiting
+LLM_BURST = int(os.getenv("LLM_BURST", "5"))
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "100"))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_RETRY_BASE_SECONDS = float(os.getenv("LLM_RETRY_BASE_SECONDS", "1"))
+LLM_COALESCE = os.getenv("LLM_COALESCE", "true").lower() == "true"
+
+RETRYABLE_STATUSES = {408, 429, 500, 502, 503, 504}
+
+GATEWAY_WAIT = Histogram(
+    "llm_gateway_wait_seconds", "Time model calls spent queued for a concurrency slot and rate token.", ("agent",)
+)
+
+
+class LLMUnavailableError(Exception):
+    """The gateway gave up: queue full or deadline passed. Safe to retry later."""
+
+    def __init__(self, message: str, retry_after: int = 5):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    def __init__(self, rate_per_second: float, capacity: int):
+        self.rate = rate_per_second
+        self.capacity = max(1, capacity)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock: Optional[asyncio.Lock] = None
+
+    async def acquire(self) -> None:
+        # The lock makes waiters take tokens in arrival order.
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+def is_retryable(exc: Exception) -> bool:
+    """Transient provider or network trouble, worth retrying or trying elsewhere."""
+    status = getattr(exc, "status_code", None)
+    if status is not None:
+        return status in RETRYABLE_STATUSES
+    if isinstance(exc, (ConnectionError, asyncio.TimeoutError)):
+        return True
+    try:
+        import httpx
+    except ImportError:
+        return False
+    return isinstance(exc, httpx.TransportError)
+
+
+class LLMGateway:
+    """Every model call goes through here.
+
+    Bounds concurrency and request rate, queues callers (up to a limit),
+    enforces a deadline per call, retries transient provider errors with
+    jittered backoff and lets identical in-flight prompts share one call.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        rate_per_minute: float = LLM_RATE_PER_MINUTE,
+        burst: int = LLM_BURST,
+        max_queue: int = LLM_MAX_QUEUE,
+        timeout_seconds: float = LLM_TIMEOUT_SECONDS,
+        max_retries: int = LLM_MAX_RETRIES,
+        retry_base_seconds: float = LLM_RETRY_BASE_SECONDS,
+        coalesce: bool = LLM_COALESCE,
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.timeout_seconds = timeout_seconds
+        self.max_retries = max_retries
+        self.retry_base_seconds = retry_base_seconds
+        self.coalesce = coalesce
+        self._bucket = TokenBucket(rate_per_minute / 60, burst) if rate_per_minute > 0 else None
+        self._loop = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._inflight: Dict[tuple, asyncio.Future] = {}
+        self._waiters: Dict[tuple, int] = {}
+        self.queued = 0
+        self.max_queued = 0
+        self.in_flight = 0
+        self.calls = 0
+        self.coalesced = 0
+        self.retries = 0
+        self.timeouts = 0
+        self.rejected = 0
+        self.failures = 0
+
+    def _bind_loop(self) -> None:
+        # asyncio primitives belong to one event loop; tests and the bench
+        # may run several loops in one process.
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._inflight = {}
+            self._waiters = {}
+            if self._bucket is not None:
+                self._bucket._lock = asyncio.Lock()
+
+    @asynccontextmanager
+    async def _slot(self, agent: str):
+        if self.queued >= self.max_queue:
+            self.rejected += 1
+            raise LLMUnavailableError("Too many model calls are queued")
+        self.queued += 1
+        self.max_queued = max(self.max_queued, self.queued)
+        started = time.monotonic()
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.queued -= 1
+        try:
+            if self._bucket is not None:
+                await self._bucket.acquire()
+            GATEWAY_WAIT.observe(time.monotonic() - started, agent=agent)
+            self.in_flight += 1
+            try:
+                yield
+            finally:
+                self.in_flight -= 1
+        finally:
+            self._semaphore.release()
+
+    def _backoff(self, exc: Exception, attempt: int, deadline: float) -> Optional[float]:
+        """Seconds to wait before retrying, or None to give up."""
+        if attempt >= self.max_retries or not is_retryable(exc):
+            return None
+        delay = random.uniform(0, self.retry_base_seconds * 2 ** attempt)
+        if time.monotonic() + delay >= deadline:
+            return None
+        return delay
+
+    async def _call(self, agent, prompt: str, name: str, model: str, operation: str, deadline: float, target=None):
+        attempt = 0
+        while True:
+            try:
+                async with self._slot(name):
+                    async with observe_llm(name, model, operation) as call:
+                        result = await (agent.run(prompt) if target is None else agent.run(prompt, model=target))
+                        call.record(result)
+                        return result
+            except LLMUnavailableError:
+                raise
+            except Exception as exc:
+                delay = self._backoff(exc, attempt, deadline)
+                if delay is None:
+                    self.failures += 1
+                    raise
+                self.retries += 1
+                attempt += 1
+                logger.info("Retrying %s %s in %.1fs after %s", name, operation, delay, type(exc).__name__)
+                await asyncio.sleep(delay)
+
+    async def _call_with_deadline(self, agent, prompt: str, name: str, model: str, operation: str, target=None):
+        deadline = time.monotonic() + self.timeout_seconds
+        try:
+            async with asyncio.timeout(self.timeout_seconds):
+                return await self._call(agent, prompt, name, model, operation, deadline, target)
+        except TimeoutError:
+            self.timeouts += 1
+            raise LLMUnavailableError(f"Model call timed out after {self.timeout_seconds:.0f}s")
+
+    async def run(self, agent, prompt: str, *, name: str, model: str, operation: str, target=None):
+        """``agent.run(prompt)`` under the gateway's limits.
+
+        ``model`` labels the call; ``target`` (a model name or stand-in
+        Model) overrides the agent's own model for this run.
+        """
+        self._bind_loop()
+        self.calls += 1
+        if not self.coalesce:
+            return await self._call_with_deadline(agent, prompt, name, model, operation, target)
+
+        key = (name, model, prompt)
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            task = asyncio.ensure_future(self._call_with_deadline(agent, prompt, name, model, operation, target))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        self._waiters[key] = self._waiters.get(key, 0) + 1
+        try:
+            # Shielded so one caller going away does not cancel the others' answer.
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            # The last caller to give up (e.g. a losing hedge) cancels the call itself.
+            if self._waiters.get(key) == 1 and not task.done():
+                task.cancel()
+            raise
+        finally:
+            remaining = self._waiters.get(key, 1) - 1
+            if remaining:
+                self._waiters[key] = remaining
+            else:
+                self._waiters.pop(key, None)
+
+    def _finish(self, key: tuple, task: asyncio.Future) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # retrieved here so an abandoned failure is not logged as unhandled
+
+    async def stream_text(
+        self, agent, prompt: str, *, name: str, model: str, operation: str, target=None
+    ) -> AsyncIterator[str]:
+        """Stream text deltas under the gateway's limits.
+
+        The deadline covers queueing and the wait for the first token; once
+        text is flowing the stream may run as long as the answer takes.
+        Failures are only retried before anything has been yielded.
+        """
+        self._bind_loop()
+        self.calls += 1
+        deadline = time.monotonic() + self.timeout_seconds
+        attempt = 0
+        while True:
+            started = False
+            remaining = max(0.0, deadline - time.monotonic())
+            try:
+                async with asyncio.timeout(remaining) as timeout:
+                    async with self._slot(name):
+                        async with observe_llm(name, model, operation) as call:
+                            stream = agent.run_stream(prompt) if target is None else agent.run_stream(prompt, model=target)
+                            async with stream as result:
+                                async for delta in result.stream_text(delta=True, debounce_by=None):
+                                    if not started:
+                                        started = True
+                                        timeout.reschedule(None)
+                                        call.first_token()
+                                    yield delta
+                            call.record(result)
+                return
+            except LLMUnavailableError:
+                raise
+            except Exception as exc:
+                if isinstance(exc, TimeoutError) and timeout.expired():
+                    self.timeouts += 1
+                    raise LLMUnavailableError(f"Model call timed out after {self.timeout_seconds:.0f}s")
+                delay = None if started else self._backoff(exc, attempt, deadline)
+                if delay is None:
+                    self.failures += 1
+                    raise
+                self.retries += 1
+                attempt += 1
+                await asyncio.sleep(delay)
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "max_queued": self.max_queued,
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "retries": self.retries,
+            "timeouts": self.timeouts,
+            "rejected": self.rejected,
+            "failures": self.failures,
+        }
+
+
+llm_gateway = LLMGateway()
@@ -0,0 +1,336 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from app.agents.gateway import LLMGateway, LLMUnavailableError, is_retryable, llm_gateway
+from app.services.metrics import Counter, Gauge
+from app.services.retrieval import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+CHAT_MODEL = os.getenv("CHAT_MODEL", "gemini-2.5-flash")
+REVISION_MODEL = os.getenv("REVISION_MODEL", "gemini-2.0-flash")
+
+LIGHT = "light"
+STANDARD = "standard"
+
+# Classification and extraction go to the light tier; explanations to standard.
+TASK_TIERS = {
+    "detect_error_type": LIGHT,
+    "detect_error_types": LIGHT,
+    "extract_confusion_points": LIGHT,
+    "summarize_conversation": LIGHT,
+    "generate_daily_revision": LIGHT,
+    "generate_summary": STANDARD,
+    "chat": STANDARD,
+    "chat_stream": STANDARD,
+}
+
+# Light-tier prompts longer than this are sent to the standard tier instead.
+ROUTER_LIGHT_MAX_PROMPT_TOKENS = int(os.getenv("ROUTER_LIGHT_MAX_PROMPT_TOKENS", "4000"))
+ROUTER_HEDGING = os.getenv("ROUTER_HEDGING", "true").lower() == "true"
+# A hedge starts once the first model is slower than this percentile of its recent calls.
+ROUTER_HEDGE_PERCENTILE = float(os.getenv("ROUTER_HEDGE_PERCENTILE", "90"))
+# Used until a model has ROUTER_MIN_SAMPLES calls for the operation.
+ROUTER_HEDGE_DEFAULT_SECONDS = float(os.getenv("ROUTER_HEDGE_DEFAULT_SECONDS", "8"))
+ROUTER_MIN_SAMPLES = int(os.getenv("ROUTER_MIN_SAMPLES", "20"))
+ROUTER_STATS_WINDOW = int(os.getenv("ROUTER_STATS_WINDOW", "200"))
+# Models failing more than this share of recent calls are tried last.
+ROUTER_MAX_ERROR_RATE = float(os.getenv("ROUTER_MAX_ERROR_RATE", "0.5"))
+# A model demoted for errors gets one probe call after this long; if it
+# succeeds the model's outcome window starts over.
+ROUTER_COOLDOWN_SECONDS = float(os.getenv("ROUTER_COOLDOWN_SECONDS", "60"))
+
+
+def _model_list(value: str, default: List[str]) -> List[str]:
+    models = [model.strip() for model in value.split(",") if model.strip()] or default
+    return list(dict.fromkeys(models))
+
+
+# Tier -> models in order of preference. The rest of the list serves as
+# hedges and fallbacks for the first.
+MODEL_TIERS = {
+    LIGHT: _model_list(os.getenv("MODEL_TIER_LIGHT", ""), [REVISION_MODEL, CHAT_MODEL]),
+    STANDARD: _model_list(os.getenv("MODEL_TIER_STANDARD", ""), [CHAT_MODEL, REVISION_MODEL]),
+}
+# Whole-request deadline per tier, hedges and failovers included.
+LATENCY_BUDGETS = {
+    LIGHT: float(os.getenv("ROUTER_LATENCY_BUDGET_LIGHT", "20")),
+    STANDARD: float(os.getenv("ROUTER_LATENCY_BUDGET_STANDARD", "60")),
+}
+
+ROUTER_EVENTS = Counter(
+    "llm_router_events_total", "Hedges sent, hedges that won and failovers, by model.", ("model", "event")
+)
+
+
+def _percentile(values, percentile: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(len(ordered) * percentile / 100))
+    return ordered[index]
+
+
+class ModelStats:
+    """Recent latencies (per operation) and outcomes of one model."""
+
+    def __init__(self, window: int = ROUTER_STATS_WINDOW):
+        self.window = window
+        self.latencies: Dict[str, deque] = {}
+        self.outcomes: deque = deque(maxlen=window)
+        self.calls = 0
+        self.errors = 0
+        self.demoted_at: Optional[float] = None
+        self.probing = False
+
+    def demoted(self, now: float) -> bool:
+        if self.error_rate() <= ROUTER_MAX_ERROR_RATE:
+            self.demoted_at = None
+            return False
+        if self.demoted_at is None:
+            self.demoted_at = now
+            return True
+        if now - self.demoted_at < ROUTER_COOLDOWN_SECONDS:
+            return True
+        # Let one call through to see whether the model has recovered.
+        self.demoted_at = now
+        self.probing = True
+        return False
+
+    def record(self, operation: str, seconds: Optional[float], ok: bool) -> None:
+        if self.probing:
+            self.probing = False
+            if ok:
+                # Start over rather than let the failures behind the
+                # demotion outvote the recovery.
+                self.outcomes.clear()
+                self.demoted_at = None
+        self.calls += 1
+        self.errors += not ok
+        self.outcomes.append(ok)
+        if seconds is not None:
+            self.sample(operation, seconds)
+
+    def sample(self, operation: str, seconds: float) -> None:
+        """Add a latency without counting a call."""
+        self.latencies.setdefault(operation, deque(maxlen=self.window)).append(seconds)
+
+    def latency(self, operation: str, percentile: float) -> Optional[float]:
+        samples = self.latencies.get(operation)
+        if not samples or len(samples) < ROUTER_MIN_SAMPLES:
+            return None
+        return _percentile(samples, percentile)
+
+    def error_rate(self) -> float:
+        if len(self.outcomes) < ROUTER_MIN_SAMPLES:
+            return 0.0
+        return 1 - sum(self.outcomes) / len(self.outcomes)
+
+
+class ModelRouter:
+    """Picks the model for each call and covers for slow or failing ones.
+
+    The tier comes from the operation and the prompt length. Within a tier,
+    models that are failing or too slow for the tier's latency budget are
+    tried last. A second (hedged) request goes to the next model once the
+    first is slower than its recent ROUTER_HEDGE_PERCENTILE latency, and
+    errors fail over to the next model, all within the tier's latency
+    budget. Each attempt gets a share of the budget that is left; running
+    past it counts as an error and fails over too. Every attempt goes through the gateway, so concurrency and rate
+    limits still apply.
+    """
+
+    def __init__(
+        self,
+        tiers: Optional[Dict[str, List[str]]] = None,
+        budgets: Optional[Dict[str, float]] = None,
+        gateway: LLMGateway = llm_gateway,
+        hedging: bool = ROUTER_HEDGING,
+    ):
+        self.tiers = tiers or MODEL_TIERS
+        self.budgets = budgets or LATENCY_BUDGETS
+        self.gateway = gateway
+        self.hedging = hedging
+        self.stats: Dict[str, ModelStats] = {}
+        # Local stand-ins (tests, benchmarks) by model name.
+        self._stand_ins: Dict[str, object] = {}
+
+    def register_model(self, name: str, model) -> None:
+        """Serve ``name`` from a local pydantic-ai Model instead of the provider."""
+        self._stand_ins[name] = model
+
+    def tier_for(self, operation: str, prompt: str) -> str:
+        tier = TASK_TIERS.get(operation, STANDARD)
+        if tier == LIGHT and estimate_tokens(prompt) > ROUTER_LIGHT_MAX_PROMPT_TOKENS:
+            return STANDARD
+        return tier
+
+    def _stats(self, model: str) -> ModelStats:
+        if model not in self.stats:
+            self.stats[model] = ModelStats()
+        return self.stats[model]
+
+    def candidates(self, tier: str, operation: str) -> List[str]:
+        budget = self.budgets[tier]
+        now = time.monotonic()
+
+        def rank(item):
+            index, model = item
+            stats = self._stats(model)
+            typical = stats.latency(operation, 50)
+            return (stats.demoted(now), typical is not None and typical > budget, index)
+
+        return [model for _, model in sorted(enumerate(self.tiers[tier]), key=rank)]
+
+    def hedge_delay(self, model: str, operation: str) -> float:
+        observed = self._stats(model).latency(operation, ROUTER_HEDGE_PERCENTILE)
+        return observed if observed is not None else ROUTER_HEDGE_DEFAULT_SECONDS
+
+    async def _attempt(self, agent, prompt: str, model: str, name: str, operation: str, timeout: float):
+        started = time.monotonic()
+        try:
+            async with asyncio.timeout(timeout):
+                result = await self.gateway.run(
+                    agent, prompt, name=name, model=model, operation=operation,
+                    target=self._stand_ins.get(model, model),
+                )
+        except asyncio.CancelledError:
+            # Recorded by _race, which knows whether another model won.
+            raise
+        except Exception:
+            # A TimeoutError here is retryable, so a hung model fails over.
+            self._stats(model).record(operation, None, ok=False)
+            raise
+        self._stats(model).record(operation, time.monotonic() - started, ok=True)
+        return result
+
+    async def run(self, agent, prompt: str, *, name: str, operation: str):
+        """Run ``prompt`` on the best model of its tier, hedging and failing over."""
+        tier = self.tier_for(operation, prompt)
+        models = self.candidates(tier, operation)
+        budget = self.budgets[tier]
+        try:
+            async with asyncio.timeout(budget):
+                return await self._race(agent, prompt, models, name, operation, time.monotonic() + budget)
+        except TimeoutError:
+            raise LLMUnavailableError(f"No model answered within the {budget:g}s budget")
+
+    async def _race(self, agent, prompt: str, models: List[str], name: str, operation: str, deadline: float):
+        running: Dict[asyncio.Task, Tuple[str, float]] = {}
+        remaining = list(models)
+        hedged = False
+        won = False
+        last_error: Optional[Exception] = None
+
+        def start(event: Optional[str] = None) -> None:
+            model = remaining.pop(0)
+            if event is not None:
+                ROUTER_EVENTS.inc(model=model, event=event)
+                logger.info("%s %s on %s", event.capitalize(), operation, model)
+            now = time.monotonic()
+            # Each attempt gets its share of what is left of the budget, so
+            # a hung model leaves time for the ones after it.
+            timeout = max(deadline - now, 0) / (len(remaining) + 1)
+            task = asyncio.ensure_future(self._attempt(agent, prompt, model, name, operation, timeout))
+            running[task] = (model, now)
+
+        start()
+        try:
+            while running:
+                wait = None
+                if self.hedging and not hedged and remaining and len(running) == 1:
+                    first, _ = next(iter(running.values()))
+                    wait = self.hedge_delay(first, operation)
+                done, _ = await asyncio.wait(running, timeout=wait, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    hedged = True
+                    start("hedge")
+                    continue
+                for task in done:
+                    model, _ = running.pop(task)
+                    if task.exception() is None:
+                        won = True
+                        if hedged and model != models[0]:
+                            ROUTER_EVENTS.inc(model=model, event="hedge_won")
+                        return task.result()
+                    last_error = task.exception()
+                    if not (is_retryable(last_error) or isinstance(last_error, LLMUnavailableError)):
+                        raise last_error
+                if not running and remaining:
+                    start("failover")
+            raise last_error
+        finally:
+            now = time.monotonic()
+            for task, (model, started) in running.items():
+                task.cancel()
+                if won:
+                    # A hedge loser was at least this slow.
+                    self._stats(model).sample(operation, now - started)
+                else:
+                    # Out of budget or abandoned by the caller without answering.
+                    self._stats(model).record(operation, None, ok=False)
+
+    async def stream_text(self, agent, prompt: str, *, name: str, operation: str) -> AsyncIterator[str]:
+        """Stream from the best model of the tier, failing over until the first token.
+
+        Streams are not hedged: a duplicate stream would pay for the whole
+        answer twice.
+        """
+        tier = self.tier_for(operation, prompt)
+        models = self.candidates(tier, operation)
+        deadline = time.monotonic() + self.budgets[tier]
+        for position, model in enumerate(models):
+            started = time.monotonic()
+            streamed = False
+            if position:
+                ROUTER_EVENTS.inc(model=model, event="failover")
+            try:
+                # The budget covers the wait for the first token only.
+                async with asyncio.timeout(max(deadline - started, 0) / (len(models) - position)) as first_token:
+                    async for delta in self.gateway.stream_text(
+                        agent, prompt, name=name, model=model, operation=operation,
+                        target=self._stand_ins.get(model, model),
+                    ):
+                        if not streamed:
+                            streamed = True
+                            first_token.reschedule(None)
+                            self._stats(model).record(operation, time.monotonic() - started, ok=True)
+                        yield delta
+                return
+            except asyncio.CancelledError:
+                if not streamed:
+                    self._stats(model).record(operation, None, ok=False)
+                raise
+            except Exception as exc:
+                if streamed:
+                    raise
+                self._stats(model).record(operation, None, ok=False)
+                retryable = is_retryable(exc) or isinstance(exc, LLMUnavailableError)
+                if not retryable or position == len(models) - 1:
+                    if isinstance(exc, TimeoutError):
+                        raise LLMUnavailableError(f"No model started answering within the {self.budgets[tier]:g}s budget")
+                    raise
+
+    def model_stats(self) -> Dict[tuple, float]:
+        samples = {}
+        for model, stats in list(self.stats.items()):
+            samples[(model, "calls")] = stats.calls
+            samples[(model, "errors")] = stats.errors
+            samples[(model, "error_rate")] = stats.error_rate()
+            for operation, latencies in list(stats.latencies.items()):
+                if latencies:
+                    samples[(model, f"{operation}_p50_seconds")] = _percentile(latencies, 50)
+                    samples[(model, f"{operation}_p95_seconds")] = _percentile(latencies, 95)
+        return samples
+
+
+model_router = ModelRouter()
+
+Gauge(
+    "llm_router_model",
+    "Recent calls, error rate and latency percentiles per model as seen by the router.",
+    model_router.model_stats,
+    labels=("model", "stat"),
+)
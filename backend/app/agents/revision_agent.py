@@ -1,8 +1,13 @@
-from pydantic_ai import Agent
-from typing import TypedDict, List
-from dotenv import load_dotenv
-
-load_dotenv()
+import asyncio
+import json
+import os
+import re
+from functools import lru_cache
+from typing import TypedDict, List, Optional, Tuple
+from app.agents.model_router import REVISION_MODEL, model_router
+from app.models.schemas import ERROR_TYPES
+from app.services.error_classifier import SOURCE_CLASSIFIER, SOURCE_MODEL, error_classifier
+from app.services.llm_cache import content_hash, response_cache
 
 class RevisionState(TypedDict):
     content: str
@@ -10,30 +15,163 @@ class RevisionState(TypedDict):
     suggestions: List[str]
     summary: str
 
-revision_agent = Agent(
-    model='gemini-2.0-flash',
-    system_prompt="""You are a learning assistant that helps students identify and learn from their mistakes.
+REVISION_SYSTEM_PROMPT = """You are a learning assistant that helps students identify and learn from their mistakes.
 Analyze confusion points and provide categorized error types:
 - CONFUSION: Student misunderstood a concept
 - MISTAKE: Student made an error in understanding facts
 - CONCEPT_MISUNDERSTANDING: Fundamental concept not clear
 
 Provide a brief summary for revision."""
-)
+DETECT_ERROR_TYPE_TEMPLATE = """Analyze this student note and classify the type of error/confusion:
+
+Note: {content}
+
+Return only one word: CONFUSION, MISTAKE, or CONCEPT_MISUNDERSTANDING"""
+DETECT_ERROR_TYPE_TEMPLATE_ID = content_hash(REVISION_SYSTEM_PROMPT + DETECT_ERROR_TYPE_TEMPLATE)[:16]
+DETECT_ERROR_TYPES_TEMPLATE = """Classify each numbered student note by the type of error/confusion it shows:
+
+{notes}
+
+Return only a JSON array of {count} strings, one per note in the same order.
+Each string must be one of: CONFUSION, MISTAKE, CONCEPT_MISUNDERSTANDING"""
+DAILY_REVISION_TEMPLATE = """Create a brief daily revision summary from these confusion points:
+
+{notes}
+
+Provide a 3-bullet point summary for today's revision:"""
+DAILY_REVISION_TEMPLATE_ID = content_hash(REVISION_SYSTEM_PROMPT + DAILY_REVISION_TEMPLATE)[:16]
+# Only this much of the day's notes reaches the prompt.
+DAILY_REVISION_NOTES = 5
+DAILY_REVISION_NOTE_CHARS = 100
+# Labels used when the model answers with something outside ERROR_TYPES.
+FALLBACK_ERROR_TYPE = "CONFUSION"
+DETECT_CONCURRENCY = int(os.getenv("DETECT_ERROR_TYPE_CONCURRENCY", "4"))
+BATCH_NOTE_CHARS = 1000
+
+
+@lru_cache(maxsize=None)
+def get_revision_agent():
+    # pydantic_ai is slow to import; build the agent on the first model call.
+    from pydantic_ai import Agent
+
+    return Agent(
+        model=REVISION_MODEL,
+        system_prompt=REVISION_SYSTEM_PROMPT
+    )
+
+
+def normalize_error_type(label) -> Optional[str]:
+    cleaned = re.sub(r"[\s\-]+", "_", str(label).strip().strip("\"'.").upper())
+    return cleaned if cleaned in ERROR_TYPES else None
+
+
+def _parse_label_list(output: str, count: int) -> List[Optional[str]]:
+    match = re.search(r"\[.*\]", output, re.DOTALL)
+    try:
+        labels = json.loads(match.group(0)) if match else []
+    except ValueError:
+        labels = []
+    if not isinstance(labels, list):
+        labels = []
+    labels = [normalize_error_type(label) for label in labels[:count]]
+    return labels + [None] * (count - len(labels))
+
 
 class RevisionAgent:
-    def __init__(self):
-        self.agent = revision_agent
+    @property
+    def agent(self):
+        return get_revision_agent()
     
+    def _detect_key(self, content: str) -> str:
+        return response_cache.make_key(REVISION_MODEL, DETECT_ERROR_TYPE_TEMPLATE_ID, None, content)
+
+    async def _remember(self, content: str, error_type: str) -> None:
+        await response_cache.set(
+            self._detect_key(content), error_type, model=REVISION_MODEL, template=DETECT_ERROR_TYPE_TEMPLATE_ID
+        )
+
+    async def classify_error_type(self, content: str) -> Tuple[str, str]:
+        """Return (label, source), asking Gemini only if the local classifier is unsure."""
+        label = await error_classifier.predict(content)
+        if label is not None:
+            return label, SOURCE_CLASSIFIER
+        return await self._detect_with_model(content), SOURCE_MODEL
+
+    async def classify_error_types(self, contents: List[str]) -> List[Tuple[str, str]]:
+        local = [await error_classifier.predict(content) for content in contents]
+        pending = [i for i, label in enumerate(local) if label is None]
+        detected = await self._detect_many_with_model([contents[i] for i in pending]) if pending else []
+
+        results = [(label, SOURCE_CLASSIFIER) for label in local]
+        for i, label in zip(pending, detected):
+            results[i] = (label, SOURCE_MODEL)
+        return results
+
     async def detect_error_type(self, content: str) -> str:
-        prompt = f"""Analyze this student note and classify the type of error/confusion:
+        label, _ = await self.classify_error_type(content)
+        return label
 
-Note: {content}
+    async def detect_error_types(self, contents: List[str]) -> List[str]:
+        return [label for label, _ in await self.classify_error_types(contents)]
 
-Return only one word: CONFUSION, MISTAKE, or CONCEPT_MISUNDERSTANDING"""
-        
-        result = await self.agent.run(prompt)
-        return result.output.strip().upper()
+    async def _detect_with_model(self, content: str) -> str:
+        cached = await response_cache.get(self._detect_key(content))
+        if cached is not None:
+            return cached
+        error_type = await self._ask_model(content)
+        if error_type is None:
+            return FALLBACK_ERROR_TYPE
+        await self._remember(content, error_type)
+        return error_type
+
+    async def _ask_model(self, content: str) -> Optional[str]:
+        result = await model_router.run(
+            self.agent,
+            DETECT_ERROR_TYPE_TEMPLATE.format(content=content),
+            name="revision",
+            operation="detect_error_type",
+        )
+        return normalize_error_type(result.output)
+
+    async def _detect_many_with_model(self, contents: List[str]) -> List[str]:
+        """Classify many notes with one model call.
+
+        Cached notes are answered locally. Labels the batch call leaves out or
+        gets wrong are retried one note at a time, a few at once.
+        """
+        keys = [self._detect_key(content) for content in contents]
+        cached = await response_cache.get_many(keys)
+        labels: List[Optional[str]] = [cached.get(key) for key in keys]
+        pending = [i for i, label in enumerate(labels) if label is None]
+        learned = {}
+
+        if len(pending) > 1:
+            numbered = "\n".join(
+                f"{n}. {contents[i][:BATCH_NOTE_CHARS]}" for n, i in enumerate(pending, start=1)
+            )
+            result = await model_router.run(
+                self.agent,
+                DETECT_ERROR_TYPES_TEMPLATE.format(notes=numbered, count=len(pending)),
+                name="revision",
+                operation="detect_error_types",
+            )
+            for i, label in zip(pending, _parse_label_list(result.output, len(pending))):
+                if label is not None:
+                    labels[i] = learned[keys[i]] = label
+
+        semaphore = asyncio.Semaphore(DETECT_CONCURRENCY)
+
+        async def detect_one(i: int) -> None:
+            async with semaphore:
+                label = await self._ask_model(contents[i])
+            if label is None:
+                labels[i] = FALLBACK_ERROR_TYPE
+            else:
+                labels[i] = learned[keys[i]] = label
+
+        await asyncio.gather(*(detect_one(i) for i, label in enumerate(labels) if label is None))
+        await response_cache.set_many(learned, model=REVISION_MODEL, template=DETECT_ERROR_TYPE_TEMPLATE_ID)
+        return labels
     
     async def generate_summary(self, content: str, error_type: str) -> str:
         prompt = f"""Create a brief one-sentence summary of this revision note for quick recall:
@@ -43,17 +181,18 @@ Note: {content}
 
 Summary:"""
         
-        result = await self.agent.run(prompt)
+        result = await model_router.run(
+            self.agent, prompt, name="revision", operation="generate_summary"
+        )
         return result.output.strip()
     
     async def generate_daily_revision(self, notes: List[dict]) -> str:
-        notes_text = "\n".join([f"- {n['content'][:100]}..." for n in notes[:5]])
-        
-        prompt = f"""Create a brief daily revision summary from these confusion points:
-
-{notes_text}
-
-Provide a 3-bullet point summary for today's revision:"""
+        notes_text = "\n".join(
+            [f"- {n['content'][:DAILY_REVISION_NOTE_CHARS]}..." for n in notes[:DAILY_REVISION_NOTES]]
+        )
+        prompt = DAILY_REVISION_TEMPLATE.format(notes=notes_text)
         
-        result = await self.agent.run(prompt)
+        result = await model_router.run(
+            self.agent, prompt, name="revision", operation="generate_daily_revision"
+        )
         return result.output
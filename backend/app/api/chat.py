@@ -1,20 +1,129 @@
-from fastapi import APIRouter, Depends, HTTPException
+import asyncio
+import json
+import logging
+import os
+import time
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.models.database import get_db, File, ChatMessage
+from app.models.database import get_db, get_async_db, AsyncSessionLocal, File, ChatMessage
 from app.models.schemas import ChatMessageCreate, ChatMessageResponse
 from app.agents.chat_agent import ChatAgent
-from typing import List
+from app.agents.gateway import LLMUnavailableError
+from app.services.conversation_memory import load_memory, queue_summary
+from app.services.http_cache import make_etag, not_modified
+from app.services.job_handlers import CHAT_EXTRACT_REVISION_NOTES, EXTRACT_CONFUSION_POINTS
+from app.services.jobs import enqueue_job, job_queue
+from app.services.pagination import MAX_PAGE_SIZE, newest_page
+from app.services.serialization import lean_query, lean_response
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+STREAM_CHECKPOINT_SECONDS = float(os.getenv("CHAT_STREAM_CHECKPOINT_SECONDS", "2"))
+
+# Generation tasks outlive the SSE connection so a dropped client still gets
+# its answer saved; keep strong references until they finish.
+_generation_tasks: set[asyncio.Task] = set()
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _message_payload(message: ChatMessage) -> dict:
+    return ChatMessageResponse.model_validate(message).model_dump(mode="json")
+
+
+def _queue_confusion_extraction(db, file_id: str, user_message: str, ai_response: str) -> None:
+    if CHAT_EXTRACT_REVISION_NOTES and ai_response:
+        enqueue_job(
+            db,
+            EXTRACT_CONFUSION_POINTS,
+            {"file_id": file_id, "user_message": user_message, "ai_response": ai_response},
+        )
+
+
+async def _save_assistant_message(
+    db: AsyncSession, message: Optional[ChatMessage], file_id: str, content: str
+) -> ChatMessage:
+    if message is None:
+        message = ChatMessage(role="assistant", content=content, file_id=file_id)
+        db.add(message)
+    else:
+        message.content = content
+    await db.commit()
+    await db.refresh(message)
+    return message
+
+
+async def _generate_reply(file_id: str, user_message: str, user_message_id: str, queue: asyncio.Queue):
+    message = None
+    parts: List[str] = []
+    async with AsyncSessionLocal() as db:
+        try:
+            file = await db.get(File, file_id)
+            memory = await db.run_sync(load_memory, file_id, user_message_id)
+            chat_agent = ChatAgent()
+            last_checkpoint = time.monotonic()
+            async for delta in chat_agent.chat_stream(user_message, file, db, memory):
+                parts.append(delta)
+                queue.put_nowait(("token", {"delta": delta}))
+                if time.monotonic() - last_checkpoint >= STREAM_CHECKPOINT_SECONDS:
+                    message = await _save_assistant_message(db, message, file_id, "".join(parts))
+                    last_checkpoint = time.monotonic()
+
+            _queue_confusion_extraction(db, file_id, user_message, "".join(parts))
+            await queue_summary(db, file_id, memory)
+            message = await _save_assistant_message(db, message, file_id, "".join(parts))
+            job_queue.wake()
+            queue.put_nowait(("done", _message_payload(message)))
+        except Exception as exc:
+            logger.exception("Streamed reply for file %s failed", file_id)
+            if isinstance(exc, LLMUnavailableError):
+                # Our own message, as the 503 handler sends for non-streamed chat.
+                error = {"detail": str(exc), "retry_after": exc.retry_after}
+            else:
+                # Provider errors can carry request details; keep them server-side.
+                error = {"detail": "The assistant could not answer"}
+            queue.put_nowait(("error", error))
+            if parts:
+                await db.rollback()
+                await _save_assistant_message(db, message, file_id, "".join(parts))
+        finally:
+            queue.put_nowait(None)
+
+
 @router.get("/file/{file_id}", response_model=List[ChatMessageResponse])
-def get_chat_messages(file_id: str, db: Session = Depends(get_db)):
-    messages = db.query(ChatMessage).filter(ChatMessage.file_id == file_id).order_by(ChatMessage.created_at).all()
-    return messages
+def get_chat_messages(
+    file_id: str,
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    before: Optional[str] = None,
+    include_total: bool = False,
+    db: Session = Depends(get_db),
+):
+    query = db.query(ChatMessage).filter(ChatMessage.file_id == file_id)
+    # Streamed replies are rewritten in place, so the content length is part of the tag.
+    fingerprint = query.with_entities(
+        func.count(ChatMessage.id), func.max(ChatMessage.created_at), func.sum(func.length(ChatMessage.content))
+    ).one()
+    cached = not_modified(request, response, make_etag(*fingerprint, weak=True))
+    if cached is not None:
+        return cached
+    query = lean_query(query, ChatMessage, ChatMessageResponse)
+    rows = newest_page(db, query, ChatMessage, response, limit=limit, before=before, include_total=include_total)
+    return lean_response(rows, ChatMessageResponse, response)
 
 @router.post("/file/{file_id}", response_model=ChatMessageResponse)
-async def send_message(file_id: str, message: ChatMessageCreate, db: Session = Depends(get_db)):
-    file = db.query(File).filter(File.id == file_id).first()
+async def send_message(file_id: str, message: ChatMessageCreate, db: AsyncSession = Depends(get_async_db)):
+    file = await db.get(File, file_id)
     if not file:
         raise HTTPException(status_code=404, detail="File not found")
     
@@ -24,11 +133,12 @@ async def send_message(file_id: str, message: ChatMessageCreate, db: Session = D
         file_id=file_id
     )
     db.add(user_message)
-    db.commit()
-    db.refresh(user_message)
+    await db.commit()
+    await db.refresh(user_message)
     
+    memory = await db.run_sync(load_memory, file_id, user_message.id)
     chat_agent = ChatAgent()
-    ai_response_text = await chat_agent.chat(message.content, file.content, file_id, db)
+    ai_response_text = await chat_agent.chat(message.content, file, db, memory)
     
     assistant_message = ChatMessage(
         role="assistant",
@@ -36,7 +146,42 @@ async def send_message(file_id: str, message: ChatMessageCreate, db: Session = D
         file_id=file_id
     )
     db.add(assistant_message)
-    db.commit()
-    db.refresh(assistant_message)
+    _queue_confusion_extraction(db, file_id, message.content, ai_response_text)
+    await queue_summary(db, file_id, memory)
+    await db.commit()
+    await db.refresh(assistant_message)
+    job_queue.wake()
     
     return assistant_message
+
+@router.post("/file/{file_id}/stream")
+async def stream_message(file_id: str, message: ChatMessageCreate, db: AsyncSession = Depends(get_async_db)):
+    file = await db.get(File, file_id)
+    if not file:
+        raise HTTPException(status_code=404, detail="File not found")
+
+    user_message = ChatMessage(
+        role="user",
+        content=message.content,
+        file_id=file_id
+    )
+    db.add(user_message)
+    await db.commit()
+    await db.refresh(user_message)
+    user_payload = _message_payload(user_message)
+
+    queue: asyncio.Queue = asyncio.Queue()
+    task = asyncio.create_task(_generate_reply(file_id, message.content, user_message.id, queue))
+    _generation_tasks.add(task)
+    task.add_done_callback(_generation_tasks.discard)
+
+    async def events():
+        yield _sse("user_message", user_payload)
+        while (item := await queue.get()) is not None:
+            yield _sse(*item)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,28 +1,140 @@
-from fastapi import APIRouter, Depends, HTTPException
+from urllib.parse import quote
+
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.models.database import get_db, Directory
-from app.models.schemas import DirectoryCreate, DirectoryResponse
-from typing import List
+from app.models.database import get_async_db, get_db, Directory, generate_uuid
+from app.models.schemas import DirectoryCreate, DirectoryCrumb, DirectoryResponse, DirectoryTreeNode
+from app.services.directory_tree import (
+    delete_subtree,
+    directory_path,
+    load_breadcrumb,
+    load_directory_tree,
+    load_subtrees,
+    move_directory,
+    subtree_fingerprint,
+)
+from app.services.http_cache import make_etag, not_modified
+from app.services.tree_archive import (
+    IMPORT_MAX_BYTES,
+    Archive,
+    ArchiveError,
+    ArchiveTooLarge,
+    export_archive,
+    import_archive,
+    spool_upload,
+)
+from typing import List, Optional
 
 router = APIRouter()
 
+def _get_parent(db: Session, parent_id: Optional[str]) -> Optional[Directory]:
+    if parent_id is None:
+        return None
+    parent = db.query(Directory).filter(Directory.id == parent_id).first()
+    if not parent:
+        raise HTTPException(status_code=404, detail="Parent directory not found")
+    return parent
+
 @router.get("/", response_model=List[DirectoryResponse])
 def get_directories(db: Session = Depends(get_db)):
     directories = db.query(Directory).filter(Directory.parent_id == None).all()
+    load_subtrees(db, directories)
     return directories
 
+@router.get("/tree", response_model=List[DirectoryTreeNode])
+def get_directory_tree(
+    root_id: Optional[str] = None,
+    depth: Optional[int] = Query(None, ge=0),
+    db: Session = Depends(get_db),
+):
+    tree = load_directory_tree(db, root_id=root_id, max_depth=depth)
+    if root_id and not tree:
+        raise HTTPException(status_code=404, detail="Directory not found")
+    return tree
+
+@router.post("/import")
+async def import_directory(
+    request: Request,
+    name: str = Query("Imported notes", min_length=1),
+    parent_id: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Import a zip or tar archive of markdown files as a new directory.
+
+    The raw archive is the request body. Progress is streamed back as
+    newline-delimited JSON events: started, progress (after each batch),
+    then done or error.
+    """
+    parent = await db.get(Directory, parent_id) if parent_id is not None else None
+    if parent_id is not None and parent is None:
+        raise HTTPException(status_code=404, detail="Parent directory not found")
+    if int(request.headers.get("content-length") or 0) > IMPORT_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"Archive is larger than {IMPORT_MAX_BYTES} bytes")
+    try:
+        spool = await spool_upload(request.stream())
+    except ArchiveTooLarge as exc:
+        raise HTTPException(status_code=413, detail=str(exc))
+    try:
+        archive = Archive(spool)
+    except ArchiveError as exc:
+        spool.close()
+        raise HTTPException(status_code=400, detail=str(exc))
+
+    events = import_archive(archive, name, parent_id, parent.path if parent is not None else None)
+    return StreamingResponse(
+        (orjson.dumps(event) + b"\n" for event in events),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.get("/{directory_id}/export")
+def export_directory(directory_id: str, include_notes: bool = False, db: Session = Depends(get_db)):
+    directory = db.query(Directory).filter(Directory.id == directory_id).first()
+    if not directory:
+        raise HTTPException(status_code=404, detail="Directory not found")
+    db.expunge(directory)
+    filename = quote(f"{directory.name}.zip")
+    return StreamingResponse(
+        export_archive(directory, include_notes=include_notes),
+        media_type="application/zip",
+        headers={"Content-Disposition": f"attachment; filename*=UTF-8''{filename}"},
+    )
+
 @router.get("/{directory_id}", response_model=DirectoryResponse)
-def get_directory(directory_id: str, db: Session = Depends(get_db)):
+def get_directory(directory_id: str, request: Request, response: Response, db: Session = Depends(get_db)):
+    # The response nests every subdirectory and file body, so validate
+    # against the whole subtree before loading any of it.
+    fingerprint = subtree_fingerprint(db, directory_id)
+    if fingerprint is None:
+        raise HTTPException(status_code=404, detail="Directory not found")
+    cached = not_modified(request, response, make_etag(directory_id, *fingerprint, weak=True))
+    if cached is not None:
+        return cached
     directory = db.query(Directory).filter(Directory.id == directory_id).first()
     if not directory:
         raise HTTPException(status_code=404, detail="Directory not found")
+    load_subtrees(db, [directory])
     return directory
 
+@router.get("/{directory_id}/breadcrumb", response_model=List[DirectoryCrumb])
+def get_breadcrumb(directory_id: str, db: Session = Depends(get_db)):
+    directory = db.query(Directory).filter(Directory.id == directory_id).first()
+    if not directory:
+        raise HTTPException(status_code=404, detail="Directory not found")
+    return load_breadcrumb(db, directory)
+
 @router.post("/", response_model=DirectoryResponse)
 def create_directory(directory: DirectoryCreate, db: Session = Depends(get_db)):
+    parent = _get_parent(db, directory.parent_id)
+    directory_id = generate_uuid()
     db_directory = Directory(
+        id=directory_id,
         name=directory.name,
-        parent_id=directory.parent_id
+        parent_id=directory.parent_id,
+        path=directory_path(parent, directory_id),
     )
     db.add(db_directory)
     db.commit()
@@ -35,9 +147,14 @@ def update_directory(directory_id: str, directory: DirectoryCreate, db: Session
     if not db_directory:
         raise HTTPException(status_code=404, detail="Directory not found")
     db_directory.name = directory.name
-    db_directory.parent_id = directory.parent_id
+    if directory.parent_id != db_directory.parent_id:
+        try:
+            move_directory(db, db_directory, _get_parent(db, directory.parent_id))
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
     db.commit()
     db.refresh(db_directory)
+    load_subtrees(db, [db_directory])
     return db_directory
 
 @router.delete("/{directory_id}")
@@ -45,6 +162,6 @@ def delete_directory(directory_id: str, db: Session = Depends(get_db)):
     directory = db.query(Directory).filter(Directory.id == directory_id).first()
     if not directory:
         raise HTTPException(status_code=404, detail="Directory not found")
-    db.delete(directory)
+    delete_subtree(db, directory)
     db.commit()
     return {"message": "Directory deleted successfully"}
@@ -1,22 +1,65 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from sqlalchemy.orm import Session, load_only
+from sqlalchemy.orm.exc import StaleDataError
 from app.models.database import get_db, File
-from app.models.schemas import FileCreate, FileUpdate, FileResponse
-from typing import List
+from app.models.schemas import FileCreate, FilePatch, FilePatchResponse, FileUpdate, FileResponse
+from app.services.http_cache import not_modified
+from app.services.llm_cache import content_hash, response_cache
+from app.services.pagination import MAX_PAGE_SIZE, newest_page
+from app.services.retrieval import index_file
+from app.services.serialization import lean_query, lean_response
+from app.services.text_patch import apply_text_ops, parse_version_tag
+from typing import List, Optional
 
 router = APIRouter()
 
+
+def _etag(version: int) -> str:
+    return f'"{version}"'
+
+
+def _version_conflict(db: Session, file_id: str):
+    db.rollback()
+    current = db.query(File.version).filter(File.id == file_id).scalar()
+    raise HTTPException(
+        status_code=409,
+        detail={"message": "File was changed by another save", "current_version": current},
+        headers={"ETag": _etag(current)} if current is not None else None,
+    )
+
+
 @router.get("/", response_model=List[FileResponse])
-def get_files(directory_id: str = None, db: Session = Depends(get_db)):
+def get_files(
+    response: Response,
+    directory_id: str = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    before: Optional[str] = None,
+    include_total: bool = False,
+    db: Session = Depends(get_db),
+):
+    query = lean_query(db.query(File), File, FileResponse)
     if directory_id:
-        files = db.query(File).filter(File.directory_id == directory_id).all()
-    else:
-        files = db.query(File).all()
-    return files
+        query = query.filter(File.directory_id == directory_id)
+    rows = newest_page(db, query, File, response, limit=limit, before=before, include_total=include_total)
+    return lean_response(rows, FileResponse, response)
 
 @router.get("/{file_id}", response_model=FileResponse)
-def get_file(file_id: str, db: Session = Depends(get_db)):
-    file = db.query(File).filter(File.id == file_id).first()
+def get_file(file_id: str, request: Request, response: Response, db: Session = Depends(get_db)):
+    # The 304 decision reads only the version; content is loaded once the
+    # client's copy is known to be out of date.
+    file = (
+        db.query(File)
+        .options(load_only(File.id, File.version, File.updated_at))
+        .filter(File.id == file_id)
+        .first()
+    )
+    if not file:
+        raise HTTPException(status_code=404, detail="File not found")
+    cached = not_modified(request, response, _etag(file.version), file.updated_at)
+    if cached is not None:
+        return cached
+    # One SELECT for every column instead of a lazy load per field.
+    file = db.query(File).populate_existing().filter(File.id == file_id).first()
     if not file:
         raise HTTPException(status_code=404, detail="File not found")
     return file
@@ -29,21 +72,87 @@ def create_file(file: FileCreate, db: Session = Depends(get_db)):
         directory_id=file.directory_id
     )
     db.add(db_file)
+    db.flush()
+    index_file(db, db_file)
     db.commit()
     db.refresh(db_file)
     return db_file
 
 @router.put("/{file_id}", response_model=FileResponse)
-def update_file(file_id: str, file: FileUpdate, db: Session = Depends(get_db)):
+def update_file(
+    file_id: str,
+    file: FileUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+):
     db_file = db.query(File).filter(File.id == file_id).first()
     if not db_file:
         raise HTTPException(status_code=404, detail="File not found")
+    expected = parse_version_tag(if_match)
+    if expected is not None and expected != db_file.version:
+        _version_conflict(db, file_id)
     db_file.name = file.name
     db_file.content = file.content
-    db.commit()
+    index_file(db, db_file)
+    response_cache.invalidate_file(db, file_id, content_hash(db_file.content))
+    try:
+        db.commit()
+    except StaleDataError:
+        _version_conflict(db, file_id)
     db.refresh(db_file)
+    response.headers["ETag"] = _etag(db_file.version)
     return db_file
 
+@router.patch("/{file_id}", response_model=FilePatchResponse)
+def patch_file(
+    file_id: str,
+    patch: FilePatch,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+):
+    """Apply editor deltas to the version the client last saw.
+
+    Returns only the new version and metadata, not the content.
+    """
+    base_version = patch.base_version if patch.base_version is not None else parse_version_tag(if_match)
+    if base_version is None:
+        raise HTTPException(status_code=428, detail="Send base_version or an If-Match header")
+    db_file = db.query(File).filter(File.id == file_id).first()
+    if not db_file:
+        raise HTTPException(status_code=404, detail="File not found")
+    if db_file.version != base_version:
+        _version_conflict(db, file_id)
+
+    try:
+        content = apply_text_ops(db_file.content or "", patch.edits)
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+
+    if patch.name is not None:
+        db_file.name = patch.name
+    if content != (db_file.content or ""):
+        db_file.content = content
+        # Unchanged chunks keep their index rows; only edited ones are re-tokenized.
+        index_file(db, db_file)
+        response_cache.invalidate_file(db, file_id, content_hash(content))
+
+    try:
+        db.flush()
+    except StaleDataError:
+        _version_conflict(db, file_id)
+    result = FilePatchResponse(
+        id=db_file.id,
+        name=db_file.name,
+        version=db_file.version,
+        length=len(content.encode("utf-16-le")) // 2,
+        updated_at=db_file.updated_at,
+    )
+    db.commit()
+    response.headers["ETag"] = _etag(result.version)
+    return result
+
 @router.delete("/{file_id}")
 def delete_file(file_id: str, db: Session = Depends(get_db)):
     file = db.query(File).filter(File.id == file_id).first()
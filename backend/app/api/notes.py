@@ -1,18 +1,38 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from app.models.database import get_db, Note
 from app.models.schemas import NoteCreate, NoteResponse
-from typing import List
+from app.services.http_cache import make_etag, not_modified
+from app.services.pagination import MAX_PAGE_SIZE, newest_page
+from app.services.serialization import lean_query, lean_response
+from typing import List, Optional
 
 router = APIRouter()
 
 @router.get("/file/{file_id}", response_model=List[NoteResponse])
-def get_notes(file_id: str, note_type: str = None, db: Session = Depends(get_db)):
+def get_notes(
+    file_id: str,
+    request: Request,
+    response: Response,
+    note_type: str = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    before: Optional[str] = None,
+    include_total: bool = False,
+    db: Session = Depends(get_db),
+):
     query = db.query(Note).filter(Note.file_id == file_id)
     if note_type:
         query = query.filter(Note.note_type == note_type)
-    notes = query.all()
-    return notes
+    fingerprint = query.with_entities(
+        func.count(Note.id), func.max(Note.updated_at), func.sum(func.length(Note.content))
+    ).one()
+    cached = not_modified(request, response, make_etag(*fingerprint, weak=True))
+    if cached is not None:
+        return cached
+    query = lean_query(query, Note, NoteResponse)
+    rows = newest_page(db, query, Note, response, limit=limit, before=before, include_total=include_total)
+    return lean_response(rows, NoteResponse, response)
 
 @router.post("/", response_model=NoteResponse)
 def create_note(note: NoteCreate, db: Session = Depends(get_db)):
@@ -1,140 +1,210 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.models.database import get_db, RevisionNote
-from app.models.schemas import RevisionNoteCreate, RevisionNoteResponse
+from app.models.database import get_db, get_async_db, File, RevisionNote
+from app.models.schemas import (
+    AUTO_DETECT, RevisionDigestResponse, RevisionNoteBulkCreate, RevisionNoteCreate, RevisionNoteResponse,
+    RevisionReview,
+)
 from app.agents.revision_agent import RevisionAgent
-from typing import List
-from datetime import datetime, timedelta
+from app.services.error_classifier import SOURCE_CLASSIFIER, SOURCE_USER, error_classifier
+from app.services.job_handlers import CLASSIFY_REVISION_NOTE
+from app.services.jobs import enqueue_job, job_queue
+from app.services.pagination import keyset_page
+from app.services.http_cache import make_etag, not_modified
+from app.services.progress import get_progress_stats, record_revision_activity
+from app.services.revision_digest import digest_inputs, digest_scheduler, find_digest, latest_digest
+from app.services.scheduler import schedule_review
+from app.services.serialization import lean_query, lean_response
+from typing import List, Optional
+from datetime import date, datetime, timedelta
+import os
 
 router = APIRouter()
 
+# Classify auto-detected notes in a background job instead of during the request.
+DEFER_CLASSIFICATION = os.getenv("REVISION_DEFER_CLASSIFICATION", "false").lower() == "true"
+
 @router.get("/file/{file_id}", response_model=List[RevisionNoteResponse])
-def get_revision_notes(file_id: str, db: Session = Depends(get_db)):
-    notes = db.query(RevisionNote).filter(
+def get_revision_notes(file_id: str, response: Response, db: Session = Depends(get_db)):
+    notes = lean_query(db.query(RevisionNote), RevisionNote, RevisionNoteResponse).filter(
         RevisionNote.file_id == file_id,
-        RevisionNote.is_resolved == "false"
+        RevisionNote.is_resolved == False
     ).order_by(RevisionNote.created_at.desc()).all()
-    return notes
+    return lean_response(notes, RevisionNoteResponse, response)
 
 @router.get("/today", response_model=List[RevisionNoteResponse])
-def get_today_revision_notes(db: Session = Depends(get_db)):
+def get_today_revision_notes(response: Response, db: Session = Depends(get_db)):
     today = datetime.now().date()
     tomorrow = today + timedelta(days=1)
     
-    notes = db.query(RevisionNote).filter(
-        RevisionNote.is_resolved == "false",
+    notes = lean_query(db.query(RevisionNote), RevisionNote, RevisionNoteResponse).filter(
+        RevisionNote.is_resolved == False,
         RevisionNote.created_at >= today,
         RevisionNote.created_at < tomorrow
     ).order_by(RevisionNote.created_at.desc()).all()
-    return notes
+    return lean_response(notes, RevisionNoteResponse, response)
 
 
 @router.get("/progress")
-def get_progress_stats(db: Session = Depends(get_db)):
-    notes = db.query(RevisionNote).all()
-    today = datetime.now().date()
+def get_progress(days: int = Query(7, ge=1, le=365), db: Session = Depends(get_db)):
+    return get_progress_stats(db, days=days)
 
-    def as_int(value: str | None) -> int:
-        try:
-            return int(value or "0")
-        except ValueError:
-            return 0
-
-    total_notes = len(notes)
-    resolved_notes = sum(1 for note in notes if note.is_resolved == "true")
-    pending_notes = total_notes - resolved_notes
-    total_reviews = sum(as_int(note.review_count) for note in notes)
-    reviewed_today = sum(
-        1
-        for note in notes
-        if as_int(note.review_count) > 0 and note.last_reviewed and note.last_reviewed.date() == today
+@router.get("/digest", response_model=RevisionDigestResponse)
+async def get_revision_digest(request: Request, response: Response, db: AsyncSession = Depends(get_async_db)):
+    # Never waits on the model: serve what is stored and let the scheduler
+    # catch up if the notes moved on since.
+    today = date.today()
+    notes, count, notes_hash = await digest_inputs(db, today)
+    if not notes:
+        return RevisionDigestResponse(digest_date=today)
+    digest = await find_digest(db, today, notes_hash)
+    stale = digest is None
+    if stale:
+        digest_scheduler.wake()
+        digest = await latest_digest(db)
+    if digest is None:
+        return RevisionDigestResponse(digest_date=today, note_count=count, stale=True)
+    cached = not_modified(request, response, make_etag(digest.id, stale, weak=True))
+    if cached is not None:
+        return cached
+    return RevisionDigestResponse(
+        digest_date=digest.digest_date,
+        summary=digest.summary,
+        note_count=digest.note_count,
+        generated_at=digest.created_at,
+        stale=stale,
     )
 
-    error_breakdown = {
-        "CONFUSION": 0,
-        "MISTAKE": 0,
-        "CONCEPT_MISUNDERSTANDING": 0,
-        "OTHER": 0,
-    }
-    for note in notes:
-        if note.error_type in error_breakdown:
-            error_breakdown[note.error_type] += 1
-        else:
-            error_breakdown["OTHER"] += 1
-
-    last_7_days = []
-    for day_offset in range(6, -1, -1):
-        day = today - timedelta(days=day_offset)
-        created_count = sum(1 for note in notes if note.created_at and note.created_at.date() == day)
-        reviewed_count = sum(
-            1
-            for note in notes
-            if as_int(note.review_count) > 0 and note.last_reviewed and note.last_reviewed.date() == day
-        )
-        last_7_days.append(
-            {
-                "date": day.isoformat(),
-                "created": created_count,
-                "reviewed": reviewed_count,
-            }
-        )
-
-    return {
-        "total_notes": total_notes,
-        "resolved_notes": resolved_notes,
-        "pending_notes": pending_notes,
-        "resolution_rate": round((resolved_notes / total_notes) * 100, 1) if total_notes else 0.0,
-        "total_reviews": total_reviews,
-        "average_reviews_per_note": round((total_reviews / total_notes), 2) if total_notes else 0.0,
-        "reviewed_today": reviewed_today,
-        "error_breakdown": error_breakdown,
-        "last_7_days": last_7_days,
-    }
-
 @router.get("/pending", response_model=List[RevisionNoteResponse])
-def get_pending_revision_notes(db: Session = Depends(get_db)):
-    notes = db.query(RevisionNote).filter(
-        RevisionNote.is_resolved == "false"
+def get_pending_revision_notes(response: Response, db: Session = Depends(get_db)):
+    notes = lean_query(db.query(RevisionNote), RevisionNote, RevisionNoteResponse).filter(
+        RevisionNote.is_resolved == False
     ).order_by(RevisionNote.last_reviewed.asc()).all()
-    return notes
+    return lean_response(notes, RevisionNoteResponse, response)
+
+@router.get("/due", response_model=List[RevisionNoteResponse])
+def get_due_revision_notes(
+    response: Response,
+    limit: int = Query(20, ge=1, le=200),
+    cursor: Optional[str] = None,
+    file_id: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    query = lean_query(db.query(RevisionNote), RevisionNote, RevisionNoteResponse).filter(
+        RevisionNote.is_resolved == False,
+        RevisionNote.due_at <= datetime.now()
+    )
+    if file_id:
+        query = query.filter(RevisionNote.file_id == file_id)
+    rows = keyset_page(db, query, RevisionNote, response, limit=limit, cursor=cursor, column=RevisionNote.due_at)
+    return lean_response(rows, RevisionNoteResponse, response)
 
 @router.post("/", response_model=RevisionNoteResponse)
-async def create_revision_note(note: RevisionNoteCreate, db: Session = Depends(get_db)):
+async def create_revision_note(
+    note: RevisionNoteCreate,
+    response: Response,
+    defer: bool = DEFER_CLASSIFICATION,
+    db: AsyncSession = Depends(get_async_db),
+):
     revision_agent = RevisionAgent()
     
-    if not note.error_type or note.error_type == "AUTO_DETECT":
-        detected_type = await revision_agent.detect_error_type(note.content)
-        note.error_type = detected_type
+    error_type_source = SOURCE_USER
+    pending = False
+    if not note.error_type or note.error_type == AUTO_DETECT:
+        if defer:
+            # The local classifier is cheap enough to try inline; only model calls are deferred.
+            detected_type = await error_classifier.predict(note.content)
+            error_type_source = SOURCE_CLASSIFIER if detected_type else None
+            pending = detected_type is None
+            note.error_type = detected_type or AUTO_DETECT
+        else:
+            detected_type, error_type_source = await revision_agent.classify_error_type(note.content)
+            note.error_type = detected_type
     
     db_note = RevisionNote(
         content=note.content,
         file_id=note.file_id,
         error_type=note.error_type,
-        is_resolved="false",
-        review_count="0"
+        error_type_source=error_type_source,
+        is_resolved=False,
+        review_count=0,
+        due_at=datetime.now()
     )
     db.add(db_note)
-    db.commit()
-    db.refresh(db_note)
+    await db.run_sync(record_revision_activity, created=1)
+    if pending:
+        await db.flush()
+        job = enqueue_job(db, CLASSIFY_REVISION_NOTE, {"note_id": db_note.id})
+        response.headers["X-Job-Id"] = job.id
+    await db.commit()
+    await db.refresh(db_note)
+    if pending:
+        job_queue.wake()
     return db_note
 
+@router.post("/bulk", response_model=List[RevisionNoteResponse])
+async def create_revision_notes_bulk(payload: RevisionNoteBulkCreate, db: AsyncSession = Depends(get_async_db)):
+    notes = payload.notes
+    file_ids = {note.file_id for note in notes}
+    found = set((await db.scalars(select(File.id).where(File.id.in_(file_ids)))).all())
+    missing = file_ids - found
+    if missing:
+        raise HTTPException(status_code=404, detail=f"File not found: {', '.join(sorted(missing))}")
+
+    # One batched classification call for every note that asks for it.
+    auto_detect = [i for i, note in enumerate(notes) if not note.error_type or note.error_type == AUTO_DETECT]
+    sources = [SOURCE_USER] * len(notes)
+    if auto_detect:
+        revision_agent = RevisionAgent()
+        labels = await revision_agent.classify_error_types([notes[i].content for i in auto_detect])
+        for i, (label, source) in zip(auto_detect, labels):
+            notes[i].error_type = label
+            sources[i] = source
+
+    now = datetime.now()
+    rows = [
+        {
+            "content": note.content,
+            "file_id": note.file_id,
+            "error_type": note.error_type,
+            "error_type_source": source,
+            "is_resolved": False,
+            "review_count": 0,
+            "due_at": now,
+        }
+        for note, source in zip(notes, sources)
+    ]
+    created = (
+        await db.scalars(insert(RevisionNote).returning(RevisionNote, sort_by_parameter_order=True), rows)
+    ).all()
+    await db.run_sync(record_revision_activity, created=len(created))
+    await db.commit()
+    return created
+
 @router.put("/{note_id}/resolve", response_model=RevisionNoteResponse)
 def resolve_revision_note(note_id: str, db: Session = Depends(get_db)):
     note = db.query(RevisionNote).filter(RevisionNote.id == note_id).first()
     if not note:
         raise HTTPException(status_code=404, detail="Revision note not found")
-    note.is_resolved = "true"
+    if not note.is_resolved:
+        record_revision_activity(db, resolved=1)
+    note.is_resolved = True
     db.commit()
     db.refresh(note)
     return note
 
 @router.put("/{note_id}/review", response_model=RevisionNoteResponse)
-def mark_as_reviewed(note_id: str, db: Session = Depends(get_db)):
+def mark_as_reviewed(note_id: str, review: Optional[RevisionReview] = None, db: Session = Depends(get_db)):
     note = db.query(RevisionNote).filter(RevisionNote.id == note_id).first()
     if not note:
         raise HTTPException(status_code=404, detail="Revision note not found")
-    note.last_reviewed = datetime.now()
-    note.review_count = str(int(note.review_count) + 1)
+    # The rollup counts notes reviewed per day, not review events, like the backfill.
+    reviewed_before = note.last_reviewed.astimezone().date() if note.review_count and note.last_reviewed else None
+    schedule_review(note, (review or RevisionReview()).quality)
+    if reviewed_before != note.last_reviewed.date():
+        record_revision_activity(db, reviewed=1)
     db.commit()
     db.refresh(note)
     return note
@@ -0,0 +1,29 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy.orm import Session
+from app.models.database import get_db
+from app.models.schemas import SearchResult
+from app.services.search import SEARCH_KINDS, search
+from typing import List, Optional
+
+router = APIRouter()
+
+@router.get("/", response_model=List[SearchResult])
+def search_content(
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=500),
+    kind: Optional[List[str]] = Query(None),
+    file_id: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    unknown = set(kind or []) - set(SEARCH_KINDS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown kind: {', '.join(sorted(unknown))}")
+    # Results are ranked, so the cursor is simply the offset of the next page.
+    offset = int(cursor) if cursor and cursor.isdigit() else 0
+    results = search(db, q, kinds=kind, file_id=file_id, limit=limit + 1, offset=offset)
+    if len(results) > limit:
+        results = results[:limit]
+        response.headers["X-Next-Cursor"] = str(offset + limit)
+    return results
@@ -1,11 +1,66 @@
+import asyncio
+import logging
 import os
+import time
+from contextlib import asynccontextmanager
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from app.api import directories, files, notes, chat, revision
-from app.models.database import engine, Base
+from fastapi.middleware.gzip import GZipMiddleware
+from sqlalchemy import text
 
-app = FastAPI(title="UPSC Learning Hub API", version="1.0.0")
+from app import IMPORT_STARTED
+from app.agents.gateway import LLMUnavailableError, llm_gateway
+from app.api import directories, files, notes, chat, revision, jobs, search
+from app.models.database import async_engine, engine
+from app.models.migrations import run_migrations
+from app.services.error_classifier import error_classifier
+from app.services import job_handlers  # noqa: F401  registers job handlers
+from app.services.jobs import job_queue
+from app.services.llm_cache import response_cache
+from app.services.metrics import (
+    METRICS_ENABLED,
+    Gauge,
+    MetricsMiddleware,
+    instrument_engine,
+    register_stats,
+    render_metrics,
+)
+from app.services.revision_digest import digest_scheduler
+
+logger = logging.getLogger(__name__)
+
+# Run migrations on startup. Set to false where they run as a separate
+# deploy step (python -m app.models.migrations) so instances boot faster.
+AUTO_MIGRATE = os.getenv("AUTO_MIGRATE", "true").lower() == "true"
+
+startup_seconds: dict = {}
+Gauge(
+    "app_startup_seconds",
+    "Time spent in each startup phase.",
+    lambda: {(phase,): seconds for phase, seconds in startup_seconds.items()},
+    labels=("phase",),
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    started = time.perf_counter()
+    if AUTO_MIGRATE:
+        await asyncio.to_thread(run_migrations, engine)
+    startup_seconds["migrations"] = time.perf_counter() - started
+    await job_queue.start()
+    await digest_scheduler.start()
+    startup_seconds["total"] = time.perf_counter() - IMPORT_STARTED
+    logger.info("Started in %.2fs (import %.2fs, migrations %.2fs)", startup_seconds["total"],
+                startup_seconds["import"], startup_seconds["migrations"])
+    yield
+    await digest_scheduler.stop()
+    await job_queue.stop()
+
+
+app = FastAPI(title="UPSC Learning Hub API", version="1.0.0", lifespan=lifespan)
 
 
 def _parse_cors_origins() -> list[str]:
@@ -21,15 +76,53 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Total-Count", "X-Job-Id", "ETag", "Server-Timing"],
 )
 
-Base.metadata.create_all(bind=engine)
+# Compress text payloads above the threshold. Brotli is used when the
+# optional brotli-asgi package is installed; it falls back to gzip for
+# clients that do not accept br. SSE streams, import progress and zip
+# exports are never buffered.
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+try:
+    from brotli_asgi import BrotliMiddleware
+except ImportError:
+    app.add_middleware(GZipMiddleware, minimum_size=COMPRESSION_MIN_BYTES)
+else:
+    app.add_middleware(
+        BrotliMiddleware,
+        minimum_size=COMPRESSION_MIN_BYTES,
+        excluded_handlers=[
+            r"^/api/chat/file/[^/]+/stream$",
+            r"^/api/directories/import$",
+            r"^/api/directories/[^/]+/export$",
+        ],
+    )
+
+# Outermost, so latency includes compression and CORS handling.
+app.add_middleware(MetricsMiddleware)
+instrument_engine(engine)
+instrument_engine(async_engine.sync_engine)
+register_stats("llm_cache", "Response cache counters.", response_cache.stats)
+register_stats("error_classifier", "Local error classifier counters.", error_classifier.stats)
+register_stats("job_queue", "Background job queue counters.", job_queue.stats)
+register_stats("revision_digest", "Daily revision digest scheduler counters.", digest_scheduler.stats)
+register_stats("llm_gateway", "Model call gateway queue and retry counters.", llm_gateway.stats)
+
+
+@app.exception_handler(LLMUnavailableError)
+async def llm_unavailable_handler(request: Request, exc: LLMUnavailableError):
+    return JSONResponse(
+        {"detail": str(exc)}, status_code=503, headers={"Retry-After": str(exc.retry_after)}
+    )
 
 app.include_router(directories.router, prefix="/api/directories", tags=["Directories"])
 app.include_router(files.router, prefix="/api/files", tags=["Files"])
 app.include_router(notes.router, prefix="/api/notes", tags=["Notes"])
 app.include_router(chat.router, prefix="/api/chat", tags=["Chat"])
 app.include_router(revision.router, prefix="/api/revision", tags=["Revision"])
+app.include_router(jobs.router, prefix="/api/jobs", tags=["Jobs"])
+app.include_router(search.router, prefix="/api/search", tags=["Search"])
 
 @app.get("/")
 async def root():
@@ -38,3 +131,26 @@ async def root():
 @app.get("/health")
 async def health_check():
     return {"status": "healthy"}
+
+@app.get("/ready")
+def readiness_check():
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+    except Exception as exc:
+        logger.warning("Readiness check failed: %s", exc)
+        return JSONResponse({"status": "unavailable", "database": "unreachable"}, status_code=503)
+    return {"status": "ready", "database": "ok"}
+
+@app.get("/cache/stats")
+async def cache_stats():
+    return {**response_cache.stats(), "error_classifier": error_classifier.stats()}
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    if not METRICS_ENABLED:
+        return PlainTextResponse("metrics disabled\n", status_code=404)
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
+startup_seconds["import"] = time.perf_counter() - IMPORT_STARTED
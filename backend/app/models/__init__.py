@@ -1,7 +1,7 @@
-from .database import Base, engine, get_db
+from .database import Base, engine, async_engine, get_db, get_async_db
 from .schemas import (
-    DirectoryCreate, DirectoryResponse,
-    FileCreate, FileResponse,
+    DirectoryCreate, DirectoryResponse, DirectoryTreeNode,
+    FileCreate, FileResponse, FileSummary,
     NoteCreate, NoteResponse,
     RevisionNoteCreate, RevisionNoteResponse,
     ChatMessageCreate, ChatMessageResponse
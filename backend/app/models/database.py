@@ -1,13 +1,14 @@
 import os
+import threading
 import uuid
+from datetime import datetime, timedelta, timezone
 from urllib.parse import quote_plus
 
-from dotenv import load_dotenv
-from sqlalchemy import Column, DateTime, ForeignKey, String, Text, create_engine
+from sqlalchemy import Boolean, Column, Date, DateTime, Float, ForeignKey, Index, Integer, String, Text, create_engine, event, false
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import declarative_base, relationship, sessionmaker
 from sqlalchemy.sql import func
 
-load_dotenv()
 
 def _build_database_url() -> str:
     # 1) Prefer DATABASE_URL directly (recommended for production).
@@ -47,22 +48,82 @@ DATABASE_URL = _build_database_url()
 if DATABASE_URL.startswith("file:"):
     DATABASE_URL = DATABASE_URL.replace("file:", "sqlite:///", 1)
 
+
+def _build_async_database_url(database_url: str) -> str:
+    # Explicit override, e.g. when the sync URL carries driver-specific options.
+    async_database_url = os.getenv("ASYNC_DATABASE_URL")
+    if async_database_url:
+        return async_database_url
+
+    if database_url.startswith("sqlite:"):
+        return database_url.replace("sqlite:", "sqlite+aiosqlite:", 1)
+    for prefix in ("postgresql+psycopg://", "postgresql+psycopg2://", "postgresql://", "postgres://"):
+        if database_url.startswith(prefix):
+            return "postgresql+asyncpg://" + database_url[len(prefix):]
+    return database_url
+
+
+ASYNC_DATABASE_URL = _build_async_database_url(DATABASE_URL)
+
 engine = create_engine(
     DATABASE_URL,
     connect_args={"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {},
 )
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def _enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    # SQLite ignores REFERENCES / ON DELETE CASCADE unless asked per connection.
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+
+# Async engine for endpoints that await model calls, so database I/O never
+# blocks the event loop while other requests are waiting on Gemini.
+async_engine = create_async_engine(ASYNC_DATABASE_URL)
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+if DATABASE_URL.startswith("sqlite"):
+    event.listen(engine, "connect", _enable_sqlite_foreign_keys)
+if ASYNC_DATABASE_URL.startswith("sqlite"):
+    event.listen(async_engine.sync_engine, "connect", _enable_sqlite_foreign_keys)
 Base = declarative_base()
 
 def generate_uuid():
     return str(uuid.uuid4())
 
+_message_clock = threading.Lock()
+_last_message_time = datetime.min.replace(tzinfo=timezone.utc)
+
+
+def message_timestamp() -> datetime:
+    """UTC time with microseconds, strictly increasing within the process.
+
+    Chat messages are ordered by it, so a question and its reply written in
+    the same second still sort in the order they were written.
+    """
+    global _last_message_time
+    with _message_clock:
+        now = datetime.now(timezone.utc)
+        if now <= _last_message_time:
+            now = _last_message_time + timedelta(microseconds=1)
+        _last_message_time = now
+        return now
+
 class Directory(Base):
     __tablename__ = "directories"
+    __table_args__ = (
+        # text_pattern_ops lets Postgres answer ``path LIKE 'prefix%'`` from the index.
+        Index("ix_directories_path", "path", postgresql_ops={"path": "text_pattern_ops"}),
+    )
     
     id = Column(String, primary_key=True, default=generate_uuid)
     name = Column(String, nullable=False)
-    parent_id = Column(String, ForeignKey("directories.id", ondelete="CASCADE"), nullable=True)
+    parent_id = Column(String, ForeignKey("directories.id", ondelete="CASCADE"), nullable=True, index=True)
+    # Ids from the root down to this directory: "/<root id>/.../<id>/".
+    # SQLite only uses an index for LIKE on a NOCASE column; ids are lowercase.
+    path = Column(String().with_variant(String(collation="NOCASE"), "sqlite"), nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     
@@ -72,11 +133,15 @@ class Directory(Base):
 
 class File(Base):
     __tablename__ = "files"
+    __table_args__ = (
+        Index("ix_files_directory_created", "directory_id", "created_at"),
+    )
     
     id = Column(String, primary_key=True, default=generate_uuid)
     name = Column(String, nullable=False)
     content = Column(Text, default="")
     directory_id = Column(String, ForeignKey("directories.id", ondelete="CASCADE"), nullable=False)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     
@@ -84,9 +149,17 @@ class File(Base):
     notes = relationship("Note", back_populates="file", cascade="all, delete-orphan")
     chat_messages = relationship("ChatMessage", back_populates="file", cascade="all, delete-orphan")
     revision_notes = relationship("RevisionNote", back_populates="file", cascade="all, delete-orphan")
+    chunks = relationship("FileChunk", back_populates="file", cascade="all, delete-orphan")
+    
+    # Every ORM update bumps the version and fails with StaleDataError if the
+    # row changed since it was loaded.
+    __mapper_args__ = {"version_id_col": version}
 
 class Note(Base):
     __tablename__ = "notes"
+    __table_args__ = (
+        Index("ix_notes_file_type_created", "file_id", "note_type", "created_at"),
+    )
     
     id = Column(String, primary_key=True, default=generate_uuid)
     content = Column(Text, nullable=False)
@@ -99,29 +172,124 @@ class Note(Base):
 
 class RevisionNote(Base):
     __tablename__ = "revision_notes"
+    __table_args__ = (
+        Index("ix_revision_notes_file_resolved_created", "file_id", "is_resolved", "created_at"),
+        Index("ix_revision_notes_resolved_created", "is_resolved", "created_at"),
+        Index("ix_revision_notes_resolved_last_reviewed", "is_resolved", "last_reviewed"),
+        Index("ix_revision_notes_error_type", "error_type"),
+        Index("ix_revision_notes_resolved_due", "is_resolved", "due_at", "id"),
+    )
     
     id = Column(String, primary_key=True, default=generate_uuid)
     content = Column(Text, nullable=False)
     file_id = Column(String, ForeignKey("files.id", ondelete="CASCADE"), nullable=False)
     error_type = Column(String, nullable=False)  # CONFUSION, MISTAKE, CONCEPT_MISUNDERSTANDING
-    is_resolved = Column(String, default="false")  # true/false
+    error_type_source = Column(String, nullable=True)  # user, model, classifier
+    is_resolved = Column(Boolean, nullable=False, default=False, server_default=false())
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     last_reviewed = Column(DateTime(timezone=True), server_default=func.now())
-    review_count = Column(String, default="0")
+    review_count = Column(Integer, nullable=False, default=0, server_default="0")
+    # Spaced-repetition state (SM-2).
+    due_at = Column(DateTime(timezone=True), server_default=func.now())
+    interval_days = Column(Float, nullable=False, default=0.0, server_default="0")
+    ease_factor = Column(Float, nullable=False, default=2.5, server_default="2.5")
+    repetitions = Column(Integer, nullable=False, default=0, server_default="0")
     
     file = relationship("File", back_populates="revision_notes")
 
+class RevisionDailyStat(Base):
+    __tablename__ = "revision_daily_stats"
+    
+    day = Column(Date, primary_key=True)
+    created = Column(Integer, nullable=False, default=0)
+    reviewed = Column(Integer, nullable=False, default=0)
+    resolved = Column(Integer, nullable=False, default=0)
+
+class RevisionDigest(Base):
+    __tablename__ = "revision_digests"
+    __table_args__ = (
+        Index("ux_revision_digests_date_hash", "digest_date", "notes_hash", unique=True),
+    )
+
+    id = Column(String, primary_key=True, default=generate_uuid)
+    digest_date = Column(Date, nullable=False)
+    # Hash of the notes (and prompt) the summary was generated from.
+    notes_hash = Column(String, nullable=False)
+    note_count = Column(Integer, nullable=False)
+    summary = Column(Text, nullable=False)
+    created_at = Column(DateTime, nullable=False)
+
 class ChatMessage(Base):
     __tablename__ = "chat_messages"
+    __table_args__ = (
+        Index("ix_chat_messages_file_created", "file_id", "created_at"),
+    )
     
     id = Column(String, primary_key=True, default=generate_uuid)
     role = Column(String, nullable=False)  # user, assistant
     content = Column(Text, nullable=False)
     file_id = Column(String, ForeignKey("files.id", ondelete="CASCADE"), nullable=False)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), default=message_timestamp, server_default=func.now())
     
     file = relationship("File", back_populates="chat_messages")
 
+class ConversationSummary(Base):
+    __tablename__ = "conversation_summaries"
+
+    file_id = Column(String, ForeignKey("files.id", ondelete="CASCADE"), primary_key=True)
+    summary = Column(Text, nullable=False, default="")
+    # Last chat message folded into the summary. Messages created after
+    # through_created_at are not summarized yet.
+    through_message_id = Column(String, nullable=False)
+    through_created_at = Column(DateTime(timezone=True), nullable=True)
+    message_count = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class FileChunk(Base):
+    __tablename__ = "file_chunks"
+    
+    id = Column(String, primary_key=True, default=generate_uuid)
+    file_id = Column(String, ForeignKey("files.id", ondelete="CASCADE"), nullable=False, index=True)
+    position = Column(Integer, nullable=False)
+    content = Column(Text, nullable=False)
+    content_hash = Column(String, nullable=False)
+    token_count = Column(Integer, nullable=False)
+    term_counts = Column(Text, nullable=False)  # JSON object of term -> count
+    
+    file = relationship("File", back_populates="chunks")
+
+class LLMCacheEntry(Base):
+    __tablename__ = "llm_cache"
+    
+    key = Column(String, primary_key=True)
+    model = Column(String, nullable=False)
+    template = Column(String, nullable=False)
+    file_id = Column(String, nullable=True, index=True)
+    content_hash = Column(String, nullable=True)
+    response = Column(Text, nullable=False)
+    created_at = Column(DateTime, nullable=False)
+    last_accessed = Column(DateTime, nullable=False, index=True)
+    hit_count = Column(Integer, nullable=False, default=0)
+
+class Job(Base):
+    __tablename__ = "jobs"
+    __table_args__ = (
+        Index("ix_jobs_status_run_after", "status", "run_after"),
+    )
+    
+    id = Column(String, primary_key=True, default=generate_uuid)
+    kind = Column(String, nullable=False)
+    payload = Column(Text, nullable=False, default="{}")  # JSON object
+    status = Column(String, nullable=False, default="queued")  # queued, running, succeeded, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    run_after = Column(DateTime, nullable=False)
+    result = Column(Text, nullable=True)  # JSON
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, nullable=False)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
 
 def get_db():
     db = SessionLocal()
@@ -129,3 +297,8 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
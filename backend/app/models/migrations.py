@@ -0,0 +1,194 @@
+import logging
+
+from sqlalchemy import inspect
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+from sqlalchemy.types import Boolean, Integer
+
+from app.models.database import Base, RevisionNote, engine
+from app.services.search import ensure_search_index
+
+logger = logging.getLogger(__name__)
+
+# `Base.metadata.create_all` only creates missing tables. Each step below
+# upgrades an existing database in place and is a no-op once applied, so
+# the whole list is safe to run on every start.
+
+
+def _columns(conn: Connection, table: str) -> dict:
+    return {column["name"]: column for column in inspect(conn).get_columns(table)}
+
+
+def _rebuild_sqlite_table(conn: Connection, table, select_overrides: dict) -> None:
+    # SQLite cannot change a column type, so copy the rows into a fresh table.
+    legacy = f"{table.name}_legacy"
+    for index in inspect(conn).get_indexes(table.name):
+        conn.exec_driver_sql(f'DROP INDEX IF EXISTS "{index["name"]}"')
+    conn.exec_driver_sql(f'ALTER TABLE "{table.name}" RENAME TO "{legacy}"')
+    table.create(conn)
+
+    legacy_columns = _columns(conn, legacy)
+    targets, sources = [], []
+    for column in table.columns:
+        if column.name in select_overrides:
+            sources.append(select_overrides[column.name])
+        elif column.name in legacy_columns:
+            sources.append(f'"{column.name}"')
+        else:
+            continue
+        targets.append(f'"{column.name}"')
+
+    conn.exec_driver_sql(
+        f'INSERT INTO "{table.name}" ({", ".join(targets)}) SELECT {", ".join(sources)} FROM "{legacy}"'
+    )
+    conn.exec_driver_sql(f'DROP TABLE "{legacy}"')
+
+
+def add_missing_columns(conn: Connection) -> None:
+    """Add model columns that an older schema lacks.
+
+    Only constant server defaults can be applied here (SQLite rejects
+    expressions in ADD COLUMN); other columns are added nullable and
+    backfilled by a dedicated step.
+    """
+    for table in Base.metadata.sorted_tables:
+        existing = _columns(conn, table.name)
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            logger.info("Adding column %s.%s", table.name, column.name)
+            ddl = f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column.type.compile(dialect=conn.dialect)}'
+            default = column.server_default.arg if column.server_default is not None else None
+            if isinstance(default, str):
+                ddl += f" DEFAULT '{default}'"
+                if not column.nullable:
+                    ddl += " NOT NULL"
+            conn.exec_driver_sql(ddl)
+
+
+def convert_revision_note_types(conn: Connection) -> None:
+    """Store is_resolved as BOOLEAN and review_count as INTEGER."""
+    columns = _columns(conn, "revision_notes")
+    if isinstance(columns["is_resolved"]["type"], Boolean) and isinstance(columns["review_count"]["type"], Integer):
+        return
+
+    logger.info("Converting revision_notes.is_resolved/review_count to typed columns")
+    if conn.dialect.name == "sqlite":
+        _rebuild_sqlite_table(
+            conn,
+            RevisionNote.__table__,
+            {
+                "is_resolved": "CASE WHEN lower(is_resolved) IN ('true', '1') THEN 1 ELSE 0 END",
+                "review_count": "CAST(COALESCE(NULLIF(review_count, ''), '0') AS INTEGER)",
+            },
+        )
+        return
+
+    for statement in (
+        "ALTER TABLE revision_notes ALTER COLUMN is_resolved DROP DEFAULT",
+        "ALTER TABLE revision_notes ALTER COLUMN is_resolved TYPE BOOLEAN "
+        "USING COALESCE(lower(is_resolved) IN ('true', '1'), false)",
+        "ALTER TABLE revision_notes ALTER COLUMN is_resolved SET DEFAULT false",
+        "ALTER TABLE revision_notes ALTER COLUMN is_resolved SET NOT NULL",
+        "ALTER TABLE revision_notes ALTER COLUMN review_count DROP DEFAULT",
+        "ALTER TABLE revision_notes ALTER COLUMN review_count TYPE INTEGER "
+        "USING COALESCE(NULLIF(review_count, '')::integer, 0)",
+        "ALTER TABLE revision_notes ALTER COLUMN review_count SET DEFAULT 0",
+        "ALTER TABLE revision_notes ALTER COLUMN review_count SET NOT NULL",
+    ):
+        conn.exec_driver_sql(statement)
+
+
+def backfill_revision_due_dates(conn: Connection) -> None:
+    conn.exec_driver_sql(
+        "UPDATE revision_notes SET due_at = COALESCE(last_reviewed, created_at, CURRENT_TIMESTAMP) "
+        "WHERE due_at IS NULL"
+    )
+
+
+def delete_orphaned_rows(conn: Connection) -> None:
+    """Drop rows whose parent is gone.
+
+    SQLite connections did not enforce foreign keys before, so deletes could
+    leave children behind. They would now fail any table rebuild.
+    """
+    if conn.dialect.name != "sqlite":
+        return
+    while True:
+        deleted = conn.exec_driver_sql(
+            "DELETE FROM directories WHERE parent_id IS NOT NULL "
+            "AND parent_id NOT IN (SELECT id FROM directories)"
+        ).rowcount
+        if not deleted:
+            break
+        logger.info("Deleted %d orphaned directories", deleted)
+    deleted = conn.exec_driver_sql(
+        "DELETE FROM files WHERE directory_id NOT IN (SELECT id FROM directories)"
+    ).rowcount
+    if deleted:
+        logger.info("Deleted %d orphaned files", deleted)
+    for table in ("notes", "revision_notes", "chat_messages", "file_chunks"):
+        deleted = conn.exec_driver_sql(
+            f'DELETE FROM "{table}" WHERE file_id NOT IN (SELECT id FROM files)'
+        ).rowcount
+        if deleted:
+            logger.info("Deleted %d orphaned rows from %s", deleted, table)
+
+
+def backfill_directory_paths(conn: Connection) -> None:
+    """Fill directories.path one tree level per statement."""
+    conn.exec_driver_sql(
+        "UPDATE directories SET path = '/' || id || '/' WHERE path IS NULL AND parent_id IS NULL"
+    )
+    while conn.exec_driver_sql(
+        "UPDATE directories SET path = "
+        "(SELECT parent.path FROM directories parent WHERE parent.id = directories.parent_id) || id || '/' "
+        "WHERE path IS NULL AND parent_id IN (SELECT id FROM directories WHERE path IS NOT NULL)"
+    ).rowcount:
+        pass
+    missing = conn.exec_driver_sql("SELECT COUNT(*) FROM directories WHERE path IS NULL").scalar()
+    if missing:
+        logger.warning("%d directories are in a parent cycle and have no path", missing)
+
+
+def backfill_summary_watermarks(conn: Connection) -> None:
+    conn.exec_driver_sql(
+        "UPDATE conversation_summaries SET through_created_at = "
+        "(SELECT created_at FROM chat_messages WHERE chat_messages.id = conversation_summaries.through_message_id) "
+        "WHERE through_created_at IS NULL"
+    )
+
+
+def ensure_indexes(conn: Connection) -> None:
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+
+
+MIGRATIONS = [
+    add_missing_columns,
+    delete_orphaned_rows,
+    convert_revision_note_types,
+    backfill_revision_due_dates,
+    backfill_directory_paths,
+    backfill_summary_watermarks,
+]
+
+
+def run_migrations(bind: Engine = engine) -> None:
+    from app.services.progress import backfill_daily_stats
+
+    Base.metadata.create_all(bind=bind)
+    with bind.begin() as conn:
+        for migration in MIGRATIONS:
+            migration(conn)
+        ensure_indexes(conn)
+        ensure_search_index(conn)
+
+    with Session(bind=bind) as db:
+        backfill_daily_stats(db)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    run_migrations()
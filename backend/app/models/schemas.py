@@ -1,6 +1,7 @@
-from pydantic import BaseModel
-from typing import Optional, List
-from datetime import datetime
+import json
+from pydantic import BaseModel, Field, field_validator
+from typing import Any, Optional, List
+from datetime import date, datetime
 
 class DirectoryBase(BaseModel):
     name: str
@@ -19,6 +20,26 @@ class DirectoryResponse(DirectoryBase):
     class Config:
         from_attributes = True
 
+class DirectoryCrumb(BaseModel):
+    id: str
+    name: str
+
+class FileSummary(BaseModel):
+    id: str
+    name: str
+    directory_id: str
+    size: int
+    updated_at: datetime
+
+class DirectoryTreeNode(BaseModel):
+    id: str
+    name: str
+    parent_id: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+    children: List["DirectoryTreeNode"] = []
+    files: List[FileSummary] = []
+
 class FileBase(BaseModel):
     name: str
     content: str = ""
@@ -32,12 +53,31 @@ class FileUpdate(FileBase):
 class FileResponse(FileBase):
     id: str
     directory_id: str
+    version: int = 1
     created_at: datetime
     updated_at: datetime
 
     class Config:
         from_attributes = True
 
+class TextEdit(BaseModel):
+    # Replace [start, end) of the base version with text; offsets are UTF-16 code units.
+    start: int = Field(..., ge=0)
+    end: int = Field(..., ge=0)
+    text: str = ""
+
+class FilePatch(BaseModel):
+    base_version: Optional[int] = None  # or send If-Match: "<version>"
+    name: Optional[str] = None
+    edits: List[TextEdit] = Field(default_factory=list, max_length=1000)
+
+class FilePatchResponse(BaseModel):
+    id: str
+    name: str
+    version: int
+    length: int
+    updated_at: datetime
+
 class NoteBase(BaseModel):
     content: str
     note_type: str
@@ -54,6 +94,9 @@ class NoteResponse(NoteBase):
     class Config:
         from_attributes = True
 
+ERROR_TYPES = ("CONFUSION", "MISTAKE", "CONCEPT_MISUNDERSTANDING")
+AUTO_DETECT = "AUTO_DETECT"
+
 class RevisionNoteBase(BaseModel):
     content: str
     error_type: str  # CONFUSION, MISTAKE, CONCEPT_MISUNDERSTANDING
@@ -64,14 +107,34 @@ class RevisionNoteCreate(RevisionNoteBase):
 class RevisionNoteResponse(RevisionNoteBase):
     id: str
     file_id: str
-    is_resolved: str
+    is_resolved: bool
     created_at: datetime
     last_reviewed: datetime
-    review_count: str
+    review_count: int
+    error_type_source: Optional[str] = None
+    due_at: Optional[datetime] = None
+    interval_days: float = 0.0
+    ease_factor: float = 2.5
+    repetitions: int = 0
 
     class Config:
         from_attributes = True
 
+class RevisionNoteBulkCreate(BaseModel):
+    notes: List[RevisionNoteCreate] = Field(..., min_length=1, max_length=200)
+
+class RevisionReview(BaseModel):
+    quality: int = Field(4, ge=0, le=5)  # SM-2 grade: 0 = blackout, 5 = perfect recall
+
+class RevisionDigestResponse(BaseModel):
+    digest_date: Optional[date] = None
+    summary: Optional[str] = None
+    note_count: int = 0
+    generated_at: Optional[datetime] = None
+    # True when the notes changed since the summary was generated; a new
+    # one is on its way.
+    stale: bool = False
+
 class ChatMessageBase(BaseModel):
     content: str
 
@@ -86,3 +149,31 @@ class ChatMessageResponse(ChatMessageBase):
 
     class Config:
         from_attributes = True
+
+class JobResponse(BaseModel):
+    id: str
+    kind: str
+    status: str  # queued, running, succeeded, failed
+    attempts: int
+    max_attempts: int
+    result: Optional[Any] = None
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    @field_validator("result", mode="before")
+    @classmethod
+    def _decode_result(cls, value):
+        return json.loads(value) if isinstance(value, str) else value
+
+    class Config:
+        from_attributes = True
+
+class SearchResult(BaseModel):
+    kind: str  # file, note, revision_note, chat_message
+    id: str
+    file_id: str
+    file_name: Optional[str] = None
+    snippet: str  # HTML-escaped text, matched terms wrapped in <mark></mark>
+    score: float
@@ -0,0 +1,191 @@
+import json
+import logging
+import os
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, load_only
+
+from app.agents.chat_agent import ChatAgent
+from app.models.database import AsyncSessionLocal, ChatMessage, ConversationSummary, Job
+from app.services.jobs import QUEUED, RUNNING, enqueue_job
+from app.services.retrieval import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+SUMMARIZE_CONVERSATION = "summarize_conversation"
+
+# Recent turns are sent verbatim up to this many tokens; anything older is
+# only represented by the file's rolling summary.
+CHAT_HISTORY_TOKENS = int(os.getenv("CHAT_HISTORY_TOKENS", "1500"))
+CHAT_SUMMARY_TOKENS = int(os.getenv("CHAT_SUMMARY_TOKENS", "400"))
+# Turns that fell out of the window are summarized once they add up to this.
+CHAT_SUMMARIZE_AFTER_TOKENS = int(os.getenv("CHAT_SUMMARIZE_AFTER_TOKENS", "1000"))
+# Upper bound on the turns folded into the summary by one model call.
+CHAT_SUMMARY_BATCH_TOKENS = int(os.getenv("CHAT_SUMMARY_BATCH_TOKENS", "4000"))
+
+# Rows read per turn, whatever the length of the conversation.
+HISTORY_SCAN_MESSAGES = 200
+SPEAKERS = {"user": "Student", "assistant": "Tutor"}
+
+
+@dataclass
+class ConversationMemory:
+    summary: str = ""
+    turns: List[Tuple[str, str]] = field(default_factory=list)  # (role, content), oldest first
+    # Unsummarized tokens that no longer fit the window.
+    overflow_tokens: int = 0
+
+    def render(self) -> str:
+        sections = []
+        if self.summary:
+            sections.append(f"Earlier in this conversation (summary):\n{self.summary}")
+        if self.turns:
+            sections.append("Recent conversation:\n" + format_turns(self.turns))
+        return "\n\n".join(sections)
+
+    @property
+    def needs_summary(self) -> bool:
+        return self.overflow_tokens >= CHAT_SUMMARIZE_AFTER_TOKENS
+
+
+def format_turns(turns: List[Tuple[str, str]]) -> str:
+    return "\n".join(f"{SPEAKERS.get(role, role)}: {content}" for role, content in turns)
+
+
+def _clip(text: str, max_tokens: int) -> str:
+    max_chars = max_tokens * 4
+    return text if len(text) <= max_chars else text[:max_chars].rstrip() + " …"
+
+
+def _unsummarized(
+    db: Session,
+    file_id: str,
+    state: Optional[ConversationSummary],
+    exclude_id: Optional[str] = None,
+    newest_first: bool = True,
+) -> List[ChatMessage]:
+    """Messages after the summary, at most ``HISTORY_SCAN_MESSAGES`` of them."""
+    query = (
+        db.query(ChatMessage)
+        .options(load_only(ChatMessage.id, ChatMessage.role, ChatMessage.content, ChatMessage.created_at))
+        .filter(ChatMessage.file_id == file_id)
+    )
+    if state is not None and state.through_created_at is not None:
+        # created_at is set in Python with microseconds and only ever
+        # increases, so it orders the conversation on its own.
+        query = query.filter(ChatMessage.created_at > state.through_created_at)
+    if exclude_id is not None:
+        query = query.filter(ChatMessage.id != exclude_id)
+    if newest_first:
+        query = query.order_by(ChatMessage.created_at.desc(), ChatMessage.id.desc())
+    else:
+        query = query.order_by(ChatMessage.created_at.asc(), ChatMessage.id.asc())
+    return query.limit(HISTORY_SCAN_MESSAGES).all()
+
+
+def _window(messages: List[ChatMessage]) -> List[Tuple[str, str]]:
+    """The newest-first ``messages`` that fit ``CHAT_HISTORY_TOKENS``, as turns."""
+    turns: List[Tuple[str, str]] = []
+    used = 0
+    for message in messages:
+        # One long answer should not crowd out every other turn.
+        content = _clip(message.content, CHAT_HISTORY_TOKENS // 2)
+        used += estimate_tokens(content)
+        if used > CHAT_HISTORY_TOKENS:
+            break
+        turns.append((message.role, content))
+    return turns
+
+
+def load_memory(db: Session, file_id: str, exclude_id: Optional[str] = None) -> ConversationMemory:
+    """The summary plus as many recent turns as fit ``CHAT_HISTORY_TOKENS``.
+
+    ``exclude_id`` is the message being answered, which the prompt already
+    carries as the question.
+    """
+    state = db.get(ConversationSummary, file_id)
+    messages = _unsummarized(db, file_id, state, exclude_id)
+    turns = _window(messages)
+    return ConversationMemory(
+        summary=state.summary if state is not None else "",
+        turns=turns[::-1],
+        overflow_tokens=sum(estimate_tokens(message.content) for message in messages[len(turns):]),
+    )
+
+
+async def queue_summary(db: AsyncSession, file_id: str, memory: Optional[ConversationMemory]) -> None:
+    """Queue a summary update when old turns have piled up; the caller commits."""
+    if memory is None or not memory.needs_summary:
+        return
+    payload = json.dumps({"file_id": file_id})
+    pending = await db.scalar(
+        select(Job.id)
+        .where(Job.kind == SUMMARIZE_CONVERSATION, Job.payload == payload, Job.status.in_((QUEUED, RUNNING)))
+        .limit(1)
+    )
+    if pending is None:
+        enqueue_job(db, SUMMARIZE_CONVERSATION, {"file_id": file_id})
+
+
+def _summary_input(db: Session, file_id: str):
+    """The oldest unsummarized turns outside the window, up to ``CHAT_SUMMARY_BATCH_TOKENS``."""
+    state = db.get(ConversationSummary, file_id)
+    newest = _unsummarized(db, file_id, state)
+    window_ids = {message.id for message in newest[: len(_window(newest))]}
+    batch, used = [], 0
+    for message in _unsummarized(db, file_id, state, newest_first=False):
+        if message.id in window_ids:
+            return state, batch, False
+        used += estimate_tokens(message.content)
+        if batch and used > CHAT_SUMMARY_BATCH_TOKENS:
+            return state, batch, True
+        batch.append(message)
+    return state, batch, len(batch) == HISTORY_SCAN_MESSAGES
+
+
+async def update_summary(file_id: str) -> dict:
+    """Fold the turns that left the window into the file's summary.
+
+    The write is conditional on the summary not having moved meanwhile, so
+    concurrent updates cannot fold the same turns in twice.
+    """
+    async with AsyncSessionLocal() as db:
+        state, batch, more = await db.run_sync(_summary_input, file_id)
+        if not batch:
+            return {"skipped": "up to date"}
+        previous = state.summary if state is not None else ""
+        transcript = format_turns([(message.role, message.content) for message in batch])
+        # Roughly three words per four tokens.
+        summary = await ChatAgent().summarize_conversation(previous, transcript, CHAT_SUMMARY_TOKENS * 3 // 4)
+        summary = _clip(summary.strip(), CHAT_SUMMARY_TOKENS)
+        through = batch[-1]
+
+        if state is None:
+            db.add(ConversationSummary(file_id=file_id, summary=summary, through_message_id=through.id,
+                                       through_created_at=through.created_at, message_count=len(batch)))
+        else:
+            moved = await db.execute(
+                update(ConversationSummary)
+                .where(
+                    ConversationSummary.file_id == file_id,
+                    ConversationSummary.through_message_id == state.through_message_id,
+                )
+                .values(summary=summary, through_message_id=through.id, through_created_at=through.created_at,
+                        message_count=ConversationSummary.message_count + len(batch))
+            )
+            if moved.rowcount == 0:
+                return {"skipped": "summary changed concurrently"}
+        if more:
+            enqueue_job(db, SUMMARIZE_CONVERSATION, {"file_id": file_id})
+        try:
+            await db.commit()
+        except IntegrityError:
+            # File deleted, or another update created the summary first.
+            await db.rollback()
+            return {"skipped": "summary changed concurrently"}
+        logger.info("Summarized %d chat messages for file %s", len(batch), file_id)
+        return {"file_id": file_id, "summarized": len(batch), "more": more}
@@ -0,0 +1,195 @@
+from collections import defaultdict
+from typing import Iterable, List, Optional
+
+from sqlalchemy import String, delete, func, literal, or_, select, update
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app.models.database import (
+    ChatMessage,
+    ConversationSummary,
+    Directory,
+    File,
+    FileChunk,
+    LLMCacheEntry,
+    Note,
+    RevisionNote,
+)
+
+# Rows that belong to a file and go with it when its directory is deleted.
+FILE_DEPENDENTS = (Note, RevisionNote, ChatMessage, ConversationSummary, FileChunk, LLMCacheEntry)
+
+
+def child_path(parent_path: Optional[str], directory_id: str) -> str:
+    return f"{parent_path or '/'}{directory_id}/"
+
+
+def directory_path(parent: Optional[Directory], directory_id: str) -> str:
+    return child_path(parent.path if parent is not None else None, directory_id)
+
+
+def _in_subtree(prefix: str):
+    return Directory.path.like(f"{prefix}%")
+
+
+def ancestor_ids(path: str) -> List[str]:
+    """Ids from the root down to (and including) the directory at ``path``."""
+    return [part for part in path.split("/") if part]
+
+
+def load_breadcrumb(db: Session, directory: Directory) -> list:
+    ids = ancestor_ids(directory.path)
+    rows = db.execute(select(Directory.id, Directory.name).where(Directory.id.in_(ids))).all()
+    names = {row.id: row.name for row in rows}
+    return [{"id": directory_id, "name": names[directory_id]} for directory_id in ids if directory_id in names]
+
+
+def load_subtrees(db: Session, roots: Iterable[Directory]) -> None:
+    """Populate children and files below ``roots`` with two queries.
+
+    The relationships are set as if loaded, so serializing the nested
+    response does not lazy-load one directory at a time.
+    """
+    roots = list(roots)
+    if not roots:
+        return
+    in_subtrees = or_(*(_in_subtree(root.path) for root in roots))
+    directories = db.query(Directory).filter(in_subtrees).all()
+    files = db.query(File).filter(File.directory_id.in_(select(Directory.id).where(in_subtrees))).all()
+
+    children, contents = defaultdict(list), defaultdict(list)
+    for directory in directories:
+        if directory.parent_id is not None:
+            children[directory.parent_id].append(directory)
+    for file in files:
+        contents[file.directory_id].append(file)
+    for directory in directories:
+        set_committed_value(directory, "children", children[directory.id])
+        set_committed_value(directory, "files", contents[directory.id])
+
+
+def delete_subtree(db: Session, directory: Directory) -> None:
+    """Delete a directory, everything below it and every file's rows.
+
+    A handful of set-based statements; nothing in the subtree is loaded.
+    """
+    directory_ids = select(Directory.id).where(_in_subtree(directory.path)).scalar_subquery()
+    file_ids = select(File.id).where(File.directory_id.in_(directory_ids)).scalar_subquery()
+    for model in FILE_DEPENDENTS:
+        db.execute(delete(model).where(model.file_id.in_(file_ids)), execution_options={"synchronize_session": False})
+    db.execute(delete(File).where(File.directory_id.in_(directory_ids)), execution_options={"synchronize_session": False})
+    db.execute(delete(Directory).where(_in_subtree(directory.path)), execution_options={"synchronize_session": False})
+    db.expunge(directory)
+
+
+def move_directory(db: Session, directory: Directory, parent: Optional[Directory]) -> None:
+    """Re-parent ``directory``, rewriting the paths of its whole subtree."""
+    if parent is not None and parent.path.startswith(directory.path):
+        raise ValueError("A directory cannot be moved into itself or one of its subdirectories")
+    old_prefix = directory.path
+    new_prefix = directory_path(parent, directory.id)
+    db.execute(
+        update(Directory)
+        .where(_in_subtree(old_prefix))
+        .values(path=literal(new_prefix, String).concat(func.substr(Directory.path, len(old_prefix) + 1))),
+        execution_options={"synchronize_session": False},
+    )
+    directory.parent_id = parent.id if parent is not None else None
+    set_committed_value(directory, "path", new_prefix)
+
+
+def _tree_cte(root_id: Optional[str], max_depth: Optional[int]):
+    anchor = select(
+        Directory.id,
+        Directory.name,
+        Directory.parent_id,
+        Directory.created_at,
+        Directory.updated_at,
+        literal(0).label("depth"),
+    )
+    if root_id:
+        anchor = anchor.where(Directory.id == root_id)
+    else:
+        anchor = anchor.where(Directory.parent_id.is_(None))
+
+    tree = anchor.cte("directory_tree", recursive=True)
+    step = select(
+        Directory.id,
+        Directory.name,
+        Directory.parent_id,
+        Directory.created_at,
+        Directory.updated_at,
+        (tree.c.depth + 1).label("depth"),
+    ).join(tree, Directory.parent_id == tree.c.id)
+    if max_depth is not None:
+        step = step.where(tree.c.depth < max_depth)
+    return tree.union_all(step)
+
+
+def load_directory_tree(db: Session, root_id: Optional[str] = None, max_depth: Optional[int] = None) -> list[dict]:
+    """Build the directory hierarchy with two queries and no file bodies.
+
+    One recursive CTE walks the directories; a second query joins file
+    summaries against the same CTE, computing sizes in SQL.
+    """
+    tree = _tree_cte(root_id, max_depth)
+
+    directory_rows = db.execute(select(tree)).all()
+    file_rows = db.execute(
+        select(
+            File.id,
+            File.name,
+            File.directory_id,
+            func.coalesce(func.length(File.content), 0).label("size"),
+            File.updated_at,
+        ).join(tree, File.directory_id == tree.c.id)
+    ).all()
+
+    nodes = {
+        row.id: {
+            "id": row.id,
+            "name": row.name,
+            "parent_id": row.parent_id,
+            "created_at": row.created_at,
+            "updated_at": row.updated_at,
+            "children": [],
+            "files": [],
+        }
+        for row in directory_rows
+    }
+
+    for row in file_rows:
+        nodes[row.directory_id]["files"].append(dict(row._mapping))
+
+    roots = []
+    for row in directory_rows:
+        node = nodes[row.id]
+        parent = nodes.get(row.parent_id) if row.depth > 0 else None
+        if parent is not None:
+            parent["children"].append(node)
+        else:
+            roots.append(node)
+
+    for node in nodes.values():
+        node["children"].sort(key=lambda child: child["name"].lower())
+        node["files"].sort(key=lambda summary: summary["name"].lower())
+    roots.sort(key=lambda root: root["name"].lower())
+    return roots
+
+
+def subtree_fingerprint(db: Session, root_id: str) -> Optional[tuple]:
+    """Aggregates that change whenever anything under ``root_id`` changes.
+
+    Cheap enough to compute on every request, so conditional GETs can be
+    answered without loading the subtree. None if the directory is missing.
+    """
+    tree = _tree_cte(root_id, None)
+    directories = db.execute(select(func.count(), func.max(tree.c.updated_at)).select_from(tree)).one()
+    if not directories[0]:
+        return None
+    files = db.execute(
+        select(func.count(File.id), func.coalesce(func.sum(File.version), 0), func.max(File.updated_at)).join(
+            tree, File.directory_id == tree.c.id
+        )
+    ).one()
+    return (*directories, *files)
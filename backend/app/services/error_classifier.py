@@ -0,0 +1,162 @@
+import asyncio
+import logging
+import math
+import os
+import re
+import time
+from collections import Counter
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy import or_
+
+from app.models.database import RevisionNote, SessionLocal
+from app.models.schemas import ERROR_TYPES
+
+logger = logging.getLogger(__name__)
+
+CLASSIFIER_ENABLED = os.getenv("ERROR_CLASSIFIER_ENABLED", "true").lower() == "true"
+CONFIDENCE_THRESHOLD = float(os.getenv("ERROR_CLASSIFIER_THRESHOLD", "0.85"))
+MIN_TRAINING_SAMPLES = int(os.getenv("ERROR_CLASSIFIER_MIN_SAMPLES", "50"))
+RETRAIN_SECONDS = int(os.getenv("ERROR_CLASSIFIER_RETRAIN_SECONDS", "3600"))
+MAX_TRAINING_SAMPLES = 20000
+
+# Labels written by the classifier itself are never trained on, so it
+# cannot drift by reinforcing its own guesses.
+SOURCE_USER = "user"
+SOURCE_MODEL = "model"
+SOURCE_CLASSIFIER = "classifier"
+
+# Weak keyword priors so early predictions lean the right way; real notes
+# quickly outweigh them.
+_SEED_SAMPLES = [
+    ("confused mixed up between difference versus vs not sure which one unclear", "CONFUSION"),
+    ("confusing two similar terms mixed up which article which schedule", "CONFUSION"),
+    ("wrong incorrect forgot wrote wrong year date number fact answered wrongly", "MISTAKE"),
+    ("mistake error got the fact wrong misremembered the name", "MISTAKE"),
+    ("do not understand why how concept principle meaning idea fundamentally", "CONCEPT_MISUNDERSTANDING"),
+    ("did not understand the underlying concept basis reasoning behind it", "CONCEPT_MISUNDERSTANDING"),
+]
+
+_WORD_RE = re.compile(r"[a-z0-9']+")
+
+
+def _features(text: str) -> List[str]:
+    words = _WORD_RE.findall(text.lower())
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+class NaiveBayesModel:
+    """Multinomial naive Bayes over unigrams and bigrams."""
+
+    def __init__(self, samples: Iterable[Tuple[str, str]], alpha: float = 1.0):
+        self.alpha = alpha
+        self.doc_counts: Counter = Counter()
+        self.term_counts = {label: Counter() for label in ERROR_TYPES}
+        for text, label in samples:
+            self.doc_counts[label] += 1
+            self.term_counts[label].update(_features(text))
+        self.totals = {label: sum(counts.values()) for label, counts in self.term_counts.items()}
+        self.vocabulary = set().union(*self.term_counts.values())
+        self.sample_count = sum(self.doc_counts.values())
+
+    def predict(self, text: str) -> Optional[Tuple[str, float]]:
+        features = [feature for feature in _features(text) if feature in self.vocabulary]
+        if not features:
+            return None
+
+        vocabulary_size = len(self.vocabulary)
+        scores = {}
+        for label in ERROR_TYPES:
+            prior = (self.doc_counts[label] + 1) / (self.sample_count + len(ERROR_TYPES))
+            denominator = self.totals[label] + self.alpha * vocabulary_size
+            counts = self.term_counts[label]
+            scores[label] = math.log(prior) + sum(
+                math.log((counts[feature] + self.alpha) / denominator) for feature in features
+            )
+
+        best = max(scores, key=scores.get)
+        normalizer = sum(math.exp(score - scores[best]) for score in scores.values())
+        return best, 1.0 / normalizer
+
+
+class LocalErrorClassifier:
+    """Answers detect_error_type locally when it is confident enough.
+
+    The model is trained from labelled revision notes on first use and
+    retrained in the background every ``RETRAIN_SECONDS``.
+    """
+
+    def __init__(self):
+        self._model: Optional[NaiveBayesModel] = None
+        self._trained_samples = 0
+        self._trained_at = 0.0
+        self._training: Optional[asyncio.Task] = None
+        self.local_answers = 0
+        self.fallbacks = 0
+
+    def _load_samples(self) -> List[Tuple[str, str]]:
+        db = SessionLocal()
+        try:
+            rows = (
+                db.query(RevisionNote.content, RevisionNote.error_type)
+                .filter(
+                    RevisionNote.error_type.in_(ERROR_TYPES),
+                    or_(
+                        RevisionNote.error_type_source.is_(None),
+                        RevisionNote.error_type_source != SOURCE_CLASSIFIER,
+                    ),
+                )
+                .order_by(RevisionNote.created_at.desc())
+                .limit(MAX_TRAINING_SAMPLES)
+                .all()
+            )
+        finally:
+            db.close()
+        return [(content, error_type) for content, error_type in rows]
+
+    def _train(self) -> Tuple[NaiveBayesModel, int]:
+        samples = self._load_samples()
+        logger.info("Training error-type classifier on %d notes", len(samples))
+        return NaiveBayesModel(_SEED_SAMPLES + samples), len(samples)
+
+    async def retrain(self) -> None:
+        self._model, self._trained_samples = await asyncio.to_thread(self._train)
+        self._trained_at = time.monotonic()
+
+    async def _current_model(self) -> NaiveBayesModel:
+        stale = self._model is None or time.monotonic() - self._trained_at > RETRAIN_SECONDS
+        if stale and (self._training is None or self._training.done()):
+            self._training = asyncio.create_task(self.retrain())
+        if self._model is None:
+            await self._training
+        # Otherwise keep answering with the current model while a new one trains.
+        return self._model
+
+    async def predict(self, content: str) -> Optional[str]:
+        """Return a label if the local model is confident, else None."""
+        if not CLASSIFIER_ENABLED:
+            return None
+        try:
+            model = await self._current_model()
+        except Exception:
+            logger.exception("Error-type classifier unavailable; falling back to the model")
+            return None
+        # Until enough real labels exist the keyword seeds alone are too weak to trust.
+        prediction = model.predict(content) if self._trained_samples >= MIN_TRAINING_SAMPLES else None
+        if prediction is None or prediction[1] < CONFIDENCE_THRESHOLD:
+            self.fallbacks += 1
+            return None
+        self.local_answers += 1
+        return prediction[0]
+
+    def stats(self) -> dict:
+        return {
+            "enabled": CLASSIFIER_ENABLED,
+            "trained_samples": self._trained_samples,
+            "threshold": CONFIDENCE_THRESHOLD,
+            "local_answers": self.local_answers,
+            "fallbacks": self.fallbacks,
+        }
+
+
+error_classifier = LocalErrorClassifier()
@@ -0,0 +1,66 @@
+import os
+from datetime import datetime
+
+from sqlalchemy import insert
+
+from app.agents.chat_agent import ChatAgent
+from app.agents.revision_agent import RevisionAgent
+from app.models.database import AsyncSessionLocal, File, RevisionNote
+from app.services.conversation_memory import SUMMARIZE_CONVERSATION, update_summary
+from app.services.jobs import job_handler
+from app.services.progress import record_revision_activity
+
+CLASSIFY_REVISION_NOTE = "classify_revision_note"
+EXTRACT_CONFUSION_POINTS = "extract_confusion_points"
+
+# Off by default: it costs one extra model call per chat turn.
+CHAT_EXTRACT_REVISION_NOTES = os.getenv("CHAT_EXTRACT_REVISION_NOTES", "false").lower() == "true"
+MAX_EXTRACTED_POINTS = 5
+
+
+@job_handler(CLASSIFY_REVISION_NOTE)
+async def classify_revision_note(payload: dict) -> dict:
+    async with AsyncSessionLocal() as db:
+        note = await db.get(RevisionNote, payload["note_id"])
+        if note is None:
+            return {"skipped": "note deleted"}
+        error_type, source = await RevisionAgent().classify_error_type(note.content)
+        note.error_type = error_type
+        note.error_type_source = source
+        await db.commit()
+        return {"note_id": note.id, "error_type": error_type, "error_type_source": source}
+
+
+@job_handler(EXTRACT_CONFUSION_POINTS)
+async def extract_confusion_points(payload: dict) -> dict:
+    points = await ChatAgent().extract_confusion_points(payload["user_message"], payload["ai_response"])
+    points = points[:MAX_EXTRACTED_POINTS]
+    if not points:
+        return {"note_ids": []}
+
+    labels = await RevisionAgent().classify_error_types(points)
+    async with AsyncSessionLocal() as db:
+        if await db.get(File, payload["file_id"]) is None:
+            return {"skipped": "file deleted"}
+        now = datetime.now()
+        rows = [
+            {
+                "content": point,
+                "file_id": payload["file_id"],
+                "error_type": error_type,
+                "error_type_source": source,
+                "is_resolved": False,
+                "review_count": 0,
+                "due_at": now,
+            }
+            for point, (error_type, source) in zip(points, labels)
+        ]
+        note_ids = (await db.scalars(insert(RevisionNote).returning(RevisionNote.id, sort_by_parameter_order=True), rows)).all()
+        await db.run_sync(record_revision_activity, created=len(note_ids))
+        await db.commit()
+        return {"note_ids": list(note_ids)}
+
+
+@job_handler(SUMMARIZE_CONVERSATION)
+async def summarize_conversation(payload: dict) -> dict:
+    return await update_summary(payload["file_id"])
@@ -0,0 +1,196 @@
+import asyncio
+import json
+import logging
+import os
+import random
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from sqlalchemy import and_, delete, or_, select, update
+
+from app.models.database import AsyncSessionLocal, Job, generate_uuid
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_RETRY_BASE_SECONDS = float(os.getenv("JOB_RETRY_BASE_SECONDS", "5"))
+JOB_TIMEOUT_SECONDS = float(os.getenv("JOB_TIMEOUT_SECONDS", "300"))
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "1"))
+JOB_RETENTION_DAYS = int(os.getenv("JOB_RETENTION_DAYS", "7"))
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+JobHandler = Callable[[dict], Awaitable[Any]]
+_handlers: Dict[str, JobHandler] = {}
+
+
+def job_handler(kind: str) -> Callable[[JobHandler], JobHandler]:
+    def register(handler: JobHandler) -> JobHandler:
+        _handlers[kind] = handler
+        return handler
+    return register
+
+
+def enqueue_job(db, kind: str, payload: dict, *, delay_seconds: float = 0, max_attempts: int = JOB_MAX_ATTEMPTS) -> Job:
+    """Add a job to ``db`` (sync or async session); it runs once the caller commits."""
+    now = datetime.now()
+    job = Job(
+        id=generate_uuid(),
+        kind=kind,
+        payload=json.dumps(payload),
+        status=QUEUED,
+        attempts=0,
+        max_attempts=max_attempts,
+        run_after=now + timedelta(seconds=delay_seconds),
+        created_at=now,
+    )
+    db.add(job)
+    return job
+
+
+def retry_delay(attempts: int) -> float:
+    # Exponential backoff with full jitter.
+    return random.uniform(0, JOB_RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+
+
+class JobQueue:
+    """Runs queued jobs from the jobs table on a pool of asyncio workers.
+
+    Jobs are claimed with a conditional UPDATE, so several processes can
+    share one table. A job left ``running`` for longer than
+    ``JOB_TIMEOUT_SECONDS`` (e.g. after a crash) is claimed again.
+    """
+
+    def __init__(self, workers: int = JOB_WORKERS):
+        self.workers = workers
+        self._tasks: list[asyncio.Task] = []
+        self._wake: Optional[asyncio.Event] = None
+        self._stopping = False
+        self.succeeded = 0
+        self.failed = 0
+        self.retried = 0
+
+    def _claimable(self, now: datetime):
+        return or_(
+            and_(Job.status == QUEUED, Job.run_after <= now),
+            and_(Job.status == RUNNING, Job.started_at < now - timedelta(seconds=JOB_TIMEOUT_SECONDS)),
+        )
+
+    async def _claim(self) -> Optional[Job]:
+        now = datetime.now()
+        async with AsyncSessionLocal() as db:
+            candidates = (
+                await db.scalars(select(Job.id).where(self._claimable(now)).order_by(Job.run_after).limit(self.workers))
+            ).all()
+            for job_id in candidates:
+                claimed = await db.execute(
+                    update(Job)
+                    .where(Job.id == job_id, self._claimable(now))
+                    .values(status=RUNNING, attempts=Job.attempts + 1, started_at=now)
+                )
+                await db.commit()
+                if claimed.rowcount:
+                    return await db.get(Job, job_id)
+        return None
+
+    async def _finish(self, job_id: str, **values) -> None:
+        async with AsyncSessionLocal() as db:
+            await db.execute(update(Job).where(Job.id == job_id).values(**values))
+            await db.commit()
+
+    async def _run(self, job: Job) -> None:
+        handler = _handlers.get(job.kind)
+        try:
+            if handler is None:
+                raise LookupError(f"No handler for job kind {job.kind!r}")
+            if job.attempts > job.max_attempts:
+                raise TimeoutError("Job timed out on its last attempt")
+            result = await asyncio.wait_for(handler(json.loads(job.payload)), JOB_TIMEOUT_SECONDS)
+            try:
+                encoded = json.dumps(result)
+            except (TypeError, ValueError) as exc:
+                # Running the handler again would not change its result.
+                handler = None
+                raise TypeError(f"Job result is not JSON-serializable: {exc}") from exc
+        except asyncio.CancelledError:
+            # Shutting down: hand the job back without spending an attempt.
+            await self._finish(job.id, status=QUEUED, attempts=job.attempts - 1, started_at=None)
+            raise
+        except Exception as exc:
+            now = datetime.now()
+            if handler is not None and job.attempts < job.max_attempts:
+                self.retried += 1
+                delay = retry_delay(job.attempts)
+                logger.warning("Job %s (%s) failed, retrying in %.1fs: %s", job.id, job.kind, delay, exc)
+                await self._finish(job.id, status=QUEUED, error=str(exc), run_after=now + timedelta(seconds=delay))
+            else:
+                self.failed += 1
+                logger.exception("Job %s (%s) failed", job.id, job.kind)
+                await self._finish(job.id, status=FAILED, error=str(exc), finished_at=now)
+            return
+
+        self.succeeded += 1
+        await self._finish(
+            job.id, status=SUCCEEDED, result=encoded, error=None, finished_at=datetime.now()
+        )
+
+    async def _worker(self) -> None:
+        while not self._stopping:
+            try:
+                job = await self._claim()
+            except Exception:
+                logger.exception("Could not claim a job")
+                job = None
+            if job is None:
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), JOB_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            try:
+                await self._run(job)
+            except Exception:
+                # The job stays RUNNING and is claimed again after JOB_TIMEOUT_SECONDS.
+                logger.exception("Could not record the outcome of job %s (%s)", job.id, job.kind)
+
+    async def _prune(self) -> None:
+        cutoff = datetime.now() - timedelta(days=JOB_RETENTION_DAYS)
+        async with AsyncSessionLocal() as db:
+            await db.execute(delete(Job).where(Job.status.in_([SUCCEEDED, FAILED]), Job.finished_at < cutoff))
+            await db.commit()
+
+    def wake(self) -> None:
+        """Let an idle worker pick up a just-committed job without waiting for the next poll."""
+        if self._wake is not None:
+            self._wake.set()
+
+    async def start(self) -> None:
+        if self._tasks or self.workers <= 0:
+            return
+        self._stopping = False
+        self._wake = asyncio.Event()
+        await self._prune()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        self._stopping = True
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def stats(self) -> dict:
+        return {
+            "workers": len(self._tasks),
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "retried": self.retried,
+        }
+
+
+job_queue = JobQueue()
@@ -0,0 +1,272 @@
+import asyncio
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import insert
+
+from app.models.database import LLMCacheEntry, SessionLocal
+
+CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+CACHE_MEMORY_ENTRIES = int(os.getenv("LLM_CACHE_MEMORY_ENTRIES", "512"))
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def content_hash(text: Optional[str]) -> str:
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+
+def normalize_input(text: str) -> str:
+    return _WHITESPACE_RE.sub(" ", text).strip().lower().rstrip("?.! ")
+
+
+class ResponseCache:
+    """Two-level LRU cache for model responses.
+
+    A small in-process LRU sits in front of the llm_cache table so repeat
+    hits skip the database too. Entries expire after ``ttl_seconds`` and the
+    table is trimmed to ``max_entries`` by least-recent access.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: int, memory_entries: int, enabled: bool = True):
+        self.max_entries = max_entries
+        self.ttl = timedelta(seconds=ttl_seconds)
+        self.memory_entries = memory_entries
+        self.enabled = enabled
+        self._memory: OrderedDict[str, LLMCacheEntry] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.memory_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(model: str, template: str, file_hash: Optional[str], user_input: str, history: str = "") -> str:
+        parts = [model, template, file_hash or "", normalize_input(user_input)]
+        if history:
+            # The same question gets a different answer later in a conversation.
+            parts.append(content_hash(history))
+        raw = "\x1f".join(parts)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _expired(self, entry: LLMCacheEntry, now: datetime) -> bool:
+        return entry.created_at + self.ttl < now
+
+    def _remember(self, entry: LLMCacheEntry) -> None:
+        with self._lock:
+            self._memory[entry.key] = entry
+            self._memory.move_to_end(entry.key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def _memory_get(self, key: str) -> Optional[str]:
+        now = datetime.now()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            if self._expired(entry, now):
+                del self._memory[key]
+                return None
+            self._memory.move_to_end(key)
+            self.hits += 1
+            self.memory_hits += 1
+            return entry.response
+
+    def _db_get(self, key: str) -> Optional[str]:
+        now = datetime.now()
+        db = SessionLocal()
+        try:
+            entry = db.query(LLMCacheEntry).filter(LLMCacheEntry.key == key).first()
+            if entry is None or self._expired(entry, now):
+                if entry is not None:
+                    db.delete(entry)
+                    db.commit()
+                self.misses += 1
+                return None
+            entry.last_accessed = now
+            entry.hit_count += 1
+            db.commit()
+            db.refresh(entry)
+            db.expunge(entry)
+        finally:
+            db.close()
+        self._remember(entry)
+        self.hits += 1
+        return entry.response
+
+    def _db_get_many(self, keys: List[str]) -> Dict[str, str]:
+        now = datetime.now()
+        db = SessionLocal()
+        try:
+            entries = db.query(LLMCacheEntry).filter(LLMCacheEntry.key.in_(keys)).all()
+            found = [entry for entry in entries if not self._expired(entry, now)]
+            expired = [entry.key for entry in entries if self._expired(entry, now)]
+            for entry in entries:
+                db.expunge(entry)
+            if expired:
+                db.query(LLMCacheEntry).filter(LLMCacheEntry.key.in_(expired)).delete(synchronize_session=False)
+            if found:
+                db.query(LLMCacheEntry).filter(LLMCacheEntry.key.in_([entry.key for entry in found])).update(
+                    {LLMCacheEntry.last_accessed: now, LLMCacheEntry.hit_count: LLMCacheEntry.hit_count + 1},
+                    synchronize_session=False,
+                )
+            if expired or found:
+                db.commit()
+        finally:
+            db.close()
+        for entry in found:
+            self._remember(entry)
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return {entry.key: entry.response for entry in found}
+
+    def _db_set(self, entry: LLMCacheEntry) -> None:
+        db = SessionLocal()
+        try:
+            db.merge(entry)
+            db.commit()
+            self._evict(db)
+        finally:
+            db.close()
+
+    def _db_set_many(self, entries: List[LLMCacheEntry]) -> None:
+        # Plain rows: the entries themselves stay detached for the memory LRU.
+        columns = [column.key for column in LLMCacheEntry.__table__.columns]
+        rows = [{column: getattr(entry, column) for column in columns} for entry in entries]
+        db = SessionLocal()
+        try:
+            db.query(LLMCacheEntry).filter(LLMCacheEntry.key.in_([entry.key for entry in entries])).delete(
+                synchronize_session=False
+            )
+            db.execute(insert(LLMCacheEntry), rows)
+            db.commit()
+            self._evict(db)
+        finally:
+            db.close()
+
+    def _evict(self, db) -> None:
+        expired = db.query(LLMCacheEntry).filter(LLMCacheEntry.created_at < datetime.now() - self.ttl).delete()
+        excess = db.query(LLMCacheEntry).count() - self.max_entries
+        if excess > 0:
+            oldest = db.query(LLMCacheEntry.key).order_by(LLMCacheEntry.last_accessed.asc()).limit(excess)
+            excess = db.query(LLMCacheEntry).filter(LLMCacheEntry.key.in_(oldest.scalar_subquery())).delete(
+                synchronize_session=False
+            )
+        db.commit()
+        self.evictions += expired + max(excess, 0)
+
+    async def get(self, key: str) -> Optional[str]:
+        if not self.enabled:
+            return None
+        response = self._memory_get(key)
+        if response is not None:
+            return response
+        return await asyncio.to_thread(self._db_get, key)
+
+    async def get_many(self, keys: Iterable[str]) -> Dict[str, str]:
+        """Cached responses for ``keys``, with one query for the ones not in memory."""
+        if not self.enabled:
+            return {}
+        found: Dict[str, str] = {}
+        missing = []
+        for key in dict.fromkeys(keys):
+            response = self._memory_get(key)
+            if response is None:
+                missing.append(key)
+            else:
+                found[key] = response
+        if missing:
+            found.update(await asyncio.to_thread(self._db_get_many, missing))
+        return found
+
+    async def set(
+        self,
+        key: str,
+        response: str,
+        *,
+        model: str,
+        template: str,
+        file_id: Optional[str] = None,
+        file_hash: Optional[str] = None,
+    ) -> None:
+        if not self.enabled:
+            return
+        now = datetime.now()
+        entry = LLMCacheEntry(
+            key=key,
+            model=model,
+            template=template,
+            file_id=file_id,
+            content_hash=file_hash,
+            response=response,
+            created_at=now,
+            last_accessed=now,
+            hit_count=0,
+        )
+        self._remember(entry)
+        await asyncio.to_thread(self._db_set, entry)
+
+    async def set_many(self, responses: Dict[str, str], *, model: str, template: str) -> None:
+        """Store several responses that do not depend on a file in one transaction."""
+        if not self.enabled or not responses:
+            return
+        now = datetime.now()
+        entries = [
+            LLMCacheEntry(
+                key=key,
+                model=model,
+                template=template,
+                response=response,
+                created_at=now,
+                last_accessed=now,
+                hit_count=0,
+            )
+            for key, response in responses.items()
+        ]
+        for entry in entries:
+            self._remember(entry)
+        await asyncio.to_thread(self._db_set_many, entries)
+
+    def invalidate_file(self, db, file_id: str, current_hash: Optional[str] = None) -> int:
+        """Drop cached responses computed from older versions of a file."""
+        with self._lock:
+            for key in [
+                key
+                for key, entry in self._memory.items()
+                if entry.file_id == file_id and entry.content_hash != current_hash
+            ]:
+                del self._memory[key]
+        query = db.query(LLMCacheEntry).filter(LLMCacheEntry.file_id == file_id)
+        if current_hash is not None:
+            query = query.filter(LLMCacheEntry.content_hash != current_hash)
+        return query.delete(synchronize_session=False)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "memory_hits": self.memory_hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "memory_entries": len(self._memory),
+            "max_entries": self.max_entries,
+            "ttl_seconds": int(self.ttl.total_seconds()),
+        }
+
+
+response_cache = ResponseCache(
+    max_entries=CACHE_MAX_ENTRIES,
+    ttl_seconds=CACHE_TTL_SECONDS,
+    memory_entries=CACHE_MEMORY_ENTRIES,
+    enabled=CACHE_ENABLED,
+)
@@ -0,0 +1,328 @@
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter as TallyCounter
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "0"))  # 0 disables the slow-request log
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "10"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200, 500)
+TOKEN_BUCKETS = (64, 256, 1024, 4096, 16384, 65536)
+
+
+# --- A minimal Prometheus registry (text exposition format 0.0.4). ---
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels: dict) -> Tuple:
+        return tuple(labels.get(name, "") for name in self.label_names)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return self.header() + [f"{self.name}{_format_labels(self.label_names, key)} {value}" for key, value in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = (), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+        self._values: Dict[Tuple, list] = {}  # key -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+            if index < len(self.buckets):
+                state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = [(key, list(state)) for key, state in self._values.items()]
+        lines = self.header()
+        for key, state in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, state):
+                cumulative += count
+                labels = _format_labels(self.label_names, key, 'le="%s"' % bound)
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.label_names, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{labels} {state[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {state[-2]}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {state[-1]}")
+        return lines
+
+
+class Gauge(_Metric):
+    """A gauge whose samples are read from ``collect`` at scrape time."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, collect: Callable[[], Dict[Tuple, float]], labels=()):
+        super().__init__(name, documentation, labels)
+        self.collect = collect
+
+    def render(self) -> List[str]:
+        try:
+            samples = self.collect()
+        except Exception:
+            logger.exception("Collecting %s failed", self.name)
+            return []
+        return self.header() + [
+            f"{self.name}{_format_labels(self.label_names, key)} {value}" for key, value in samples.items()
+        ]
+
+
+REGISTRY: List[_Metric] = []
+
+
+def register_stats(name: str, documentation: str, stats: Callable[[], dict]) -> Gauge:
+    """Expose the numeric fields of a ``stats()`` dict as one labelled gauge."""
+
+    def collect() -> Dict[Tuple, float]:
+        return {(key,): float(value) for key, value in stats().items() if isinstance(value, (int, float))}
+
+    return Gauge(name, documentation, collect, labels=("stat",))
+
+
+def render_metrics() -> str:
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+HTTP_REQUESTS = Counter("http_requests_total", "HTTP requests by route and status.", ("method", "route", "status"))
+HTTP_LATENCY = Histogram("http_request_duration_seconds", "HTTP request latency.", ("method", "route"))
+HTTP_QUERIES = Histogram(
+    "http_request_db_queries", "SQL statements executed per request.", ("method", "route"), QUERY_COUNT_BUCKETS
+)
+DB_QUERIES = Counter("db_queries_total", "SQL statements executed.", ("operation",))
+DB_LATENCY = Histogram("db_query_duration_seconds", "SQL statement latency.", ("operation",))
+N_PLUS_ONE = Counter(
+    "db_n_plus_one_total", "Requests that ran one statement N_PLUS_ONE_THRESHOLD+ times.", ("method", "route")
+)
+LLM_CALLS = Counter("llm_calls_total", "Model calls by outcome.", ("agent", "model", "operation", "outcome"))
+LLM_LATENCY = Histogram("llm_call_duration_seconds", "Model call latency.", ("agent", "model", "operation"))
+LLM_FIRST_TOKEN = Histogram(
+    "llm_time_to_first_token_seconds", "Latency until the first streamed token.", ("agent", "model", "operation")
+)
+LLM_TOKENS = Counter("llm_tokens_total", "Tokens used by model calls.", ("agent", "model", "direction"))
+LLM_CALL_TOKENS = Histogram(
+    "llm_call_tokens", "Total tokens per model call.", ("agent", "model", "operation"), TOKEN_BUCKETS
+)
+
+
+# --- Per-request SQL accounting. ---
+
+class RequestStats:
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.statements: TallyCounter = TallyCounter()
+        self.batched = False
+
+
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+_reported_n_plus_one: set = set()
+
+
+def mark_batched() -> None:
+    """The current request repeats statements on purpose (batched bulk work); skip the N+1 check."""
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.batched = True
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+    DB_QUERIES.inc(operation=operation)
+    DB_LATENCY.observe(elapsed, operation=operation)
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += elapsed
+        stats.statements[statement] += 1
+
+
+def instrument_engine(engine: Engine) -> None:
+    if not METRICS_ENABLED or event.contains(engine, "after_cursor_execute", _after_cursor_execute):
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def _check_n_plus_one(method: str, route: str, stats: RequestStats) -> None:
+    if stats.batched:
+        return
+    statement, count = stats.statements.most_common(1)[0] if stats.statements else ("", 0)
+    if count < N_PLUS_ONE_THRESHOLD:
+        return
+    N_PLUS_ONE.inc(method=method, route=route)
+    if (route, statement) not in _reported_n_plus_one:
+        _reported_n_plus_one.add((route, statement))
+        logger.warning("Possible N+1 on %s %s: statement ran %d times: %s", method, route, count, statement[:300])
+
+
+def _route_template(scope) -> str:
+    """``/api/files/{file_id}`` for a matched request, so labels stay bounded."""
+    if scope.get("route") is None:
+        return "unmatched"
+    # Rebuilt from path_params: routes of included routers only know their
+    # own suffix, not the prefix they were mounted under.
+    names = {str(value): name for name, value in scope.get("path_params", {}).items()}
+    return "/".join(f"{{{names[part]}}}" if part in names else part for part in scope["path"].split("/"))
+
+
+class MetricsMiddleware:
+    """Times each request and counts the SQL it runs.
+
+    Adds a Server-Timing header (db time and query count) so the numbers
+    are visible in the browser's network panel too.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                timing = f'db;dur={stats.db_seconds * 1000:.1f};desc="{stats.queries} queries"'
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(b"server-timing", timing.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_stats.reset(token)
+            elapsed = time.perf_counter() - start
+            route = _route_template(scope)
+            method = scope["method"]
+            HTTP_REQUESTS.inc(method=method, route=route, status=str(status))
+            HTTP_LATENCY.observe(elapsed, method=method, route=route)
+            HTTP_QUERIES.observe(stats.queries, method=method, route=route)
+            _check_n_plus_one(method, route, stats)
+            if SLOW_REQUEST_MS and elapsed * 1000 >= SLOW_REQUEST_MS:
+                logger.warning(
+                    "Slow request %s %s -> %s in %.0f ms (%d queries, %.0f ms in SQL)",
+                    method, scope.get("path"), status, elapsed * 1000, stats.queries, stats.db_seconds * 1000,
+                )
+
+
+# --- Model calls. ---
+
+class LLMCall:
+    def __init__(self, labels: dict, start: float):
+        self._labels = labels
+        self._start = start
+        self._first_token_seen = False
+        self.result = None
+
+    def first_token(self) -> None:
+        if not self._first_token_seen:
+            self._first_token_seen = True
+            LLM_FIRST_TOKEN.observe(time.perf_counter() - self._start, **self._labels)
+
+    def record(self, result) -> None:
+        self.result = result
+
+
+def _usage_tokens(result) -> Tuple[int, int]:
+    # usage() became a property, and its fields were renamed, across
+    # pydantic-ai releases.
+    usage = getattr(result, "usage", None)
+    if callable(usage):
+        usage = usage()
+    request = getattr(usage, "input_tokens", None) or getattr(usage, "request_tokens", None) or 0
+    response = getattr(usage, "output_tokens", None) or getattr(usage, "response_tokens", None) or 0
+    return request, response
+
+
+@asynccontextmanager
+async def observe_llm(agent: str, model: str, operation: str):
+    """Time a model call; pass the run result to ``call.record`` for token usage."""
+    labels = {"agent": agent, "model": model, "operation": operation}
+    call = LLMCall(labels, time.perf_counter())
+    outcome = "ok"
+    try:
+        yield call
+    except Exception as exc:
+        outcome = type(exc).__name__
+        raise
+    finally:
+        LLM_CALLS.inc(outcome=outcome, **labels)
+        LLM_LATENCY.observe(time.perf_counter() - call._start, **labels)
+        if call.result is not None:
+            request, response = _usage_tokens(call.result)
+            LLM_TOKENS.inc(request, agent=agent, model=model, direction="input")
+            LLM_TOKENS.inc(response, agent=agent, model=model, direction="output")
+            LLM_CALL_TOKENS.observe(request + response, **labels)
@@ -0,0 +1,78 @@
+from typing import Optional
+
+from fastapi import HTTPException, Response
+from sqlalchemy import and_, func, or_
+from sqlalchemy.orm import Query, Session
+
+# Keyset pagination over (sort column, id). The cursor is the id of the
+# last row on the previous page; its sort value is looked up in SQL so the
+# comparison always uses the stored representation of the timestamp.
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def _beyond_cursor(db: Session, model, column, cursor: str, descending: bool):
+    if not db.query(model.id).filter(model.id == cursor).first():
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    anchor = db.query(column).filter(model.id == cursor).scalar_subquery()
+    if descending:
+        return or_(column < anchor, and_(column == anchor, model.id < cursor))
+    return or_(column > anchor, and_(column == anchor, model.id > cursor))
+
+
+def keyset_page(
+    db: Session,
+    query: Query,
+    model,
+    response: Response,
+    *,
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    column=None,
+    descending: bool = False,
+    include_total: bool = False,
+) -> list:
+    """Return one page of ``query`` ordered by (column, id).
+
+    Sets ``X-Next-Cursor`` when more rows follow and, on request,
+    ``X-Total-Count`` with the size of the unpaged result.
+    """
+    column = column if column is not None else model.created_at
+    if include_total:
+        total = query.order_by(None).with_entities(func.count(model.id)).scalar()
+        response.headers["X-Total-Count"] = str(total)
+    if cursor:
+        query = query.filter(_beyond_cursor(db, model, column, cursor, descending))
+
+    order = (column.desc(), model.id.desc()) if descending else (column.asc(), model.id.asc())
+    rows = query.order_by(*order).limit(limit + 1).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = rows[-1].id
+    return rows
+
+
+def newest_page(db: Session, query: Query, model, response: Response, *, limit: Optional[int], before: Optional[str], include_total: bool) -> list:
+    """Newest ``limit`` rows (or the page before ``before``), oldest first.
+
+    Without ``limit`` or ``before`` the whole listing is returned, as the
+    unpaged endpoints always did.
+    """
+    if limit is None and before is None:
+        if include_total:
+            response.headers["X-Total-Count"] = str(query.order_by(None).with_entities(func.count(model.id)).scalar())
+        return query.order_by(model.created_at.asc(), model.id.asc()).all()
+
+    rows = keyset_page(
+        db,
+        query,
+        model,
+        response,
+        limit=limit or DEFAULT_PAGE_SIZE,
+        cursor=before,
+        descending=True,
+        include_total=include_total,
+    )
+    rows.reverse()
+    return rows
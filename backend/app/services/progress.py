@@ -0,0 +1,135 @@
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import case, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models.database import RevisionDailyStat, RevisionNote
+from app.models.schemas import ERROR_TYPES
+
+
+def _as_date(value) -> date:
+    # SQLite returns func.date() results as strings.
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+
+def record_revision_activity(
+    db: Session,
+    *,
+    created: int = 0,
+    reviewed: int = 0,
+    resolved: int = 0,
+    day: Optional[date] = None,
+) -> None:
+    """Add counts to the daily rollup row for ``day``; the caller commits."""
+    day = day or datetime.now().date()
+    counts = {"created": created, "reviewed": reviewed, "resolved": resolved}
+    increments = {
+        getattr(RevisionDailyStat, column): getattr(RevisionDailyStat, column) + amount
+        for column, amount in counts.items()
+        if amount
+    }
+    if not increments:
+        return
+
+    def increment() -> int:
+        return (
+            db.query(RevisionDailyStat)
+            .filter(RevisionDailyStat.day == day)
+            .update(increments, synchronize_session=False)
+        )
+
+    if increment():
+        return
+    try:
+        with db.begin_nested():
+            db.add(RevisionDailyStat(day=day, **counts))
+    except IntegrityError:
+        # Another request created today's row first.
+        increment()
+
+
+def backfill_daily_stats(db: Session) -> None:
+    """Seed the rollup from existing notes the first time it is empty.
+
+    Only the latest review of each note is recorded on the note itself, so
+    historical review counts are approximated from ``last_reviewed``.
+    """
+    if db.query(RevisionDailyStat.day).first() is not None:
+        return
+    if db.query(RevisionNote.id).first() is None:
+        return
+
+    rows: dict[date, dict] = {}
+    created_day = func.date(RevisionNote.created_at)
+    for day, count in db.query(created_day, func.count()).group_by(created_day).all():
+        if day is not None:
+            rows.setdefault(_as_date(day), {})["created"] = count
+
+    reviewed_day = func.date(RevisionNote.last_reviewed)
+    reviewed = (
+        db.query(reviewed_day, func.count())
+        .filter(RevisionNote.review_count > 0)
+        .group_by(reviewed_day)
+        .all()
+    )
+    for day, count in reviewed:
+        if day is not None:
+            rows.setdefault(_as_date(day), {})["reviewed"] = count
+
+    db.add_all(RevisionDailyStat(day=day, **counts) for day, counts in rows.items())
+    db.commit()
+
+
+def get_progress_stats(db: Session, days: int = 7) -> dict:
+    today = datetime.now().date()
+
+    total_notes, resolved_notes, total_reviews = db.query(
+        func.count(RevisionNote.id),
+        func.coalesce(func.sum(case((RevisionNote.is_resolved == True, 1), else_=0)), 0),
+        func.coalesce(func.sum(RevisionNote.review_count), 0),
+    ).one()
+    pending_notes = total_notes - resolved_notes
+
+    error_breakdown = {error_type: 0 for error_type in ERROR_TYPES}
+    error_breakdown["OTHER"] = 0
+    for error_type, count in db.query(RevisionNote.error_type, func.count()).group_by(RevisionNote.error_type):
+        if error_type in error_breakdown:
+            error_breakdown[error_type] += count
+        else:
+            error_breakdown["OTHER"] += count
+
+    window = max(days, 7)
+    start = today - timedelta(days=window - 1)
+    stats = {
+        row.day: row
+        for row in db.query(RevisionDailyStat).filter(
+            RevisionDailyStat.day >= start, RevisionDailyStat.day <= today
+        )
+    }
+    daily = []
+    for day_offset in range(window - 1, -1, -1):
+        day = today - timedelta(days=day_offset)
+        row = stats.get(day)
+        daily.append(
+            {
+                "date": day.isoformat(),
+                "created": row.created if row else 0,
+                "reviewed": row.reviewed if row else 0,
+                "resolved": row.resolved if row else 0,
+            }
+        )
+
+    return {
+        "total_notes": total_notes,
+        "resolved_notes": resolved_notes,
+        "pending_notes": pending_notes,
+        "resolution_rate": round((resolved_notes / total_notes) * 100, 1) if total_notes else 0.0,
+        "total_reviews": total_reviews,
+        "average_reviews_per_note": round((total_reviews / total_notes), 2) if total_notes else 0.0,
+        "reviewed_today": daily[-1]["reviewed"],
+        "error_breakdown": error_breakdown,
+        "last_7_days": daily[-7:],
+        "daily": daily[-days:],
+    }
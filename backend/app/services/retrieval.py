@@ -0,0 +1,205 @@
+import hashlib
+import json
+import math
+import os
+import re
+from collections import Counter
+from typing import List
+
+from sqlalchemy.orm import Session, load_only
+
+from app.models.database import File, FileChunk
+
+CHUNK_TOKENS = int(os.getenv("RETRIEVAL_CHUNK_TOKENS", "250"))
+TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "6"))
+TOKEN_BUDGET = int(os.getenv("RETRIEVAL_TOKEN_BUDGET", "3000"))
+
+# BM25 parameters.
+K1 = 1.5
+B = 0.75
+
+_TERM_RE = re.compile(r"[a-z0-9]+")
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+_STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have he her his i in is it its "
+    "me my of on or our she that the their them they this to was we were what "
+    "when where which who why will with you your".split()
+)
+
+EXCERPT_SEPARATOR = "\n\n[...]\n\n"
+
+
+def estimate_tokens(text: str) -> int:
+    # Roughly four characters per token for English prose.
+    return max(1, len(text) // 4)
+
+
+def tokenize(text: str) -> List[str]:
+    return [term for term in _TERM_RE.findall(text.lower()) if term not in _STOPWORDS]
+
+
+def _split_oversized(paragraph: str, max_tokens: int) -> List[str]:
+    pieces: List[str] = []
+    current = ""
+    for sentence in _SENTENCE_RE.split(paragraph):
+        candidate = f"{current} {sentence}".strip()
+        if current and estimate_tokens(candidate) > max_tokens:
+            pieces.append(current)
+            current = sentence
+        else:
+            current = candidate
+    if current:
+        pieces.append(current)
+
+    # A single sentence can still be too long (tables, pasted lists).
+    max_chars = max_tokens * 4
+    return [piece[i:i + max_chars] for piece in pieces for i in range(0, len(piece), max_chars)]
+
+
+def chunk_text(text: str, max_tokens: int = CHUNK_TOKENS) -> List[str]:
+    """Split text into chunks on paragraph boundaries.
+
+    Markdown headings always start a new chunk, which keeps chunk boundaries
+    stable across edits so unchanged sections keep their index rows.
+    """
+    paragraphs = [p.strip() for p in re.split(r"\n\s*\n", text or "") if p.strip()]
+    chunks: List[str] = []
+    current: List[str] = []
+    current_tokens = 0
+
+    for paragraph in paragraphs:
+        for piece in _split_oversized(paragraph, max_tokens):
+            piece_tokens = estimate_tokens(piece)
+            starts_section = piece.startswith("#")
+            if current and (starts_section or current_tokens + piece_tokens > max_tokens):
+                chunks.append("\n\n".join(current))
+                current, current_tokens = [], 0
+            current.append(piece)
+            current_tokens += piece_tokens
+
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+def _chunk_values(file_id: str, position: int, text: str, content_hash: str) -> dict:
+    return {
+        "file_id": file_id,
+        "position": position,
+        "content": text,
+        "content_hash": content_hash,
+        "token_count": estimate_tokens(text),
+        "term_counts": json.dumps(Counter(tokenize(text))),
+    }
+
+
+def chunk_rows(file_id: str, content: str) -> List[dict]:
+    """Index rows for a new file, for bulk inserts that bypass ``index_file``."""
+    return [
+        _chunk_values(file_id, position, text, hashlib.sha1(text.encode("utf-8")).hexdigest())
+        for position, text in enumerate(chunk_text(content))
+    ]
+
+
+def index_file(db: Session, file: File) -> None:
+    """Bring the chunk index for a file in line with its content.
+
+    Chunks whose text is unchanged keep their rows; only new or edited
+    chunks are tokenized and inserted. The caller commits.
+    """
+    existing: dict[str, List[FileChunk]] = {}
+    chunks = (
+        db.query(FileChunk)
+        .options(load_only(FileChunk.id, FileChunk.position, FileChunk.content_hash))
+        .filter(FileChunk.file_id == file.id)
+    )
+    for chunk in chunks:
+        existing.setdefault(chunk.content_hash, []).append(chunk)
+
+    for position, text in enumerate(chunk_text(file.content or "")):
+        content_hash = hashlib.sha1(text.encode("utf-8")).hexdigest()
+        reusable = existing.get(content_hash)
+        if reusable:
+            chunk = reusable.pop()
+            if chunk.position != position:
+                chunk.position = position
+            continue
+        db.add(FileChunk(**_chunk_values(file.id, position, text, content_hash)))
+
+    for stale in existing.values():
+        for chunk in stale:
+            db.delete(chunk)
+
+
+def _bm25_scores(query_terms: List[str], chunks: List[FileChunk]) -> dict[str, float]:
+    term_counts = {chunk.id: json.loads(chunk.term_counts) for chunk in chunks}
+    lengths = {chunk_id: sum(counts.values()) for chunk_id, counts in term_counts.items()}
+    avg_length = (sum(lengths.values()) / len(chunks)) or 1.0
+
+    scores = {chunk.id: 0.0 for chunk in chunks}
+    for term in set(query_terms):
+        containing = [chunk_id for chunk_id, counts in term_counts.items() if term in counts]
+        if not containing:
+            continue
+        idf = math.log(1 + (len(chunks) - len(containing) + 0.5) / (len(containing) + 0.5))
+        for chunk_id in containing:
+            tf = term_counts[chunk_id][term]
+            norm = K1 * (1 - B + B * lengths[chunk_id] / avg_length)
+            scores[chunk_id] += idf * tf * (K1 + 1) / (tf + norm)
+    return scores
+
+
+def retrieve_context(
+    db: Session,
+    file: File,
+    query: str,
+    top_k: int = TOP_K,
+    token_budget: int = TOKEN_BUDGET,
+) -> str:
+    """Return the parts of a file worth sending to the model for a question.
+
+    Files that fit in the budget are returned whole; larger files are
+    reduced to the top-k BM25 chunks, kept in document order.
+    """
+    content = file.content or ""
+    if estimate_tokens(content) <= token_budget:
+        return content
+
+    def load_chunks():
+        return (
+            db.query(FileChunk)
+            .options(load_only(FileChunk.id, FileChunk.position, FileChunk.token_count, FileChunk.term_counts))
+            .filter(FileChunk.file_id == file.id)
+            .all()
+        )
+
+    chunks = load_chunks()
+    if not chunks:
+        # Files saved before the index existed are indexed on first use.
+        index_file(db, file)
+        db.commit()
+        chunks = load_chunks()
+
+    scores = _bm25_scores(tokenize(query), chunks)
+    ranked = sorted(chunks, key=lambda chunk: (-scores[chunk.id], chunk.position))
+    if not scores or max(scores.values()) <= 0:
+        ranked = sorted(chunks, key=lambda chunk: chunk.position)
+
+    selected: List[FileChunk] = []
+    used = 0
+    for chunk in ranked:
+        if len(selected) >= top_k:
+            break
+        if used + chunk.token_count > token_budget:
+            continue
+        selected.append(chunk)
+        used += chunk.token_count
+
+    if not selected:
+        return content[: token_budget * 4]
+
+    selected.sort(key=lambda chunk: chunk.position)
+    texts = dict(
+        db.query(FileChunk.id, FileChunk.content).filter(FileChunk.id.in_([chunk.id for chunk in selected])).all()
+    )
+    return EXCERPT_SEPARATOR.join(texts[chunk.id] for chunk in selected)
@@ -0,0 +1,168 @@
+import asyncio
+import hashlib
+import logging
+import os
+from datetime import date, datetime, time, timedelta
+from typing import List, Optional, Tuple
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.agents.revision_agent import (
+    DAILY_REVISION_NOTE_CHARS,
+    DAILY_REVISION_NOTES,
+    DAILY_REVISION_TEMPLATE_ID,
+    REVISION_MODEL,
+    RevisionAgent,
+)
+from app.models.database import AsyncSessionLocal, RevisionDigest, RevisionNote
+
+logger = logging.getLogger(__name__)
+
+REVISION_DIGEST_ENABLED = os.getenv("REVISION_DIGEST_ENABLED", "true").lower() == "true"
+REVISION_DIGEST_INTERVAL_SECONDS = float(os.getenv("REVISION_DIGEST_INTERVAL_SECONDS", "300"))
+REVISION_DIGEST_RETENTION_DAYS = int(os.getenv("REVISION_DIGEST_RETENTION_DAYS", "30"))
+
+
+def _pending_filter(day: date):
+    # Everything unresolved that is due by the end of ``day``.
+    end_of_day = datetime.combine(day + timedelta(days=1), time.min)
+    return RevisionNote.is_resolved == False, RevisionNote.due_at < end_of_day  # noqa: E712
+
+
+async def digest_inputs(db: AsyncSession, day: date) -> Tuple[List[dict], int, str]:
+    """The notes a digest for ``day`` is built from, the pending count and their hash.
+
+    Only the part of each note the prompt actually uses is hashed, so a
+    change elsewhere (a review of a note past the first few, a long note's
+    tail) does not cost a model call.
+    """
+    filters = _pending_filter(day)
+    rows = (
+        await db.execute(
+            select(RevisionNote.id, RevisionNote.content)
+            .where(*filters)
+            .order_by(RevisionNote.due_at.asc(), RevisionNote.id.asc())
+            .limit(DAILY_REVISION_NOTES)
+        )
+    ).all()
+    count = await db.scalar(select(func.count(RevisionNote.id)).where(*filters))
+    notes = [{"id": row.id, "content": row.content[:DAILY_REVISION_NOTE_CHARS]} for row in rows]
+    digest = hashlib.sha256(f"{REVISION_MODEL}\n{DAILY_REVISION_TEMPLATE_ID}".encode("utf-8"))
+    for note in notes:
+        digest.update(f"\n{note['id']}\n{note['content']}".encode("utf-8"))
+    return notes, count or 0, digest.hexdigest()[:32]
+
+
+async def find_digest(db: AsyncSession, day: date, notes_hash: str) -> Optional[RevisionDigest]:
+    return await db.scalar(
+        select(RevisionDigest).where(RevisionDigest.digest_date == day, RevisionDigest.notes_hash == notes_hash)
+    )
+
+
+async def latest_digest(db: AsyncSession) -> Optional[RevisionDigest]:
+    return await db.scalar(select(RevisionDigest).order_by(RevisionDigest.created_at.desc()).limit(1))
+
+
+async def build_digest(day: date) -> Tuple[Optional[RevisionDigest], bool]:
+    """Generate and store the digest for ``day`` unless an identical one exists.
+
+    Returns the digest (None when nothing is pending) and whether it is new.
+    """
+    async with AsyncSessionLocal() as db:
+        notes, count, notes_hash = await digest_inputs(db, day)
+        if not notes:
+            return None, False
+        existing = await find_digest(db, day, notes_hash)
+        if existing is not None:
+            return existing, False
+
+        summary = await RevisionAgent().generate_daily_revision(notes)
+        digest = RevisionDigest(
+            digest_date=day, notes_hash=notes_hash, note_count=count, summary=summary, created_at=datetime.now()
+        )
+        db.add(digest)
+        try:
+            await db.commit()
+        except IntegrityError:
+            # Another process stored the same digest first.
+            await db.rollback()
+            return await find_digest(db, day, notes_hash), False
+        logger.info("Generated revision digest for %s from %d notes", day, count)
+        return digest, True
+
+
+class DigestScheduler:
+    """Keeps today's revision digest current from a background task.
+
+    Checks every ``REVISION_DIGEST_INTERVAL_SECONDS`` (or sooner when woken)
+    and only calls the model when the digest's inputs changed.
+    """
+
+    def __init__(self, interval_seconds: float = REVISION_DIGEST_INTERVAL_SECONDS):
+        self.interval_seconds = interval_seconds
+        self._task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._pruned_on: Optional[date] = None
+        self.generated = 0
+        self.failed = 0
+
+    async def _prune(self, today: date) -> None:
+        if self._pruned_on == today:
+            return
+        cutoff = today - timedelta(days=REVISION_DIGEST_RETENTION_DAYS)
+        async with AsyncSessionLocal() as db:
+            await db.execute(delete(RevisionDigest).where(RevisionDigest.digest_date < cutoff))
+            await db.commit()
+        self._pruned_on = today
+
+    async def run_once(self) -> Optional[RevisionDigest]:
+        today = date.today()
+        await self._prune(today)
+        digest, created = await build_digest(today)
+        if created:
+            self.generated += 1
+        return digest
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self.failed += 1
+                logger.exception("Could not build the revision digest")
+                # Back off for a full interval; wake-ups must not hammer a failing model.
+                await asyncio.sleep(self.interval_seconds)
+                continue
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+    def wake(self) -> None:
+        """Check for changed notes now instead of at the next interval."""
+        if self._wake is not None:
+            self._wake.set()
+
+    async def start(self) -> None:
+        if self._task is not None or not REVISION_DIGEST_ENABLED:
+            return
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    def stats(self) -> dict:
+        return {"running": self._task is not None, "generated": self.generated, "failed": self.failed}
+
+
+digest_scheduler = DigestScheduler()
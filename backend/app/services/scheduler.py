@@ -0,0 +1,37 @@
+from datetime import datetime, timedelta
+from typing import Optional
+
+from app.models.database import RevisionNote
+
+# SM-2 (SuperMemo 2). Quality is graded 0-5; anything below 3 is a lapse
+# and restarts the repetition sequence.
+MIN_EASE_FACTOR = 1.3
+DEFAULT_QUALITY = 4
+
+
+def schedule_review(note: RevisionNote, quality: int = DEFAULT_QUALITY, now: Optional[datetime] = None) -> None:
+    now = now or datetime.now()
+    ease = note.ease_factor or 2.5
+    repetitions = note.repetitions or 0
+    interval = note.interval_days or 0.0
+
+    if quality < 3:
+        repetitions = 0
+        interval = 1.0
+    else:
+        repetitions += 1
+        if repetitions == 1:
+            interval = 1.0
+        elif repetitions == 2:
+            interval = 6.0
+        else:
+            interval = round(interval * ease, 2)
+
+    ease += 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02)
+
+    note.ease_factor = max(MIN_EASE_FACTOR, round(ease, 4))
+    note.repetitions = repetitions
+    note.interval_days = interval
+    note.last_reviewed = now
+    note.review_count = (note.review_count or 0) + 1
+    note.due_at = now + timedelta(days=interval)
@@ -0,0 +1,226 @@
+import html
+import logging
+import re
+from typing import List, Optional, Sequence
+
+from fastapi import HTTPException
+from sqlalchemy import bindparam, inspect, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+SEARCH_KINDS = ("file", "note", "revision_note", "chat_message")
+
+# kind -> (table, title column, file id column). Every source indexes its
+# `content`; files also index their name, ranked above the body.
+_SOURCES = {
+    "file": ("files", "name", "id"),
+    "note": ("notes", None, "file_id"),
+    "revision_note": ("revision_notes", None, "file_id"),
+    "chat_message": ("chat_messages", None, "file_id"),
+}
+
+_TERM_RE = re.compile(r"\w+", re.UNICODE)
+_SNIPPET_WORDS = 16
+# The database marks matches with private-use characters; the text is
+# HTML-escaped before they become <mark> tags, so stored content can never
+# inject markup.
+_MARK_START = "\ue000"
+_MARK_END = "\ue001"
+
+
+# --- SQLite: one FTS5 index over all sources, kept in sync by triggers. ---
+#
+# FTS rows are keyed by search_documents.id, an INTEGER PRIMARY KEY, rather
+# than the source tables' implicit rowids, which VACUUM may renumber.
+
+def _sqlite_triggers(kind: str) -> dict:
+    table, title_column, file_column = _SOURCES[kind]
+    title = f"new.{title_column}" if title_column else "NULL"
+    document = f"(SELECT id FROM search_documents WHERE kind = '{kind}' AND doc_id = {{row}}.id)"
+    watched = ", ".join(column for column in ("content", title_column) if column)
+    return {
+        f"search_{table}_insert": f"""
+            CREATE TRIGGER search_{table}_insert AFTER INSERT ON {table} BEGIN
+                INSERT INTO search_documents (kind, doc_id, file_id) VALUES ('{kind}', new.id, new.{file_column});
+                INSERT INTO search_fts (rowid, title, body) VALUES ({document.format(row="new")}, {title}, new.content);
+            END""",
+        f"search_{table}_update": f"""
+            CREATE TRIGGER search_{table}_update AFTER UPDATE OF {watched} ON {table} BEGIN
+                UPDATE search_fts SET title = {title}, body = new.content WHERE rowid = {document.format(row="new")};
+            END""",
+        f"search_{table}_delete": f"""
+            CREATE TRIGGER search_{table}_delete AFTER DELETE ON {table} BEGIN
+                DELETE FROM search_fts WHERE rowid = {document.format(row="old")};
+                DELETE FROM search_documents WHERE kind = '{kind}' AND doc_id = old.id;
+            END""",
+    }
+
+
+def _rebuild_sqlite_index(conn: Connection) -> None:
+    conn.exec_driver_sql("DELETE FROM search_fts")
+    conn.exec_driver_sql("DELETE FROM search_documents")
+    for kind, (table, title_column, file_column) in _SOURCES.items():
+        title = f"t.{title_column}" if title_column else "NULL"
+        conn.exec_driver_sql(
+            f"INSERT INTO search_documents (kind, doc_id, file_id) SELECT '{kind}', id, {file_column} FROM {table}"
+        )
+        conn.exec_driver_sql(
+            f"INSERT INTO search_fts (rowid, title, body) SELECT d.id, {title}, t.content FROM {table} t "
+            f"JOIN search_documents d ON d.kind = '{kind}' AND d.doc_id = t.id"
+        )
+
+
+def _ensure_sqlite_index(conn: Connection) -> None:
+    conn.exec_driver_sql(
+        "CREATE TABLE IF NOT EXISTS search_documents ("
+        "id INTEGER PRIMARY KEY, kind TEXT NOT NULL, doc_id TEXT NOT NULL, file_id TEXT, "
+        "UNIQUE (kind, doc_id))"
+    )
+    conn.exec_driver_sql(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS search_fts USING fts5(title, body, tokenize = 'porter unicode61')"
+    )
+
+    triggers = {}
+    for kind in _SOURCES:
+        triggers.update(_sqlite_triggers(kind))
+    existing = {row[0] for row in conn.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'trigger'")}
+    if existing.issuperset(triggers):
+        return
+
+    # New install, or a table was rebuilt and lost its triggers: reindex from scratch.
+    logger.info("Building full-text search index")
+    for name, ddl in triggers.items():
+        conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS {name}")
+        conn.exec_driver_sql(ddl)
+    _rebuild_sqlite_index(conn)
+
+
+# --- Postgres: a generated tsvector column with a GIN index per source. ---
+
+def _ensure_postgres_index(conn: Connection) -> None:
+    for table, title_column, _ in _SOURCES.values():
+        if "search_vector" in {column["name"] for column in inspect(conn).get_columns(table)}:
+            continue
+        logger.info("Adding search_vector to %s", table)
+        vector = "setweight(to_tsvector('english', coalesce(content, '')), 'B')"
+        if title_column:
+            vector = f"setweight(to_tsvector('english', coalesce({title_column}, '')), 'A') || {vector}"
+        conn.exec_driver_sql(
+            f"ALTER TABLE {table} ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ({vector}) STORED"
+        )
+        conn.exec_driver_sql(f"CREATE INDEX IF NOT EXISTS ix_{table}_search ON {table} USING GIN (search_vector)")
+
+
+def ensure_search_index(conn: Connection) -> None:
+    dialect = conn.dialect.name
+    if dialect == "sqlite":
+        _ensure_sqlite_index(conn)
+    elif dialect == "postgresql":
+        _ensure_postgres_index(conn)
+    else:
+        logger.warning("Full-text search is not supported on %s", dialect)
+
+
+def _fts_query(query: str) -> str:
+    # Quote every term so user input can never be read as FTS syntax; the
+    # last term also matches as a prefix for search-as-you-type.
+    terms = [term.replace('"', "") for term in _TERM_RE.findall(query)]
+    return " ".join(f'"{term}"' for term in terms) + ("*" if terms else "")
+
+
+def _search_sqlite(db: Session, query: str, kinds: Sequence[str], file_id: Optional[str], limit: int, offset: int):
+    match = _fts_query(query)
+    if not match:
+        return []
+    file_filter = "AND d.file_id = :file_id" if file_id else ""
+    statement = text(
+        f"""
+        SELECT d.kind, d.doc_id AS id, d.file_id, f.name AS file_name,
+               snippet(search_fts, -1, :mark_start, :mark_end, '…', {_SNIPPET_WORDS}) AS snippet,
+               -bm25(search_fts, 4.0, 1.0) AS score
+        FROM search_fts
+        JOIN search_documents d ON d.id = search_fts.rowid
+        LEFT JOIN files f ON f.id = d.file_id
+        WHERE search_fts MATCH :match AND d.kind IN :kinds {file_filter}
+        ORDER BY bm25(search_fts, 4.0, 1.0)
+        LIMIT :limit OFFSET :offset
+        """
+    ).bindparams(bindparam("kinds", expanding=True))
+    params = {
+        "match": match,
+        "kinds": list(kinds),
+        "file_id": file_id,
+        "limit": limit,
+        "offset": offset,
+        "mark_start": _MARK_START,
+        "mark_end": _MARK_END,
+    }
+    return db.execute(statement, params).mappings().all()
+
+
+def _search_postgres(db: Session, query: str, kinds: Sequence[str], file_id: Optional[str], limit: int, offset: int):
+    file_filter = "AND {column} = :file_id" if file_id else ""
+    hits = " UNION ALL ".join(
+        f"SELECT '{kind}' AS kind, t.id, t.{file_column} AS file_id, ts_rank(t.search_vector, q.query) AS score "
+        f"FROM {table} t, q WHERE t.search_vector @@ q.query {file_filter.format(column='t.' + file_column)}"
+        for kind, (table, _, file_column) in _SOURCES.items()
+        if kind in kinds
+    )
+    # Highlight only the rows on the page; ts_headline re-parses the text.
+    bodies = "COALESCE(" + ", ".join(f"{kind}.content" for kind in _SOURCES) + ")"
+    joins = "\n".join(
+        f"LEFT JOIN {table} {kind} ON page.kind = '{kind}' AND {kind}.id = page.id"
+        for kind, (table, _, _) in _SOURCES.items()
+    )
+    statement = text(
+        f"""
+        WITH q AS (SELECT websearch_to_tsquery('english', :query) AS query),
+        page AS (SELECT * FROM ({hits}) hits ORDER BY score DESC, id LIMIT :limit OFFSET :offset)
+        SELECT page.kind, page.id, page.file_id, files.name AS file_name,
+               ts_headline('english', {bodies}, q.query, :headline_options) AS snippet,
+               page.score
+        FROM page CROSS JOIN q
+        {joins}
+        LEFT JOIN files ON files.id = page.file_id
+        ORDER BY page.score DESC, page.id
+        """
+    )
+    params = {
+        "query": query,
+        "file_id": file_id,
+        "limit": limit,
+        "offset": offset,
+        "headline_options": f"StartSel={_MARK_START}, StopSel={_MARK_END}, "
+        f"MaxWords={_SNIPPET_WORDS}, MinWords=5, MaxFragments=1",
+    }
+    return db.execute(statement, params).mappings().all()
+
+
+def _highlight(snippet: Optional[str]) -> str:
+    escaped = html.escape(snippet or "")
+    return escaped.replace(_MARK_START, "<mark>").replace(_MARK_END, "</mark>")
+
+
+def search(
+    db: Session,
+    query: str,
+    *,
+    kinds: Optional[Sequence[str]] = None,
+    file_id: Optional[str] = None,
+    limit: int = 20,
+    offset: int = 0,
+) -> List[dict]:
+    """Ranked matches across files, notes, revision notes and chat messages."""
+    kinds = [kind for kind in (kinds or SEARCH_KINDS) if kind in _SOURCES]
+    if not kinds or not query.strip():
+        return []
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        rows = _search_sqlite(db, query, kinds, file_id, limit, offset)
+    elif dialect == "postgresql":
+        rows = _search_postgres(db, query, kinds, file_id, limit, offset)
+    else:
+        raise HTTPException(status_code=501, detail=f"Search is not supported on {dialect}")
+    return [{**row, "snippet": _highlight(row["snippet"])} for row in rows]
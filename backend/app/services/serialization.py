@@ -0,0 +1,43 @@
+import os
+from functools import lru_cache
+from typing import Optional, Sequence, Type
+
+import orjson
+from fastapi import Response
+from pydantic import BaseModel
+from sqlalchemy.engine import Row
+from sqlalchemy.orm import Query
+
+# Large listings skip ORM instances and per-row Pydantic validation: the
+# query selects exactly the schema's columns and the rows are encoded with
+# orjson. The endpoints keep their response_model, so OpenAPI is unchanged.
+LEAN_RESPONSES = os.getenv("LEAN_RESPONSES", "true").lower() == "true"
+
+_ORJSON_OPTIONS = orjson.OPT_UTC_Z  # matches Pydantic's "Z" suffix for UTC
+
+
+@lru_cache(maxsize=None)
+def _schema_columns(model, schema: Type[BaseModel]) -> Optional[tuple]:
+    # Only flat schemas whose every field is a column can take the lean path.
+    columns = model.__table__.columns
+    if not all(name in columns for name in schema.model_fields):
+        return None
+    return tuple(getattr(model, name) for name in schema.model_fields)
+
+
+def lean_query(query: Query, model, schema: Type[BaseModel]) -> Query:
+    """Narrow ``query`` to the columns ``schema`` serializes, when enabled."""
+    columns = _schema_columns(model, schema) if LEAN_RESPONSES else None
+    return query.with_entities(*columns) if columns else query
+
+
+def lean_response(rows: Sequence, schema: Type[BaseModel], response: Response):
+    """Encode rows from ``lean_query`` directly; ORM rows are returned as is."""
+    if not rows or not isinstance(rows[0], Row):
+        return rows
+    fields = tuple(schema.model_fields)
+    body = orjson.dumps([dict(zip(fields, row)) for row in rows], option=_ORJSON_OPTIONS)
+    headers = {
+        key: value for key, value in response.headers.items() if key not in ("content-length", "content-type")
+    }
+    return Response(content=body, media_type="application/json", headers=headers)
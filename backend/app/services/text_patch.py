@@ -0,0 +1,45 @@
+from typing import Iterable, Optional
+
+# Edit offsets count UTF-16 code units, the same as String.length and
+# selection offsets in the browser, so the editor can send them unchanged.
+
+
+def _utf16_offset(units: int) -> int:
+    return units * 2
+
+
+def apply_text_ops(content: str, ops: Iterable) -> str:
+    """Apply splice operations (``start``, ``end``, ``text``) to ``content``.
+
+    Every offset refers to the original text; ranges may not overlap.
+    Raises ValueError for out-of-range, overlapping or surrogate-splitting
+    edits.
+    """
+    encoded = content.encode("utf-16-le")
+    length = len(encoded) // 2
+    parts = []
+    position = 0
+    for op in sorted(ops, key=lambda op: (op.start, op.end)):
+        if not 0 <= op.start <= op.end <= length:
+            raise ValueError(f"Edit range {op.start}-{op.end} is outside the text (length {length})")
+        if op.start < position:
+            raise ValueError(f"Edit at {op.start} overlaps the previous edit")
+        parts.append(encoded[_utf16_offset(position):_utf16_offset(op.start)])
+        parts.append(op.text.encode("utf-16-le"))
+        position = op.end
+    parts.append(encoded[_utf16_offset(position):])
+    try:
+        return b"".join(parts).decode("utf-16-le")
+    except UnicodeDecodeError:
+        raise ValueError("Edit splits a surrogate pair") from None
+
+
+def parse_version_tag(value: Optional[str]) -> Optional[int]:
+    """Read a version number from an ETag / If-Match value such as ``W/"12"``."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.startswith("W/"):
+        value = value[2:]
+    value = value.strip('"')
+    return int(value) if value.isdigit() else None
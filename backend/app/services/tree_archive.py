@@ -0,0 +1,340 @@
+import io
+import logging
+import os
+import tarfile
+import tempfile
+import zipfile
+from collections import defaultdict
+from datetime import datetime
+from typing import AsyncIterable, Dict, Iterator, List, Optional, Tuple
+
+import orjson
+from sqlalchemy import func, insert, select
+
+from app.models.database import Directory, File, FileChunk, Note, RevisionNote, SessionLocal, generate_uuid
+from app.models.schemas import NoteResponse, RevisionNoteResponse
+from app.services.directory_tree import child_path, delete_subtree
+from app.services.metrics import mark_batched
+from app.services.retrieval import chunk_rows
+
+logger = logging.getLogger(__name__)
+
+IMPORT_MAX_BYTES = int(os.getenv("IMPORT_MAX_BYTES", str(200 * 1024 * 1024)))
+IMPORT_MAX_FILE_BYTES = int(os.getenv("IMPORT_MAX_FILE_BYTES", str(2 * 1024 * 1024)))
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "200"))
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "100"))
+
+# Uploads larger than this are spooled to disk instead of held in memory.
+SPOOL_MEMORY_BYTES = 8 * 1024 * 1024
+TEXT_SUFFIXES = (".md", ".markdown", ".txt")
+STRIPPED_SUFFIXES = (".md", ".markdown")
+NOTES_SUFFIX = ".notes.json"
+MAX_REPORTED_SKIPS = 100
+
+
+class ArchiveError(ValueError):
+    pass
+
+
+class ArchiveTooLarge(ArchiveError):
+    pass
+
+
+async def spool_upload(chunks: AsyncIterable[bytes], max_bytes: int = IMPORT_MAX_BYTES):
+    """Copy a request body to a temporary file without holding it in memory."""
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MEMORY_BYTES)
+    size = 0
+    try:
+        async for chunk in chunks:
+            size += len(chunk)
+            if size > max_bytes:
+                raise ArchiveTooLarge(f"Archive is larger than {max_bytes} bytes")
+            spool.write(chunk)
+    except BaseException:
+        spool.close()
+        raise
+    spool.seek(0)
+    return spool
+
+
+class Archive:
+    """A zip or (optionally compressed) tar archive opened from a file object."""
+
+    def __init__(self, fileobj):
+        self._fileobj = fileobj
+        self._zip: Optional[zipfile.ZipFile] = None
+        self._tar: Optional[tarfile.TarFile] = None
+        # Known up front for zips (central directory); tars are read in one pass.
+        self.total_files: Optional[int] = None
+        try:
+            if zipfile.is_zipfile(fileobj):
+                fileobj.seek(0)
+                self._zip = zipfile.ZipFile(fileobj)
+                self.total_files = sum(1 for info in self._zip.infolist() if not info.is_dir())
+            else:
+                fileobj.seek(0)
+                self._tar = tarfile.open(fileobj=fileobj, mode="r:*")
+        except (zipfile.BadZipFile, tarfile.TarError) as exc:
+            raise ArchiveError("Upload a zip or tar archive") from exc
+
+    def members(self, max_file_bytes: int = IMPORT_MAX_FILE_BYTES) -> Iterator[Tuple[str, bool, Optional[bytes]]]:
+        """Yield ``(name, is_dir, data)``; data is None for oversized files.
+
+        Reads at most ``max_file_bytes + 1`` bytes of a member, whatever
+        size its header claims.
+        """
+        if self._zip is not None:
+            for info in self._zip.infolist():
+                if info.is_dir():
+                    yield info.filename, True, None
+                    continue
+                with self._zip.open(info) as member:
+                    data = member.read(max_file_bytes + 1)
+                yield info.filename, False, data if len(data) <= max_file_bytes else None
+            return
+        for info in self._tar:
+            if info.isdir():
+                yield info.name, True, None
+            elif info.isfile():
+                data = self._tar.extractfile(info).read(max_file_bytes + 1)
+                yield info.name, False, data if len(data) <= max_file_bytes else None
+
+    def close(self) -> None:
+        for archive in (self._zip, self._tar):
+            if archive is not None:
+                archive.close()
+        self._fileobj.close()
+
+
+def _clean_parts(name: str) -> Optional[List[str]]:
+    # Hidden entries and macOS resource forks are noise; ".." never maps to a folder.
+    parts = [part for part in name.replace("\\", "/").split("/") if part not in ("", ".")]
+    if not parts or ".." in parts or any(part.startswith(".") or part == "__MACOSX" for part in parts):
+        return None
+    return parts
+
+
+def _file_name(filename: str) -> str:
+    lowered = filename.lower()
+    for suffix in STRIPPED_SUFFIXES:
+        if lowered.endswith(suffix) and len(filename) > len(suffix):
+            return filename[: -len(suffix)]
+    return filename
+
+
+def import_archive(
+    archive: Archive,
+    name: str,
+    parent_id: Optional[str] = None,
+    parent_path: Optional[str] = None,
+    batch_size: int = IMPORT_BATCH_SIZE,
+) -> Iterator[dict]:
+    """Import ``archive`` as a new directory ``name`` and yield progress events.
+
+    Folders become directories and text files become files. Rows are
+    inserted in batches of ``batch_size`` files, one transaction each, so
+    memory stays bounded by the batch. If the import fails or the client
+    goes away, everything imported so far is deleted again.
+    """
+    db = SessionLocal()
+    root_id = generate_uuid()
+    folders: Dict[tuple, Tuple[str, str]] = {(): (root_id, child_path(parent_path, root_id))}
+    directories = [{"id": root_id, "name": name, "parent_id": parent_id, "path": folders[()][1]}]
+    files: List[dict] = []
+    chunks: List[dict] = []
+    counts = {"directories": 0, "files": 0, "skipped": 0}
+    skipped: List[dict] = []
+
+    def folder(parts: tuple) -> str:
+        for depth in range(1, len(parts) + 1):
+            key = parts[:depth]
+            if key not in folders:
+                parent_folder_id, parent_folder_path = folders[key[:-1]]
+                directory_id = generate_uuid()
+                folders[key] = (directory_id, child_path(parent_folder_path, directory_id))
+                directories.append(
+                    {"id": directory_id, "name": key[-1], "parent_id": parent_folder_id, "path": folders[key][1]}
+                )
+        return folders[parts][0]
+
+    def skip(path: str, reason: str) -> None:
+        counts["skipped"] += 1
+        if len(skipped) < MAX_REPORTED_SKIPS:
+            skipped.append({"path": path, "reason": reason})
+
+    def flush() -> None:
+        # Parents before children before chunks, for the foreign keys.
+        for model, rows in ((Directory, directories), (File, files), (FileChunk, chunks)):
+            if rows:
+                db.execute(insert(model), rows)
+        db.commit()
+        counts["directories"] += len(directories)
+        counts["files"] += len(files)
+        directories.clear()
+        files.clear()
+        chunks.clear()
+
+    def progress(event: str) -> dict:
+        return {"event": event, "directory_id": root_id, **counts, "total_files": archive.total_files}
+
+    mark_batched()
+    try:
+        yield progress("started")
+        for member, is_dir, data in archive.members():
+            parts = _clean_parts(member)
+            if parts is None:
+                continue
+            if is_dir:
+                folder(tuple(parts))
+                continue
+            filename = parts[-1]
+            if not filename.lower().endswith(TEXT_SUFFIXES) or filename.lower().endswith(NOTES_SUFFIX):
+                skip(member, "not a markdown or text file")
+                continue
+            if data is None:
+                skip(member, f"larger than {IMPORT_MAX_FILE_BYTES} bytes")
+                continue
+            file_id = generate_uuid()
+            content = data.decode("utf-8-sig", errors="replace")
+            files.append(
+                {"id": file_id, "name": _file_name(filename), "content": content,
+                 "directory_id": folder(tuple(parts[:-1])), "version": 1}
+            )
+            chunks.extend(chunk_rows(file_id, content))
+            if len(files) >= batch_size:
+                flush()
+                yield progress("progress")
+        flush()
+        yield {**progress("done"), "skipped_files": skipped}
+    except GeneratorExit:
+        logger.warning("Import into %s abandoned by the client; removing it", root_id)
+        _discard(db, root_id)
+        raise
+    except Exception as exc:
+        logger.exception("Import into %s failed", root_id)
+        _discard(db, root_id)
+        detail = str(exc) if isinstance(exc, ArchiveError) else "Import failed; nothing was kept"
+        yield {**progress("error"), "detail": detail}
+    finally:
+        db.close()
+        archive.close()
+
+
+def _discard(db, root_id: str) -> None:
+    db.rollback()
+    root = db.get(Directory, root_id)
+    if root is not None:
+        delete_subtree(db, root)
+        db.commit()
+
+
+class _ZipStream(io.RawIOBase):
+    """Collects what ZipFile writes so it can be handed out chunk by chunk."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _safe_name(name: str) -> str:
+    cleaned = name.replace("/", "_").replace("\\", "_").strip() or "untitled"
+    return "_" + cleaned if cleaned.startswith(".") else cleaned
+
+
+def _unique(name: str, taken: set, suffix: str = "") -> str:
+    candidate, counter = name, 1
+    while (candidate + suffix).lower() in taken:
+        counter += 1
+        candidate = f"{name} ({counter})"
+    taken.add((candidate + suffix).lower())
+    return candidate + suffix
+
+
+def _zip_info(path: str, modified: Optional[datetime]) -> zipfile.ZipInfo:
+    moment = modified if modified is not None and modified.year >= 1980 else datetime.now()
+    info = zipfile.ZipInfo(path, date_time=moment.timetuple()[:6])
+    info.compress_type = zipfile.ZIP_DEFLATED
+    return info
+
+
+def _notes_by_file(db, file_ids: List[str]) -> Dict[str, dict]:
+    sidecars: Dict[str, dict] = defaultdict(lambda: {"notes": [], "revision_notes": []})
+    for note in db.query(Note).filter(Note.file_id.in_(file_ids)).order_by(Note.created_at):
+        sidecars[note.file_id]["notes"].append(NoteResponse.model_validate(note).model_dump(mode="json"))
+    for note in db.query(RevisionNote).filter(RevisionNote.file_id.in_(file_ids)).order_by(RevisionNote.created_at):
+        sidecars[note.file_id]["revision_notes"].append(
+            RevisionNoteResponse.model_validate(note).model_dump(mode="json")
+        )
+    return sidecars
+
+
+def export_archive(root: Directory, include_notes: bool = False, batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[bytes]:
+    """Stream ``root`` and its subtree as a zip, one file at a time.
+
+    Files are read in keyset-paginated batches and each compressed entry is
+    yielded as soon as it is written, so neither the subtree nor the
+    archive is ever held in memory. With ``include_notes`` each file with
+    notes gets a ``<name>.notes.json`` next to it.
+    """
+    mark_batched()
+    db = SessionLocal()
+    stream = _ZipStream()
+    try:
+        in_subtree = Directory.path.like(f"{root.path}%")
+        rows = db.execute(
+            select(Directory.id, Directory.name, Directory.parent_id, Directory.updated_at)
+            .where(in_subtree)
+            .order_by(func.length(Directory.path))
+        ).all()
+        folders: Dict[str, str] = {}
+        taken: Dict[str, set] = defaultdict(set)
+        with zipfile.ZipFile(stream, "w") as archive:
+            for row in rows:
+                if row.id == root.id:
+                    folders[row.id] = _safe_name(row.name)
+                else:
+                    parent = folders[row.parent_id]
+                    folders[row.id] = f"{parent}/{_unique(_safe_name(row.name), taken[row.parent_id])}"
+                # Explicit entries keep empty directories.
+                archive.writestr(_zip_info(folders[row.id] + "/", row.updated_at), b"")
+            yield stream.drain()
+
+            last_id = ""
+            while True:
+                batch = db.execute(
+                    select(File.id, File.name, File.content, File.directory_id, File.updated_at)
+                    .where(File.directory_id.in_(select(Directory.id).where(in_subtree)), File.id > last_id)
+                    .order_by(File.id)
+                    .limit(batch_size)
+                ).all()
+                if not batch:
+                    break
+                last_id = batch[-1].id
+                sidecars = _notes_by_file(db, [row.id for row in batch]) if include_notes else {}
+                for row in batch:
+                    name = _safe_name(row.name)
+                    suffix = "" if name.lower().endswith(TEXT_SUFFIXES) else ".md"
+                    filename = _unique(name, taken[row.directory_id], suffix)
+                    folder = folders[row.directory_id]
+                    archive.writestr(_zip_info(f"{folder}/{filename}", row.updated_at), row.content or "")
+                    if row.id in sidecars:
+                        sidecar = _unique(_file_name(filename), taken[row.directory_id], NOTES_SUFFIX)
+                        archive.writestr(
+                            _zip_info(f"{folder}/{sidecar}", row.updated_at),
+                            orjson.dumps(sidecars[row.id], option=orjson.OPT_INDENT_2),
+                        )
+                    yield stream.drain()
+        yield stream.drain()
+    finally:
+        db.close()
@@ -0,0 +1,180 @@
+"""Deterministic synthetic corpus shaped like a real UPSC notes workspace."""
+import random
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import List
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.models.database import ChatMessage, Directory, File, Note, RevisionNote, generate_uuid
+from app.models.schemas import ERROR_TYPES
+from app.services.retrieval import index_file
+
+SUBJECTS = [
+    "Polity", "Modern History", "Ancient History", "Geography", "Economy", "Environment",
+    "Science and Technology", "Ethics", "International Relations", "Art and Culture",
+]
+TOPICS = [
+    "Fundamental Rights", "Directive Principles", "Parliament", "Judiciary", "Federalism", "Panchayati Raj",
+    "Revolt of 1857", "Gandhian movements", "Mauryan empire", "Monsoon", "Plate tectonics", "Inflation",
+    "Monetary policy", "Fiscal deficit", "Biodiversity hotspots", "Climate agreements", "Space missions",
+    "Emotional intelligence", "Non-aligned movement", "Temple architecture",
+]
+VOCABULARY = (
+    "article constitution amendment supreme court high court writ parliament lok sabha rajya sabha president "
+    "governor emergency schedule citizenship federal union state concurrent list finance commission "
+    "election commission battle treaty governor-general viceroy congress session movement satyagraha "
+    "monsoon cyclone plateau river basin soil erosion inflation repo rate fiscal policy gdp tariff "
+    "biodiversity wetland ramsar national park tiger reserve isro satellite launch vehicle ethics integrity "
+    "probity empathy accountability dynasty inscription stupa temple nagara dravida vesara"
+).split()
+QUESTIONS = [
+    "Explain {topic} in simple terms.",
+    "What is the difference between {a} and {b}?",
+    "Give me three likely prelims questions on {topic}.",
+    "Why is {topic} important for the mains exam?",
+    "Summarise the key articles related to {topic}.",
+]
+
+
+@dataclass
+class CorpusSpec:
+    depth: int = 4
+    fanout: int = 3
+    files_per_directory: int = 2
+    file_kb: int = 24
+    notes_per_file: int = 6
+    revision_notes_per_file: int = 8
+    chat_turns_per_file: int = 10
+    seed: int = 1
+
+
+SCALES = {
+    "small": CorpusSpec(depth=3, fanout=2, files_per_directory=2, file_kb=8),
+    "medium": CorpusSpec(),
+    "large": CorpusSpec(depth=5, fanout=3, files_per_directory=3, file_kb=64, chat_turns_per_file=30),
+}
+
+
+@dataclass
+class Corpus:
+    root_ids: List[str]
+    directory_ids: List[str]
+    file_ids: List[str]
+    revision_note_ids: List[str]
+    topics: List[str]
+
+
+def _paragraph(rng: random.Random, topic: str) -> str:
+    words = rng.choices(VOCABULARY, k=rng.randint(40, 90))
+    words[rng.randrange(len(words))] = topic.lower()
+    return " ".join(words).capitalize() + "."
+
+
+def _document(rng: random.Random, topic: str, size_kb: int) -> str:
+    sections = [f"# {topic}"]
+    while sum(len(section) for section in sections) < size_kb * 1024:
+        sections.append(f"## {rng.choice(TOPICS)}")
+        sections.extend(_paragraph(rng, topic) for _ in range(rng.randint(2, 5)))
+    return "\n\n".join(sections)
+
+
+def generate_corpus(db: Session, spec: CorpusSpec) -> Corpus:
+    """Insert a directory tree with files, notes, revision notes and chat history."""
+    rng = random.Random(spec.seed)
+    start = datetime.now() - timedelta(days=60)
+
+    directories, files = [], []
+    level = []
+    for subject in SUBJECTS[: spec.fanout + 1]:
+        directory_id = generate_uuid()
+        directory = {"id": directory_id, "name": subject, "parent_id": None, "path": f"/{directory_id}/"}
+        directories.append(directory)
+        level.append(directory)
+    root_ids = [directory["id"] for directory in level]
+    for depth in range(1, spec.depth):
+        next_level = []
+        for parent in level:
+            for n in range(spec.fanout):
+                directory_id = generate_uuid()
+                directory = {
+                    "id": directory_id,
+                    "name": f"{rng.choice(TOPICS)} {depth}.{n}",
+                    "parent_id": parent["id"],
+                    "path": f"{parent['path']}{directory_id}/",
+                }
+                directories.append(directory)
+                next_level.append(directory)
+        level = next_level
+
+    for directory in directories:
+        for _ in range(spec.files_per_directory):
+            topic = rng.choice(TOPICS)
+            files.append(
+                {
+                    "id": generate_uuid(),
+                    "name": f"{topic} notes",
+                    "content": _document(rng, topic, spec.file_kb),
+                    "directory_id": directory["id"],
+                    "topic": topic,
+                }
+            )
+
+    db.execute(insert(Directory), directories)
+    db.execute(insert(File), [{key: value for key, value in file.items() if key != "topic"} for file in files])
+
+    notes, revision_notes, messages = [], [], []
+    for file in files:
+        topic = file["topic"]
+        for _ in range(spec.notes_per_file):
+            notes.append(
+                {
+                    "content": _paragraph(rng, topic),
+                    "file_id": file["id"],
+                    "note_type": rng.choice(["IMPORTANT", "QNA", "ESSAY", "REVISION"]),
+                }
+            )
+        for _ in range(spec.revision_notes_per_file):
+            created = start + timedelta(minutes=rng.randrange(60 * 24 * 60))
+            revision_notes.append(
+                {
+                    "id": generate_uuid(),
+                    "content": f"Confused {rng.choice(TOPICS)} with {topic}: " + " ".join(rng.choices(VOCABULARY, k=12)),
+                    "file_id": file["id"],
+                    "error_type": rng.choice(ERROR_TYPES),
+                    "error_type_source": "user",
+                    "is_resolved": rng.random() < 0.3,
+                    "created_at": created,
+                    "last_reviewed": created,
+                    "due_at": created + timedelta(days=rng.randint(0, 90)),
+                }
+            )
+        for turn in range(spec.chat_turns_per_file):
+            created = start + timedelta(minutes=turn * 5)
+            question = rng.choice(QUESTIONS).format(topic=topic, a=topic, b=rng.choice(TOPICS))
+            messages.append({"role": "user", "content": question, "file_id": file["id"], "created_at": created})
+            messages.append(
+                {
+                    "role": "assistant",
+                    "content": " ".join(_paragraph(rng, topic) for _ in range(3)),
+                    "file_id": file["id"],
+                    "created_at": created + timedelta(seconds=5),
+                }
+            )
+
+    db.execute(insert(Note), notes)
+    db.execute(insert(RevisionNote), revision_notes)
+    db.execute(insert(ChatMessage), messages)
+
+    for file in db.query(File).all():
+        index_file(db, file)
+    db.commit()
+
+    return Corpus(
+        root_ids=root_ids,
+        directory_ids=[directory["id"] for directory in directories],
+        file_ids=[file["id"] for file in files],
+        revision_note_ids=[note["id"] for note in revision_notes],
+        topics=sorted({file["topic"] for file in files}),
+    )
@@ -0,0 +1,97 @@
+"""A deterministic stand-in for Gemini with configurable latency."""
+import asyncio
+import hashlib
+import json
+import random
+import re
+from contextlib import ExitStack, contextmanager
+from typing import Iterator
+
+from pydantic_ai.exceptions import ModelHTTPError
+from pydantic_ai.messages import ModelMessage, ModelResponse, TextPart
+from pydantic_ai.models.function import AgentInfo, FunctionModel
+
+from app.models.schemas import ERROR_TYPES
+
+
+def _digest(text: str) -> int:
+    return int(hashlib.sha1(text.encode("utf-8")).hexdigest()[:8], 16)
+
+
+def _prompt(messages: list[ModelMessage]) -> str:
+    return str(messages[-1].parts[-1].content)
+
+
+def _answer(prompt: str) -> str:
+    if "Return only one word" in prompt:
+        return ERROR_TYPES[_digest(prompt) % len(ERROR_TYPES)]
+    batch = re.search(r"JSON array of (\d+) strings", prompt)
+    if batch:
+        count = int(batch.group(1))
+        return json.dumps([ERROR_TYPES[(_digest(prompt) + n) % len(ERROR_TYPES)] for n in range(count)])
+    if "confusion points" in prompt:
+        return "[]"
+    words = ["The", "answer", "covers", "the", "key", "articles", "and", "likely", "exam", "angles."]
+    return " ".join(words[n % len(words)] for n in range(60 + _digest(prompt) % 60))
+
+
+class FakeLLM:
+    """Answers every prompt after ``latency_ms``; streams in ``chunks`` pieces.
+
+    With ``failure_rate`` a share of calls fail with a 429, like a provider
+    that is rate limiting us. With ``tail_rate`` a share of calls take ten
+    times as long, like a provider's slow tail.
+    """
+
+    def __init__(
+        self,
+        latency_ms: float = 300,
+        chunks: int = 20,
+        failure_rate: float = 0.0,
+        tail_rate: float = 0.0,
+        seed: int = 1,
+    ):
+        self.latency = latency_ms / 1000
+        self.chunks = chunks
+        self.failure_rate = failure_rate
+        self.tail_rate = tail_rate
+        self.calls = 0
+        self.failures = 0
+        self._rng = random.Random(seed)
+
+    def _maybe_fail(self) -> None:
+        if self.failure_rate and self._rng.random() < self.failure_rate:
+            self.failures += 1
+            raise ModelHTTPError(429, "fake", body={"error": "RESOURCE_EXHAUSTED"})
+
+    async def _respond(self, messages: list[ModelMessage], info: AgentInfo) -> ModelResponse:
+        self.calls += 1
+        slow = self.tail_rate and self._rng.random() < self.tail_rate
+        await asyncio.sleep(self.latency * (10 if slow else 1))
+        self._maybe_fail()
+        return ModelResponse(parts=[TextPart(_answer(_prompt(messages)))])
+
+    async def _stream(self, messages: list[ModelMessage], info: AgentInfo):
+        self.calls += 1
+        self._maybe_fail()
+        words = _answer(_prompt(messages)).split(" ")
+        step = max(1, len(words) // self.chunks)
+        for start in range(0, len(words), step):
+            await asyncio.sleep(self.latency / self.chunks)
+            yield " ".join(words[start:start + step]) + " "
+
+    def model(self) -> FunctionModel:
+        return FunctionModel(self._respond, stream_function=self._stream)
+
+
+@contextmanager
+def fake_llm(latency_ms: float = 300, failure_rate: float = 0.0) -> Iterator[FakeLLM]:
+    """Route chat_agent and revision_agent to a FakeLLM for the duration."""
+    from app.agents.chat_agent import get_chat_agent
+    from app.agents.revision_agent import get_revision_agent
+
+    fake = FakeLLM(latency_ms, failure_rate=failure_rate)
+    with ExitStack() as stack:
+        for agent in (get_chat_agent(), get_revision_agent()):
+            stack.enter_context(agent.override(model=fake.model()))
+        yield fake
@@ -0,0 +1,82 @@
+"""Drive the LLM gateway with a burst of calls against the fake model.
+
+    python -m bench.gateway --calls 200 --duplicates 0.3 --failure-rate 0.1
+    python -m bench.gateway --concurrency 4 --rate-per-minute 600
+
+Shows how queueing, coalescing and retries behave for a given setting
+before changing it in production. No database or API key is needed.
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+
+os.environ["CHAT_MODEL"] = "test"
+os.environ["REVISION_MODEL"] = "test"
+
+from app.agents.chat_agent import get_chat_agent  # noqa: E402
+from app.agents.gateway import LLMGateway, LLMUnavailableError  # noqa: E402
+from bench.fake_llm import fake_llm  # noqa: E402
+
+
+async def drive(gateway: LLMGateway, calls: int, duplicates: float, seed: int) -> dict:
+    rng = random.Random(seed)
+    agent = get_chat_agent()
+    prompts = [
+        "Explain question 0" if i and rng.random() < duplicates else f"Explain question {i}" for i in range(calls)
+    ]
+    latencies, outcomes = [], {}
+
+    async def one(prompt: str) -> None:
+        started = time.perf_counter()
+        try:
+            await gateway.run(agent, prompt, name="bench", model="fake", operation="run")
+            outcome = "ok"
+        except LLMUnavailableError:
+            outcome = "unavailable"
+        except Exception as exc:
+            outcome = type(exc).__name__
+        latencies.append((time.perf_counter() - started) * 1000)
+        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(prompt) for prompt in prompts))
+    return {
+        "elapsed_s": round(time.perf_counter() - started, 2),
+        "p50_ms": round(statistics.median(latencies), 1),
+        "max_ms": round(max(latencies), 1),
+        "outcomes": outcomes,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--duplicates", type=float, default=0.3, help="Share of calls repeating one prompt")
+    parser.add_argument("--latency-ms", type=float, default=300)
+    parser.add_argument("--failure-rate", type=float, default=0.1, help="Share of upstream calls answering 429")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rate-per-minute", type=float, default=0)
+    parser.add_argument("--max-queue", type=int, default=1000)
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--retry-base", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    gateway = LLMGateway(
+        max_concurrency=args.concurrency,
+        rate_per_minute=args.rate_per_minute,
+        max_queue=args.max_queue,
+        timeout_seconds=args.timeout,
+        retry_base_seconds=args.retry_base,
+    )
+    with fake_llm(args.latency_ms, failure_rate=args.failure_rate) as fake:
+        result = asyncio.run(drive(gateway, args.calls, args.duplicates, args.seed))
+    print(result)
+    print({"upstream_calls": fake.calls, "upstream_429s": fake.failures, **gateway.stats()})
+
+
+if __name__ == "__main__":
+    main()
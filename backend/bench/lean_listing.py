@@ -0,0 +1,105 @@
+"""Compare the ORM + Pydantic listing path with the lean orjson path.
+
+    python -m bench.lean_listing --rows 5000 --repeat 20
+
+Runs against a throwaway SQLite database; nothing touches dev.db.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+_db_dir = tempfile.mkdtemp(prefix="bench-lean-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_db_dir}/bench.db"
+os.environ.setdefault("JOB_WORKERS", "0")
+os.environ["CHAT_MODEL"] = "test"
+os.environ["REVISION_MODEL"] = "test"
+os.environ["AUTO_MIGRATE"] = "false"
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import insert  # noqa: E402
+
+from app.main import app  # noqa: E402
+from app.models.database import ChatMessage, Directory, File, RevisionNote, SessionLocal, engine, generate_uuid  # noqa: E402
+from app.models.migrations import run_migrations  # noqa: E402
+from app.services import serialization  # noqa: E402
+
+
+def seed(rows: int) -> str:
+    db = SessionLocal()
+    try:
+        directory_id = generate_uuid()
+        directory = Directory(id=directory_id, name="bench", path=f"/{directory_id}/")
+        db.add(directory)
+        db.flush()
+        file_id = generate_uuid()
+        db.execute(
+            insert(File),
+            [
+                {"id": file_id if i == 0 else generate_uuid(), "name": f"file {i}", "content": "lorem ipsum " * 40,
+                 "directory_id": directory.id}
+                for i in range(rows)
+            ],
+        )
+        now = datetime.now()
+        db.execute(
+            insert(RevisionNote),
+            [
+                {"content": f"revision note {i}", "file_id": file_id, "error_type": "MISTAKE", "due_at": now}
+                for i in range(rows)
+            ],
+        )
+        db.execute(
+            insert(ChatMessage),
+            [
+                {"role": "user" if i % 2 else "assistant", "content": "message " * 30, "file_id": file_id}
+                for i in range(rows)
+            ],
+        )
+        db.commit()
+        return file_id
+    finally:
+        db.close()
+
+
+def measure(client: TestClient, url: str, repeat: int) -> list[float]:
+    client.get(url)  # warm up
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = client.get(url)
+        timings.append((time.perf_counter() - start) * 1000)
+        response.raise_for_status()
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    run_migrations(engine)
+    file_id = seed(args.rows)
+    urls = {
+        "files": "/api/files/",
+        "revision notes": f"/api/revision/file/{file_id}",
+        "chat history": f"/api/chat/file/{file_id}",
+    }
+
+    print(f"{args.rows} rows per listing, median of {args.repeat} requests")
+    print(f"{'listing':<16}{'orm (ms)':>10}{'lean (ms)':>11}{'speedup':>9}")
+    with TestClient(app) as client:
+        for name, url in urls.items():
+            serialization.LEAN_RESPONSES = False
+            orm = statistics.median(measure(client, url, args.repeat))
+            serialization.LEAN_RESPONSES = True
+            lean = statistics.median(measure(client, url, args.repeat))
+            print(f"{name:<16}{orm:>10.1f}{lean:>11.1f}{orm / lean:>8.1f}x")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+"""Drive the model router with two stand-in models of different quality.
+
+    python -m bench.model_router --calls 300 --tail-rate 0.05 --failure-rate 0.05
+    python -m bench.model_router --no-hedging
+
+The primary model answers quickly but has a slow tail and some 429s; the
+fallback is slower but steady. Shows how hedging and failover move the
+latency percentiles. No database or API key is needed.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+os.environ["CHAT_MODEL"] = "test"
+os.environ["REVISION_MODEL"] = "test"
+
+from app.agents.chat_agent import get_chat_agent  # noqa: E402
+from app.agents.gateway import LLMGateway, LLMUnavailableError  # noqa: E402
+from app.agents.model_router import STANDARD, ModelRouter  # noqa: E402
+from bench.fake_llm import FakeLLM  # noqa: E402
+
+
+async def drive(router: ModelRouter, calls: int, concurrency: int) -> dict:
+    agent = get_chat_agent()
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, outcomes = [], {}
+
+    async def one(i: int) -> None:
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                await router.run(agent, f"Explain question {i}", name="bench", operation="chat")
+                outcome = "ok"
+            except LLMUnavailableError:
+                outcome = "unavailable"
+            except Exception as exc:
+                outcome = type(exc).__name__
+            latencies.append((time.perf_counter() - started) * 1000)
+            outcomes[outcome] = outcomes.get(outcome, 0) + 1
+
+    await asyncio.gather(*(one(i) for i in range(calls)))
+    quantiles = statistics.quantiles(latencies, n=100)
+    return {
+        "p50_ms": round(quantiles[49], 1),
+        "p95_ms": round(quantiles[94], 1),
+        "p99_ms": round(quantiles[98], 1),
+        "outcomes": outcomes,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--primary-latency-ms", type=float, default=100)
+    parser.add_argument("--fallback-latency-ms", type=float, default=250)
+    parser.add_argument("--tail-rate", type=float, default=0.05, help="Share of primary calls taking 10x as long")
+    parser.add_argument("--failure-rate", type=float, default=0.05, help="Share of primary calls answering 429")
+    parser.add_argument("--budget", type=float, default=10)
+    parser.add_argument("--no-hedging", action="store_true")
+    args = parser.parse_args()
+
+    primary = FakeLLM(args.primary_latency_ms, failure_rate=args.failure_rate, tail_rate=args.tail_rate)
+    fallback = FakeLLM(args.fallback_latency_ms, seed=2)
+    # No gateway retries, so errors show up as failovers.
+    gateway = LLMGateway(max_concurrency=args.concurrency * 2, max_retries=0, coalesce=False)
+    router = ModelRouter(
+        tiers={STANDARD: ["primary", "fallback"]},
+        budgets={STANDARD: args.budget},
+        gateway=gateway,
+        hedging=not args.no_hedging,
+    )
+    router.register_model("primary", primary.model())
+    router.register_model("fallback", fallback.model())
+
+    print(asyncio.run(drive(router, args.calls, args.concurrency)))
+    print({"primary_calls": primary.calls, "primary_429s": primary.failures, "fallback_calls": fallback.calls})
+    print({f"{model}:{stat}": round(value, 3) for (model, stat), value in router.model_stats().items()})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""One scripted request per scenario, covering every router."""
+import json
+import random
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List
+
+import httpx
+
+from bench.corpus import QUESTIONS, Corpus
+
+
+@dataclass
+class Context:
+    corpus: Corpus
+    job_ids: List[str] = field(default_factory=list)
+    etags: Dict[str, str] = field(default_factory=dict)
+
+
+Scenario = Callable[[httpx.AsyncClient, Context, random.Random, int], Awaitable[httpx.Response]]
+SCENARIOS: Dict[str, Scenario] = {}
+# Scenarios that call the (fake) model; skipped with --no-llm.
+LLM_SCENARIOS = {"chat.send", "chat.stream", "revision.create_auto", "revision.bulk_auto"}
+# Statuses that are a correct answer for the scenario, not an error.
+EXPECTED_STATUSES = {"files.get_conditional": {304}}
+
+
+def scenario(name: str):
+    def register(fn: Scenario) -> Scenario:
+        SCENARIOS[name] = fn
+        return fn
+    return register
+
+
+@scenario("health")
+async def health(client, ctx, rng, i):
+    return await client.get("/health")
+
+
+@scenario("directories.roots")
+async def directory_roots(client, ctx, rng, i):
+    return await client.get("/api/directories/")
+
+
+@scenario("directories.tree")
+async def directory_tree(client, ctx, rng, i):
+    return await client.get("/api/directories/tree")
+
+
+@scenario("directories.get_leaf")
+async def directory_leaf(client, ctx, rng, i):
+    return await client.get(f"/api/directories/{ctx.corpus.directory_ids[-1 - i % 10]}")
+
+
+@scenario("files.list_directory")
+async def files_in_directory(client, ctx, rng, i):
+    return await client.get("/api/files/", params={"directory_id": rng.choice(ctx.corpus.directory_ids)})
+
+
+@scenario("files.list_page")
+async def files_page(client, ctx, rng, i):
+    return await client.get("/api/files/", params={"limit": 50})
+
+
+@scenario("files.get")
+async def file_get(client, ctx, rng, i):
+    return await client.get(f"/api/files/{rng.choice(ctx.corpus.file_ids)}")
+
+
+@scenario("files.get_conditional")
+async def file_get_conditional(client, ctx, rng, i):
+    file_id = ctx.corpus.file_ids[i % len(ctx.corpus.file_ids)]
+    if file_id not in ctx.etags:
+        ctx.etags[file_id] = (await client.get(f"/api/files/{file_id}")).headers["etag"]
+    return await client.get(f"/api/files/{file_id}", headers={"If-None-Match": ctx.etags[file_id]})
+
+
+@scenario("files.patch")
+async def file_patch(client, ctx, rng, i):
+    # One file per request so concurrent saves never conflict.
+    file_id = ctx.corpus.file_ids[i % len(ctx.corpus.file_ids)]
+    version = int((await client.get(f"/api/files/{file_id}")).headers["etag"].strip('"'))
+    edit = {"start": 10, "end": 10, "text": f" edit {i} "}
+    return await client.patch(f"/api/files/{file_id}", json={"base_version": version, "edits": [edit]})
+
+
+@scenario("notes.list")
+async def notes_list(client, ctx, rng, i):
+    return await client.get(f"/api/notes/file/{rng.choice(ctx.corpus.file_ids)}")
+
+
+@scenario("notes.create")
+async def notes_create(client, ctx, rng, i):
+    payload = {"content": f"Benchmark note {i}", "file_id": rng.choice(ctx.corpus.file_ids), "note_type": "QNA"}
+    return await client.post("/api/notes/", json=payload)
+
+
+@scenario("chat.history")
+async def chat_history(client, ctx, rng, i):
+    return await client.get(f"/api/chat/file/{rng.choice(ctx.corpus.file_ids)}", params={"limit": 50})
+
+
+def _question(ctx: Context, rng: random.Random, i: int) -> str:
+    # Unique per request so the response cache does not answer it.
+    topic = rng.choice(ctx.corpus.topics)
+    return rng.choice(QUESTIONS).format(topic=topic, a=topic, b=rng.choice(ctx.corpus.topics)) + f" (#{i})"
+
+
+@scenario("chat.send")
+async def chat_send(client, ctx, rng, i):
+    file_id = rng.choice(ctx.corpus.file_ids)
+    return await client.post(f"/api/chat/file/{file_id}", json={"content": _question(ctx, rng, i)})
+
+
+@scenario("chat.stream")
+async def chat_stream(client, ctx, rng, i):
+    file_id = rng.choice(ctx.corpus.file_ids)
+    response = await client.post(f"/api/chat/file/{file_id}/stream", json={"content": _question(ctx, rng, i)})
+    if "event: done" not in response.text:
+        response.status_code = 599
+    return response
+
+
+@scenario("revision.due")
+async def revision_due(client, ctx, rng, i):
+    return await client.get("/api/revision/due", params={"limit": 20})
+
+
+@scenario("revision.pending")
+async def revision_pending(client, ctx, rng, i):
+    return await client.get("/api/revision/pending")
+
+
+@scenario("revision.progress")
+async def revision_progress(client, ctx, rng, i):
+    return await client.get("/api/revision/progress", params={"days": 30})
+
+
+@scenario("revision.create_auto")
+async def revision_create_auto(client, ctx, rng, i):
+    payload = {"content": f"Mixed up {rng.choice(ctx.corpus.topics)} again (#{i})",
+               "file_id": rng.choice(ctx.corpus.file_ids), "error_type": "AUTO_DETECT"}
+    return await client.post("/api/revision/", json=payload)
+
+
+@scenario("revision.create_deferred")
+async def revision_create_deferred(client, ctx, rng, i):
+    payload = {"content": f"Forgot the year of {rng.choice(ctx.corpus.topics)} (#{i})",
+               "file_id": rng.choice(ctx.corpus.file_ids), "error_type": "AUTO_DETECT"}
+    response = await client.post("/api/revision/", params={"defer": "true"}, json=payload)
+    if "x-job-id" in response.headers:
+        ctx.job_ids.append(response.headers["x-job-id"])
+    return response
+
+
+@scenario("revision.bulk_auto")
+async def revision_bulk(client, ctx, rng, i):
+    notes = [
+        {"content": f"Bulk note {i}.{n} on {rng.choice(ctx.corpus.topics)}",
+         "file_id": rng.choice(ctx.corpus.file_ids), "error_type": "AUTO_DETECT"}
+        for n in range(10)
+    ]
+    return await client.post("/api/revision/bulk", json={"notes": notes})
+
+
+@scenario("revision.review")
+async def revision_review(client, ctx, rng, i):
+    note_id = ctx.corpus.revision_note_ids[i % len(ctx.corpus.revision_note_ids)]
+    return await client.put(f"/api/revision/{note_id}/review", json={"quality": rng.randint(0, 5)})
+
+
+@scenario("search.query")
+async def search_query(client, ctx, rng, i):
+    return await client.get("/api/search/", params={"q": rng.choice(ctx.corpus.topics), "limit": 20})
+
+
+@scenario("jobs.get")
+async def job_get(client, ctx, rng, i):
+    if not ctx.job_ids:
+        await revision_create_deferred(client, ctx, rng, i)
+    if not ctx.job_ids:
+        # The local classifier answered inline; there is no job to look at.
+        return httpx.Response(200, content=json.dumps({"skipped": True}))
+    return await client.get(f"/api/jobs/{ctx.job_ids[i % len(ctx.job_ids)]}")
@@ -30,14 +30,15 @@ interface File {
   name: string;
   content: string;
   directory_id: string;
+  version: number;
 }
 
 interface RevisionNote {
   id: string;
   content: string;
   error_type: string;
-  is_resolved: string;
-  review_count: string;
+  is_resolved: boolean;
+  review_count: number;
   created_at: string;
 }
 
@@ -165,6 +166,7 @@ export default function FilePage() {
   const chatEndRef = useRef<HTMLDivElement>(null);
   const editorRef = useRef<HTMLDivElement>(null);
   const selectionRef = useRef<Range | null>(null);
+  const savedRef = useRef<{ content: string; version: number } | null>(null);
 
   const fetchFile = async () => {
     try {
@@ -173,6 +175,7 @@ export default function FilePage() {
         const data = await res.json();
         setFile(data);
         setContent(data.content || "");
+        savedRef.current = { content: data.content || "", version: data.version };
         if (editorRef.current) {
           editorRef.current.innerHTML = data.content || "";
         }
@@ -254,15 +257,55 @@ export default function FilePage() {
     };
   }, []);
 
+  // Single splice turning the last saved text into the current one.
+  const diffEdit = (before: string, after: string) => {
+    let start = 0;
+    while (start < before.length && start < after.length && before[start] === after[start]) start++;
+    let endBefore = before.length;
+    let endAfter = after.length;
+    while (endBefore > start && endAfter > start && before[endBefore - 1] === after[endAfter - 1]) {
+      endBefore--;
+      endAfter--;
+    }
+    return { start, end: endBefore, text: after.slice(start, endAfter) };
+  };
+
   const handleSave = async () => {
     setSaving(true);
     try {
       const editorContent = editorRef.current?.innerHTML || "";
-      await fetch(`${API_BASE_URL}/api/files/${fileId}`, {
-        method: "PUT",
-        headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({ name: file?.name, content: editorContent }),
-      });
+      const saved = savedRef.current;
+      const putContent = () =>
+        fetch(`${API_BASE_URL}/api/files/${fileId}`, {
+          method: "PUT",
+          headers: {
+            "Content-Type": "application/json",
+            ...(saved ? { "If-Match": `"${saved.version}"` } : {}),
+          },
+          body: JSON.stringify({ name: file?.name, content: editorContent }),
+        });
+
+      let res = saved
+        ? await fetch(`${API_BASE_URL}/api/files/${fileId}`, {
+            method: "PATCH",
+            headers: { "Content-Type": "application/json" },
+            body: JSON.stringify({
+              base_version: saved.version,
+              edits: editorContent === saved.content ? [] : [diffEdit(saved.content, editorContent)],
+            }),
+          })
+        : await putContent();
+      if (res.status === 422) {
+        res = await putContent();
+      }
+      if (res.status === 409) {
+        alert("This file was changed somewhere else. Copy your edits, then reload the page.");
+        return;
+      }
+      if (res.ok) {
+        const data = await res.json();
+        savedRef.current = { content: editorContent, version: data.version };
+      }
     } catch (error) {
       console.error("Failed to save:", error);
     } finally {
@@ -24,7 +24,7 @@ interface RevisionNote {
   content: string;
   error_type: string;
   created_at: string;
-  review_count: string;
+  review_count: number;
 }
 
 interface NewsItem {
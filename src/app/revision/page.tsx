@@ -17,15 +17,33 @@ interface RevisionNote {
   id: string;
   content: string;
   error_type: string;
-  is_resolved: string;
-  review_count: string;
+  is_resolved: boolean;
+  review_count: number;
   created_at: string;
   last_reviewed: string;
 }
 
+interface RevisionDigest {
+  summary: string | null;
+  note_count: number;
+  stale: boolean;
+}
+
 export default function RevisionPage() {
   const [todayNotes, setTodayNotes] = useState<RevisionNote[]>([]);
   const [loading, setLoading] = useState(true);
+  const [digest, setDigest] = useState<RevisionDigest | null>(null);
+
+  const fetchDigest = async () => {
+    try {
+      const res = await fetch(`${API_BASE_URL}/api/revision/digest`);
+      if (res.ok) {
+        setDigest(await res.json());
+      }
+    } catch (error) {
+      console.error("Failed to fetch digest:", error);
+    }
+  };
 
   const fetchTodayNotes = async () => {
     try {
@@ -43,6 +61,7 @@ export default function RevisionPage() {
 
   useEffect(() => {
     fetchTodayNotes();
+    fetchDigest();
   }, []);
 
   const handleMarkAsReviewed = async (noteId: string) => {
@@ -122,6 +141,17 @@ export default function RevisionPage() {
           </div>
         ) : (
           <>
+            {digest?.summary && (
+              <div className="mb-6 p-5 rounded-xl border border-[#46B1BD]/30 bg-[#46B1BD]/10">
+                <div className="flex items-center gap-2 mb-2">
+                  <Brain className="w-5 h-5 text-[#46B1BD]" />
+                  <h2 className="text-sm font-medium text-white">Today&apos;s summary</h2>
+                  {digest.stale && <span className="text-xs text-[#64748b]">updating</span>}
+                </div>
+                <p className="text-sm text-[#cbd5e1] whitespace-pre-line">{digest.summary}</p>
+              </div>
+            )}
+
             <div className="flex items-center justify-between mb-6">
               <h2 className="text-lg font-medium text-white">
                 {todayNotes.length} items to review today
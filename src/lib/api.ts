@@ -17,6 +17,17 @@ async function fetchAPI(endpoint: string, options: RequestInit = {}) {
   return response.json();
 }
 
+export interface ImportEvent {
+  event: "started" | "progress" | "done" | "error";
+  directory_id: string;
+  directories: number;
+  files: number;
+  skipped: number;
+  total_files: number | null;
+  skipped_files?: { path: string; reason: string }[];
+  detail?: string;
+}
+
 export const api = {
   // Directories
   getDirectories: () => fetchAPI("/api/directories/"),
@@ -27,6 +38,42 @@ export const api = {
     fetchAPI(`/api/directories/${id}`, { method: "PUT", body: JSON.stringify(data) }),
   deleteDirectory: (id: string) =>
     fetchAPI(`/api/directories/${id}`, { method: "DELETE" }),
+  exportDirectoryUrl: (id: string, includeNotes = false) =>
+    `${API_BASE_URL}/api/directories/${id}/export${includeNotes ? "?include_notes=true" : ""}`,
+  importArchive: async (
+    archive: Blob,
+    options: { name?: string; parentId?: string; onProgress?: (event: ImportEvent) => void } = {}
+  ): Promise<ImportEvent> => {
+    const params = new URLSearchParams();
+    if (options.name) params.set("name", options.name);
+    if (options.parentId) params.set("parent_id", options.parentId);
+    const response = await fetch(`${API_BASE_URL}/api/directories/import?${params}`, {
+      method: "POST",
+      body: archive,
+    });
+    if (!response.ok || !response.body) {
+      const error = await response.json().catch(() => ({}));
+      throw new Error(error.detail || "Import failed");
+    }
+    const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+    let buffered = "";
+    let last: ImportEvent | null = null;
+    for (;;) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffered += value;
+      const lines = buffered.split("\n");
+      buffered = lines.pop() ?? "";
+      for (const line of lines.filter(Boolean)) {
+        last = JSON.parse(line) as ImportEvent;
+        options.onProgress?.(last);
+      }
+    }
+    if (!last || last.event === "error") {
+      throw new Error(last?.detail || "Import failed");
+    }
+    return last;
+  },
 
   // Files
   getFiles: (directoryId?: string) =>
@@ -62,6 +109,8 @@ export const api = {
     fetchAPI("/api/revision/pending"),
   getProgressStats: () =>
     fetchAPI("/api/revision/progress"),
+  getRevisionDigest: () =>
+    fetchAPI("/api/revision/digest"),
   createRevisionNote: (data: { content: string; file_id: string; error_type?: string }) =>
     fetchAPI("/api/revision/", { method: "POST", body: JSON.stringify(data) }),
   resolveRevisionNote: (id: string) =>